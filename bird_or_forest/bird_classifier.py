@@ -5,64 +5,19 @@ import requests
 import time
 from pathlib import Path
 import multiprocessing  # Add this import
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root
+from image_scraper import manifest, presize
+from image_scraper.search import ddg_pages
 
 # Function to search for images on DuckDuckGo
-def search_images_ddg(term, max_images=500, retry_delay=5):
-    """Search for images with retry mechanism and better error handling"""
-    url = 'https://duckduckgo.com/'
-    params = {'q': term}
-    
-    # Add retry logic
-    for attempt in range(3):  # Try 3 times
-        try:
-            res = requests.post(url, data=params)
-            search_obj = re.search(r'vqd=([\d-]+)\&', res.text)
-            
-            if not search_obj:
-                print(f"Token not found on attempt {attempt+1}, waiting {retry_delay} seconds...")
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Increase delay for next attempt
-                continue
-                
-            token = search_obj.group(1)
-            
-            urls = []
-            headers = {
-                'authority': 'duckduckgo.com', 
-                'accept': 'application/json', 
-                'sec-fetch-dest': 'empty',
-                'x-requested-with': 'XMLHttpRequest', 
-                'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36', 
-                'sec-fetch-site': 'same-origin',
-                'sec-fetch-mode': 'cors', 
-                'referer': 'https://duckduckgo.com/', 
-                'accept-language': 'en-US,en;q=0.9'
-            }
-            params = {'l': 'us-en', 'o': 'json', 'q': term, 'vqd': token, 'f': ',,,', 'p': '1', 'v7exp': 'a'}
-            
-            for i in range(max_images//100):
-                try:
-                    params['q'] = term
-                    res = requests.get(url + 'i.js', headers=headers, params=params)
-                    data = res.json()
-                    urls += [x['image'] for x in data['results']]
-                    if "next" not in data: break
-                    params['s'] = data['next']
-                    time.sleep(0.5)  # Be more polite to the server
-                except Exception as e:
-                    print(f"Error in search loop: {e}")
-                    break
-            
-            return urls[:max_images]
-            
-        except Exception as e:
-            print(f"Search attempt {attempt+1} failed: {e}")
-            time.sleep(retry_delay)
-            retry_delay *= 2
-    
-    # If all attempts fail, return an empty list
-    print(f"All search attempts for '{term}' failed. Skipping.")
-    return []
+def search_images_ddg(term, max_images=500):
+    """Search DuckDuckGo for images; vqd tokens are cached and refreshed by image_scraper.vqd"""
+    urls = [url for page in ddg_pages(term, max_images) for url in page]
+    if not urls:
+        print(f"All search attempts for '{term}' failed. Skipping.")
+    return urls
 
 # Main function to run all the code
 def main():
@@ -131,21 +86,23 @@ def main():
                 time.sleep(search_delay)
     '''
 
-    # Define paths directly since we're skipping the download part
-    bird_path = 'images/birds'
-    forest_path = 'images/forest'
+    # Define paths directly since we're skipping the download part; train on
+    # the 224x224 center crops once they are built
+    # (python -m image_scraper.presize images --size 224)
+    path = presize.prefer(path, 224)
 
-    # Verify we have images
-    bird_files = get_image_files(bird_path)
-    not_bird_files = get_image_files(forest_path)
-    print(f"Bird images: {len(bird_files)}, Non-bird images: {len(not_bird_files)}")
+    # Verify we have images (from the folder's manifest, built on first use;
+    # see image_scraper.manifest)
+    counts = manifest.counts(path)
+    print(f"Bird images: {counts.get('birds', 0)}, Non-bird images: {counts.get('forest', 0)}")
 
-    # Create DataLoaders
+    # Create DataLoaders (files and tar shard members alike)
     birds = DataBlock(
         blocks=(ImageBlock, CategoryBlock),
-        get_items=get_image_files,
+        get_items=manifest.get_items,
+        get_x=manifest.image,
         splitter=RandomSplitter(valid_pct=0.2, seed=42),
-        get_y=parent_label,
+        get_y=manifest.label,
         item_tfms=Resize(224)
     )
 
@@ -5,20 +5,25 @@ Downloads images of various animals from web search results with size verificati
 """
 
 import os
+import sys
 import time
 import json
 import random
-import requests
 import urllib.parse
 import re
+import threading
+from collections import Counter
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from urllib.parse import urlparse
 from bs4 import BeautifulSoup
 from PIL import Image
 import io
 from tqdm import tqdm
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root
+from image_scraper import aimd, client, dedup, journal, manifest, metrics, phash, probe, ratelimit, resize, searchcache, sequence, shards, urlcache, vqd
+
 
 import random
 
@@ -181,11 +186,31 @@ SEARCH_TERMS_PER_SUBJECT = 6  # Number of search terms per subject to increase v
 # Image size requirements
 MIN_WIDTH = 512  # Minimum width in pixels
 MIN_HEIGHT = 512  # Minimum height in pixels
-TARGET_SIZE = (512, 512)  # Target size for resizing (width, height)
-RESIZE_IMAGES = True  # Set to True to resize all images to TARGET_SIZE
+TARGET_SIZE = (460, 460)  # Training item size (animal_classifier's Resize(460)), width x height
+RESIZE_IMAGES = True  # Set to True to store a center crop at TARGET_SIZE (aspect kept) instead of the original
+MAX_IMAGE_BYTES = probe.MAX_IMAGE  # Drop downloads bigger than this (25 MB) while streaming
+METRICS_FOLDER = f"{MAIN_OUTPUT_FOLDER}/.metrics"  # animals.jsonl / animals.prom (point node_exporter's textfile collector here)
+SHARD_MB = 0  # >0: write each subject's images into tar shards of about this many MB (image_scraper.shards) instead of one file each
+
+# Most parallel downloads, shared by all subjects in progress.  This is only
+# the ceiling: an AIMD limiter (image_scraper.aimd) raises the number actually
+# in flight while downloads stay fast and halves it on timeouts, resets and 429s
+MAX_WORKERS = 64
+START_WORKERS = 16
+
+# Subjects searched and downloaded at the same time; their downloads all go
+# through the one MAX_WORKERS pool (requests to any one host are capped by
+# ratelimit.PER_HOST, search engines are paced by ratelimit.HOST_LIMITS)
+SUBJECTS_AT_ONCE = 4
+
+# download_image() result when the subject's quota was filled while it was
+# queued or running; it stopped before fetching, reading or decoding more
+CANCELLED = object()
 
-# Maximum number of parallel downloads
-MAX_WORKERS = 5
+# Downloads dropped ("queued") or aborted ("in_flight") because a subject
+# had already reached IMAGES_PER_SUBJECT, across all subjects
+AVOIDED = Counter()
+avoided_lock = threading.Lock()
 
 # User agent to mimic a browser
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
@@ -235,15 +260,23 @@ def generate_search_terms(subject, num_terms):
     random.shuffle(base_terms)
     return base_terms[:num_terms]
 
-def search_duckduckgo(query, max_results=20):
+def search_duckduckgo(query, max_results=20, cache=None):
     """Search for images using DuckDuckGo with size preference"""
     try:
         # Modify the query to prefer larger images
         size_query = f"{query} large"
         
-        # DuckDuckGo search URL
-        vqd_param = ''.join(random.choices('0123456789abcdefghijklmnopqrstuvwxyz-_', k=7))
-        url = f"https://duckduckgo.com/i.js?q={urllib.parse.quote(size_query)}&o=json&vqd={vqd_param}&f=,,,&p=1"
+        # Reuse the result page from an earlier run if we have it
+        page = cache.get("ddg", size_query, 0) if cache is not None else None
+        if page is not None:
+            return page.urls[:max_results]
+        
+        # DuckDuckGo only answers with a vqd token issued for this query
+        token = vqd.token(size_query)
+        if token is None:
+            print("DuckDuckGo search failed: no vqd token")
+            return []
+        url = f"https://duckduckgo.com/i.js?q={urllib.parse.quote(size_query)}&o=json&vqd={token}&f=,,,&p=1"
         
         headers = {
             "User-Agent": USER_AGENT,
@@ -251,23 +284,34 @@ def search_duckduckgo(query, max_results=20):
             "Referer": "https://duckduckgo.com/",
         }
         
-        response = requests.get(url, headers=headers, timeout=10)
+        started = time.perf_counter()
+        response = client.get(url, headers=headers, timeout=10)
         if response.status_code == 200:
             results = response.json().get("results", [])
             image_urls = [result.get("image") for result in results if result.get("image")]
+            metrics.observe("search", time.perf_counter() - started)
+            if cache is not None and image_urls:
+                cache.put("ddg", size_query, 0, image_urls)
             return image_urls[:max_results]
         else:
+            if response.status_code in (401, 403):
+                vqd.invalidate(size_query)  # fetch a fresh token next time
             print(f"DuckDuckGo search failed with status code {response.status_code}")
             return []
     except Exception as e:
         print(f"Error in DuckDuckGo search: {str(e)}")
         return []
 
-def search_bing(query, max_results=20):
+def search_bing(query, max_results=20, cache=None):
     """Search for images using Bing with size preference"""
     try:
         # Modify to include size parameter
         size_param = "&qft=+filterui:imagesize-large"
+        
+        # Reuse the result page from an earlier run if we have it
+        page = cache.get("bing-mimg", query + size_param, 0) if cache is not None else None
+        if page is not None:
+            return page.urls[:max_results]
         search_url = f"https://www.bing.com/images/search?q={urllib.parse.quote(query)}{size_param}&form=HDRSC2&first=1"
         
         headers = {
@@ -276,7 +320,8 @@ def search_bing(query, max_results=20):
             "Accept-Language": "en-US,en;q=0.5",
         }
         
-        response = requests.get(search_url, headers=headers, timeout=10)
+        started = time.perf_counter()
+        response = client.get(search_url, headers=headers, timeout=10)
         if response.status_code == 200:
             soup = BeautifulSoup(response.text, 'html.parser')
             
@@ -290,7 +335,10 @@ def search_bing(query, max_results=20):
             if not image_urls:
                 pattern = r'murl&quot;:&quot;(.*?)&quot;'
                 image_urls = re.findall(pattern, response.text)
+            metrics.observe("search", time.perf_counter() - started)
             
+            if cache is not None and image_urls:
+                cache.put("bing-mimg", query + size_param, 0, image_urls)
             return image_urls[:max_results]
         else:
             print(f"Bing search failed with status code {response.status_code}")
@@ -299,17 +347,21 @@ def search_bing(query, max_results=20):
         print(f"Error in Bing search: {str(e)}")
         return []
 
-def search_images(query, max_results=10):
-    """Search for images using multiple search engines with fallback"""
+def search_images(query, max_results=10, cache=None):
+    """Search for images using multiple search engines with fallback
+
+    If `cache` (a searchcache.SearchCache) is given, result pages fetched by an
+    earlier run are reused instead of searching again.
+    """
     print(f"Searching for '{query}'...")
     
     # Try DuckDuckGo first
-    image_urls = search_duckduckgo(query, max_results)
+    image_urls = search_duckduckgo(query, max_results, cache)
     
     # If DuckDuckGo doesn't return enough results, try Bing
     if len(image_urls) < max_results:
         print(f"DuckDuckGo returned only {len(image_urls)} results. Trying Bing...")
-        bing_results = search_bing(query, max_results - len(image_urls))
+        bing_results = search_bing(query, max_results - len(image_urls), cache)
         image_urls.extend(bing_results)
     
     # Remove duplicates while preserving order
@@ -326,8 +378,61 @@ def search_images(query, max_results=10):
     
     return unique_urls[:max_results]
 
-def download_image(url, output_path, subject, image_number):
-    """Download an image from a URL to the specified path with size verification and sequential naming"""
+def download_image(url, names, seen=None, near=None, urls=None, journal=None, limiter=None, stop=None, listing=None):
+    """Download an image, holding a `limiter` slot and one of its host's in-flight slots (see _download_image)"""
+    metrics.adjust("download", -1)  # out of the pool's queue
+    if stop is not None and stop.is_set():
+        return CANCELLED
+    if limiter is None:
+        with ratelimit.slot(urlparse(url).hostname or ""):
+            return _download_image(url, names, seen, near, urls, journal, None, stop, listing)
+    with limiter.slot(), ratelimit.slot(urlparse(url).hostname or ""):
+        return _download_image(url, names, seen, near, urls, journal, limiter, stop, listing)
+
+def _download_image(url, names, seen=None, near=None, urls=None, journal=None, limiter=None, stop=None, listing=None):
+    """Download an image with size verification and save it under the next sequential name
+
+    `names` (a sequence.Sequence for the subject's folder) hands out the file
+    name once the image has been accepted, so any number of concurrent calls
+    get distinct names.  If it is a shards.ShardWriter the image is appended
+    to the subject's current shard instead, and only counts as saved in
+    `urls` and `journal` once the shard has been synced.
+
+    If `seen` (a dedup.DedupIndex) is given, images whose bytes were already saved
+    under any subject or search term are skipped.  If `near` (a phash.NearDupIndex)
+    is given, resized or re-compressed copies of a saved image are skipped too.
+    If `urls` (a urlcache.UrlCache) is given, URLs with a known outcome from an
+    earlier run are not fetched again, and this attempt's outcome is recorded.
+    The subject's `journal` (a journal.Journal) gets the same outcomes plus
+    the file name before it is written and once it is saved.  The `limiter`
+    (an aimd.AIMD) is told every outcome and how long it took.  Every stage's
+    time, bytes read and outcome also go to `metrics`.  Saved images are
+    listed in `listing` (a manifest.Manifest) with their hash, size and URL.
+
+    Once `stop` (a threading.Event) is set the download gives up at the next
+    check - before the request, between body chunks, before decoding and
+    before naming - and returns CANCELLED without recording an outcome.
+    """
+    started = time.perf_counter()
+    sharded = isinstance(names, shards.ShardWriter)
+    
+    def cancelled():
+        return stop is not None and stop.is_set()
+    
+    def remember(outcome, path=None, sha=None):
+        metrics.outcome(outcome)
+        if urls is not None and not (sharded and outcome == "saved"):
+            urls.record(url, outcome, path, sha)
+        if journal is not None and outcome != "saved":
+            journal.url(url, outcome)
+        if limiter is not None:
+            limiter.record(outcome, time.perf_counter() - started)
+    
+    if journal is not None and journal.knows(url):
+        return None
+    if urls is not None and urls.skip(url):
+        return None
+    
     try:
         # Get file extension from URL
         parsed_url = urlparse(url)
@@ -338,77 +443,258 @@ def download_image(url, output_path, subject, image_number):
         if not extension or extension not in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
             extension = '.jpg'
             
-        # Create sequential filename
-        filename = f"{subject.lower()}-{image_number}{extension}"
-        
-        # Full path where the image will be saved
-        full_path = os.path.join(output_path, filename)
-        
-        # Don't redownload if the file already exists
-        if os.path.exists(full_path):
-            return None
-        
         # Download the image
+        if cancelled():
+            return CANCELLED
         headers = {"User-Agent": USER_AGENT, "Referer": "https://www.google.com/"}
-        response = requests.get(url, headers=headers, stream=True, timeout=10)
+        response = client.get(url, headers=headers, stream=True, timeout=10,
+                              stage="connect")
+        fetched = time.perf_counter()
         
         if response.status_code == 200:
-            # Check image dimensions before saving
+            # Don't download HTML error pages and the like at all
+            if not probe.is_image_type(response.headers.get("Content-Type")):
+                probe.aborted("not_image", response, 0)
+                response.close()
+                remember("invalid")
+                return None
+            
+            # ...nor anything announced as bigger than we'd keep
+            if probe.too_large(response, MAX_IMAGE_BYTES):
+                probe.aborted("too_large", response, 0)
+                response.close()
+                remember("too_large")
+                return None
+            
+            # Read only the first few KB and check the magic bytes and the
+            # dimensions in the header, so non-images and undersized images
+            # are dropped before the rest is downloaded
+            chunks = response.iter_content(probe.CHUNK)
+            head, size = probe.read_head(chunks)
+            if probe.sniff(head) is None:
+                probe.aborted("not_image", response, len(head))
+                response.close()
+                remember("invalid")
+                return None
+            if size is not None and (size[1] < MIN_WIDTH or size[2] < MIN_HEIGHT):
+                print(f"Skipping small image: {size[1]}x{size[2]} (minimum {MIN_WIDTH}x{MIN_HEIGHT})")
+                probe.aborted("too_small", response, len(head))
+                response.close()
+                remember("too_small")
+                return None
+            
+            # Read the rest, dropping the transfer if the quota fills meanwhile
+            # or the body runs past MAX_IMAGE_BYTES (memory per worker stays bounded)
+            body, received = [head], len(head)
+            for chunk in chunks:
+                if cancelled():
+                    response.close()
+                    return CANCELLED
+                received += len(chunk)
+                if received > MAX_IMAGE_BYTES:
+                    probe.aborted("too_large", response, received)
+                    response.close()
+                    remember("too_large")
+                    return None
+                body.append(chunk)
+            if cancelled():
+                return CANCELLED
+            metrics.observe("transfer", time.perf_counter() - fetched)
+            metrics.transferred(received)
+            
+            # Check image dimensions before saving (formats the probe doesn't parse)
             try:
-                image_content = response.content
-                image = Image.open(io.BytesIO(image_content))
-                width, height = image.size
+                image_content = b"".join(body)
+                with metrics.timed("verify"):
+                    image = Image.open(io.BytesIO(image_content))
+                    width, height = image.size
                 
                 # Skip if image is too small
                 if width < MIN_WIDTH or height < MIN_HEIGHT:
                     print(f"Skipping small image: {width}x{height} (minimum {MIN_WIDTH}x{MIN_HEIGHT})")
+                    remember("too_small")
                     return None
                 
-                # Resize if needed
+                # Skip exact duplicates (keyed by the SHA-256 of the downloaded bytes)
+                sha = dedup.digest(image_content)
+                if seen is not None and sha in seen:
+                    remember("duplicate", seen.lookup(sha), sha)
+                    return None
+                
+                # Skip near-duplicates (same photo at another size / quality)
+                ph = None
+                if near is not None:
+                    try:
+                        with metrics.timed("decode"):
+                            ph = phash.dhash_bytes(image_content)
+                    except Exception:
+                        ph = None
+                    if ph is not None and (copy_of := near.match(ph)) is not None:
+                        remember("duplicate", copy_of, sha)
+                        return None
+                
+                # Pre-size for training: scale to cover TARGET_SIZE and center-crop,
+                # on the process pool (JPEGs are decoded at reduced scale first), so
+                # the classifier never decodes the full-size download; this thread
+                # just waits for the bytes
+                if cancelled():
+                    return CANCELLED
                 if RESIZE_IMAGES:
-                    image = image.resize(TARGET_SIZE, Image.LANCZOS)
-                    # Save the resized image
-                    image.save(full_path)
-                else:
-                    # Save the original image
-                    with open(full_path, 'wb') as f:
-                        f.write(image_content)
+                    with metrics.timed("resize"):
+                        image_content = resize.submit(image_content, TARGET_SIZE, extension,
+                                                      crop=True).result()
+                    if cancelled():
+                        return CANCELLED
+                
+                # The image is accepted: only now take the next free name, so
+                # rejected downloads and concurrent tasks never collide
+                full_path = names.claim(extension)
+                filename = full_path.name
+                
+                # Another task may have saved the same bytes in the meantime
+                copy_of = seen.claim(sha, full_path) if seen is not None else None
+                if copy_of is None and ph is not None:
+                    copy_of = near.claim(ph, full_path)
+                    if copy_of is not None and seen is not None:
+                        seen.release(sha)
+                if copy_of is not None:
+                    names.release(full_path)
+                    remember("duplicate", copy_of, sha)
+                    return None
+                
+                if journal is not None:
+                    journal.allocated(filename, url)
+                try:
+                    # through a .part file and a rename (or into the shard), so a
+                    # crash never leaves a truncated image under a real name
+                    with metrics.timed("disk"):
+                        full_path = names.write(filename, image_content,
+                                                {"url": url, "sha256": sha})
+                except Exception as e:
+                    if seen is not None:
+                        seen.release(sha)
+                    names.release(full_path)
+                    # A full disk or a failed rename says nothing about the image:
+                    # a transient "error" lets the next run try the URL again
+                    print(f"Error saving {filename}: {str(e)}")
+                    remember("error")
+                    return None
                 
-                return full_path
+                remember("saved", full_path, sha)
+                if seen is not None and not sharded:
+                    seen.add(sha, full_path)        # the claim becomes a row now it's on disk
+                if journal is not None and not sharded:
+                    journal.saved(filename)
+                if listing is not None and not sharded:
+                    listing.record(full_path, image_content, url,
+                                   sha=None if RESIZE_IMAGES else sha)
+                return str(full_path)
                 
             except Exception as e:
                 print(f"Error processing image: {str(e)}")
+                remember("invalid")
                 return None
         else:
             print(f"Failed to download image, status code: {response.status_code}")
+            response.close()
+            remember(urlcache.http_reason(response.status_code))
             return None
             
     except Exception as e:
         print(f"Error downloading {url}: {str(e)}")
+        remember(client.error_reason(e))
         return None
 
-def download_images(search_terms, output_folder, num_images_per_term=200):
-    """Search and download multiple images for a list of search terms"""
+def highest_number(subject, filenames):
+    """Largest N among `{subject}-N.ext` file names, or 0"""
+    pattern = re.compile(r'^' + re.escape(subject.lower()) + r'-(\d+)')
+    numbers = [int(m.group(1)) for m in map(pattern.search, filenames) if m]
+    return max(numbers, default=0)
+
+def subject_images(subject, filenames):
+    """The `{subject}-N.ext` names among `filenames`"""
+    pattern = re.compile(r'^' + re.escape(subject.lower()) + r'-\d+\.')
+    return [f for f in filenames if pattern.search(f)]
+
+def existing_names(output_folder, listing=None):
+    """Names of the images saved in the folder (or inside its tar shards)"""
+    if listing is not None:
+        return listing.names(os.path.basename(output_folder))
+    return os.listdir(output_folder) + shards.names(output_folder)
+
+def download_images(search_terms, output_folder, num_images_per_term=200, seen=None, near=None, urls=None, cache=None, journal=None, pool=None, position=None, limiter=None, listing=None):
+    """Search and download multiple images for a list of search terms
+
+    IMAGES_PER_SUBJECT is the size the folder should reach, not this run's
+    share: a restarted run only tops it up and returns how many it added.
+    With a `journal`, terms finished on an earlier run are skipped and the
+    count comes from the journal.
+    Downloads run on `pool` (shared with other subjects) when given, else on
+    a pool of MAX_WORKERS threads for this call; `position` is the line of
+    this subject's progress bar.  `limiter` (an aimd.AIMD, shared with other
+    subjects) decides how many of the pool's downloads run at once.  With a
+    `listing` (a manifest.Manifest of the output root) saved images are
+    listed there, and the folder's names come from it instead of a scan.
+    """
+    if pool is None:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            return download_images(search_terms, output_folder, num_images_per_term,
+                                   seen, near, urls, cache, journal, pool, position,
+                                   limiter or aimd.AIMD(START_WORKERS, max_limit=MAX_WORKERS),
+                                   listing)
+    
     os.makedirs(output_folder, exist_ok=True)
     
-    # Keep track of how many successful downloads we've had
-    successful_downloads = 0
     max_attempts = num_images_per_term * 3  # Allow for some failures
     attempt_count = 0
     
     # Extract subject from the folder name
     subject = os.path.basename(output_folder)
     
-    # Find the current highest image number to continue sequencing
-    image_number = 1
-    for file in os.listdir(output_folder):
-        match = re.search(r'^' + re.escape(subject.lower()) + r'-(\d+)', file)
-        if match:
-            num = int(match.group(1))
-            if num >= image_number:
-                image_number = num + 1
+    # Images the folder already holds (names from the manifest when there is
+    # one): numbering continues after the highest, and they count towards
+    # IMAGES_PER_SUBJECT; the journal counts them only the first time
+    existing = subject_images(subject, existing_names(output_folder, listing))
+    if journal is not None:
+        already = journal.start(lambda: len(existing))
+        image_number = highest_number(subject, [*existing, *journal.files]) + 1
+    else:
+        already = len(existing)
+        image_number = highest_number(subject, existing) + 1
+    successful_downloads = already
     
+    # Names are claimed atomically as images are accepted (numbers another
+    # process already took are skipped), so in-flight downloads never collide
+    if SHARD_MB > 0:
+        def committed(path, info):
+            # the image's shard is on disk: now it counts as saved
+            if seen is not None:
+                seen.add(info["sha256"], path)
+            if urls is not None:
+                urls.record(info["url"], "saved", path, info["sha256"])
+            if journal is not None:
+                journal.saved(path.name)
+            if listing is not None:
+                listing.add(path, info["sha256"], info["url"], info.get("width"),
+                            info.get("height"), info["bytes"], info["label"], info["offset"])
+        names = shards.ShardWriter(output_folder, subject.lower(), label=subject,
+                                   max_bytes=SHARD_MB * 1024 * 1024,
+                                   on_commit=committed, start=image_number)
+    else:
+        names = sequence.Sequence(output_folder, f"{subject.lower()}-", start=image_number)
+    names.cleanup()
+    
+    # Set once IMAGES_PER_SUBJECT is reached: queued downloads are dropped and
+    # running ones stop at their next check
+    stop = threading.Event()
+    
+    progress = tqdm(total=IMAGES_PER_SUBJECT, initial=min(already, IMAGES_PER_SUBJECT),
+                    desc=subject, position=position, leave=True)
     for term in search_terms:
+        if journal is not None and term in journal.done_terms:
+            progress.write(f"'{term}' finished in an earlier run, skipping...")
+            continue
+        
         # Target number of images from this term
         target_from_term = min(num_images_per_term, 
                              IMAGES_PER_SUBJECT - successful_downloads)
@@ -417,40 +703,68 @@ def download_images(search_terms, output_folder, num_images_per_term=200):
             break  # We've reached our goal
             
         # Get image URLs - get more than we need since some will fail size requirements
-        image_urls = search_images(term, max_results=target_from_term * 2)
+        image_urls = search_images(term, max_results=target_from_term * 2, cache=cache)
         
-        # Process images
+        # Process images on the shared pool, interleaved with other subjects
         term_successful = 0
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            download_tasks = []
-            for url in image_urls:
-                if attempt_count >= max_attempts:
+        download_tasks = []
+        for url in image_urls:
+            if attempt_count >= max_attempts:
+                break
+                
+            metrics.adjust("download", 1)
+            download_tasks.append(
+                pool.submit(download_image, url, names, seen, near, urls, journal, limiter, stop,
+                            listing)
+            )
+            attempt_count += 1
+        
+        # Collect results as they complete
+        for future in as_completed(download_tasks):
+            downloaded_path = future.result()
+            if downloaded_path and downloaded_path is not CANCELLED:
+                term_successful += 1
+                successful_downloads += 1
+                progress.update(1)
+                
+                # If we've reached our target, cancel the rest and break out
+                if successful_downloads >= IMAGES_PER_SUBJECT:
+                    stop.set()
+                    for f in download_tasks:
+                        if f.cancel():
+                            metrics.adjust("download", -1)
                     break
-                    
-                download_tasks.append(
-                    executor.submit(download_image, url, output_folder, subject, image_number + successful_downloads)
-                )
-                attempt_count += 1
-            
-            # Collect results as they complete
-            for future in tqdm(download_tasks, desc=f"Downloading images for '{term}'"):
-                downloaded_path = future.result()
-                if downloaded_path:
-                    term_successful += 1
-                    successful_downloads += 1
-                    
-                    # If we've reached our target, break out
-                    if successful_downloads >= IMAGES_PER_SUBJECT:
-                        break
+        # running ones still write to this subject's journal; let them finish
+        wait(download_tasks)
+        if stop.is_set():
+            queued = sum(f.cancelled() for f in download_tasks)
+            in_flight = sum(1 for f in download_tasks
+                            if not f.cancelled() and f.result() is CANCELLED)
+            with avoided_lock:
+                AVOIDED["queued"] += queued
+                AVOIDED["in_flight"] += in_flight
+            progress.write(f"'{subject}' quota filled: dropped {queued} queued and "
+                           f"aborted {in_flight} running downloads")
+        
+        progress.write(f"Got {term_successful} images from search term '{term}' ({subject})")
         
-        print(f"Got {term_successful} images from search term '{term}'")
+        # Every result of this term was tried; don't search it again (unless
+        # some failed in a way worth retrying next run)
+        if (journal is not None and successful_downloads < IMAGES_PER_SUBJECT
+                and attempt_count < max_attempts and journal.settled(image_urls)):
+            journal.term_done(term)
         
         # If we've reached our target, break out
         if successful_downloads >= IMAGES_PER_SUBJECT:
-            print(f"Reached target of {IMAGES_PER_SUBJECT} images for {subject}")
+            progress.write(f"Reached target of {IMAGES_PER_SUBJECT} images for {subject}")
             break
     
-    return successful_downloads
+    progress.close()
+    if isinstance(names, shards.ShardWriter):
+        names.close()
+    if listing is not None:
+        listing.commit([output_folder])     # every file here has its row now
+    return successful_downloads - already
 
 def main():
     # Create the main output directory
@@ -468,10 +782,11 @@ def main():
     
     print(f"=== Animal Image Downloader ===")
     print(f"Going to download images for {len(SUBJECTS)} different animals/species")
-    print(f"Target: {IMAGES_PER_SUBJECT} images per subject")
+    print(f"Target: {IMAGES_PER_SUBJECT} images per subject, {SUBJECTS_AT_ONCE} subjects at a time "
+          f"sharing up to {MAX_WORKERS} downloads (adaptive, starting at {START_WORKERS})")
     print(f"Image size requirements: Minimum {MIN_WIDTH}x{MIN_HEIGHT} pixels")
     if RESIZE_IMAGES:
-        print(f"All images will be resized to {TARGET_SIZE[0]}x{TARGET_SIZE[1]} pixels")
+        print(f"All images will be center-cropped to {TARGET_SIZE[0]}x{TARGET_SIZE[1]} pixels")
     print(f"Images will be saved to: {MAIN_OUTPUT_FOLDER}")
     print(f"WARNING: This will download approximately {len(SUBJECTS) * IMAGES_PER_SUBJECT} images")
     print(f"Estimated storage requirement: {(len(SUBJECTS) * IMAGES_PER_SUBJECT * 0.5) / 1024:.1f} GB (at ~0.5MB per image)")
@@ -486,43 +801,118 @@ def main():
     start_time = time.time()
     total_downloaded = 0
     
-    for idx, subject in enumerate(SUBJECTS):
-        print(f"\n[{idx+1}/{len(SUBJECTS)}] Processing: '{subject}'")
-        
+    # SHA-256 index of downloaded bytes, shared across subjects and runs
+    seen = dedup.DedupIndex()
+    # Perceptual hashes survive resizing, so this one also covers files
+    # saved with RESIZE_IMAGES on
+    near = phash.open_index(main_output_path)
+    near.scan(main_output_path)
+    # Outcome of every URL tried so far, so re-runs only fetch new ones
+    urls = urlcache.UrlCache()
+    # Search result pages from earlier runs
+    cache = searchcache.SearchCache()
+    # Downloads in flight across all subjects, adapted to how the network,
+    # hosts and CPU keep up (between 1 and MAX_WORKERS)
+    limiter = aimd.AIMD(START_WORKERS, max_limit=MAX_WORKERS)
+    # Per-stage timings, outcomes and queue depths, exported every few
+    # seconds while the job is going
+    exporter = metrics.Exporter(METRICS_FOLDER, job="animals", limiter=limiter).start()
+    # Every saved image (path, hash, size, source URL) in one table, so
+    # subjects resume their numbering without listing their folders
+    listing = manifest.Manifest(main_output_path)
+    listing.sync()
+    
+    def download_subject(idx, subject, position):
+        """Search and download one subject; runs on the subject scheduler"""
         # Create subject-specific output folder
         subject_folder = main_output_path / subject.lower().replace(" ", "_")
         subject_folder.mkdir(exist_ok=True)
         
+        # Index files saved before the dedup index existed (only possible when
+        # they were stored as downloaded; resized files no longer match)
+        if not RESIZE_IMAGES:
+            seen.backfill(subject_folder)
+        
         # Generate search terms for this subject
         search_terms = generate_search_terms(subject, SEARCH_TERMS_PER_SUBJECT)
-        print(f"Search terms for {subject}:")
-        for i, term in enumerate(search_terms):
-            print(f"  {i+1}. {term}")
-        
-        # Download images for this subject
-        images_downloaded = download_images(
-            search_terms, 
-            str(subject_folder), 
-            num_images_per_term=IMAGES_PER_SUBJECT // SEARCH_TERMS_PER_SUBJECT
-        )
+        tqdm.write(f"[{idx+1}/{len(SUBJECTS)}] '{subject}': " + "; ".join(search_terms))
         
-        total_downloaded += images_downloaded
-        print(f"Downloaded {images_downloaded} images for '{subject}'")
-        print(f"Progress: {total_downloaded}/{len(SUBJECTS) * IMAGES_PER_SUBJECT} total images")
-        
-        # Small delay between subjects to avoid triggering rate limits
-        if idx < len(SUBJECTS) - 1:
-            delay = 5
-            print(f"Waiting {delay} seconds before the next subject...")
-            time.sleep(delay)
+        # Download images for this subject, resuming from its journal
+        log = journal.Journal(subject_folder)
+        try:
+            return download_images(
+                search_terms, 
+                str(subject_folder), 
+                num_images_per_term=IMAGES_PER_SUBJECT // SEARCH_TERMS_PER_SUBJECT,
+                seen=seen,
+                near=near,
+                urls=urls,
+                cache=cache,
+                journal=log,
+                pool=pool,
+                limiter=limiter,
+                position=position,
+                listing=listing
+            )
+        finally:
+            log.close()
+    
+    # One long-lived download pool for the whole job, and SUBJECTS_AT_ONCE
+    # subjects feeding it: while one subject waits on a search engine the
+    # others' downloads keep the workers busy
+    free_lines = list(range(SUBJECTS_AT_ONCE))      # progress bar positions
+    lines_lock = threading.Lock()
+    
+    def scheduled(idx, subject):
+        with lines_lock:
+            position = free_lines.pop(0)
+        try:
+            return download_subject(idx, subject, position)
+        finally:
+            with lines_lock:
+                free_lines.append(position)
+    
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool, \
+         ThreadPoolExecutor(max_workers=SUBJECTS_AT_ONCE) as scheduler:
+        jobs = {scheduler.submit(scheduled, idx, subject): subject
+                for idx, subject in enumerate(SUBJECTS)}
+        for job in as_completed(jobs):
+            subject = jobs[job]
+            try:
+                images_downloaded = job.result()
+            except Exception as e:
+                tqdm.write(f"Failed on '{subject}': {e}")
+                continue
+            total_downloaded += images_downloaded
+            tqdm.write(f"Downloaded {images_downloaded} images for '{subject}' "
+                       f"- progress: {total_downloaded}/{len(SUBJECTS) * IMAGES_PER_SUBJECT} total images")
+    
+    exporter.close()
+    resize.shutdown()
+    seen.close()
+    near.close()
+    urls.close()
+    cache.close()
+    listed = listing.summary()
+    listing.close()
     
     # Report results
     elapsed_time = time.time() - start_time
     print("\n" + "=" * 50)
     print(f"Download complete!")
     print(f"Total images downloaded: {total_downloaded}")
+    print(urls.summary())
+    print(limiter.summary())
+    print(f"Cancelled once subjects were full: dropped {AVOIDED['queued']} queued and "
+          f"aborted {AVOIDED['in_flight']} running downloads")
+    print(cache.summary())
+    print(listed)
+    metrics.print_stats()
+    probe.print_stats()
     print(f"Images saved to: {MAIN_OUTPUT_FOLDER}")
-    print(f"Time taken: {elapsed_time:.1f} seconds ({elapsed_time/60:.1f} minutes)")
+    print(f"Time taken: {elapsed_time:.1f} seconds ({elapsed_time/60:.1f} minutes), "
+          f"{total_downloaded / elapsed_time:.2f} images/s")
+    client.print_stats()
     print("=" * 50)
 
 if __name__ == "__main__":
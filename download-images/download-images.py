@@ -1,19 +1,22 @@
 # Import required libraries
 import os
-import requests
+import sys
 import time
-import re
 from pathlib import Path
-from bs4 import BeautifulSoup
 import random
-import urllib.parse
-import json
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root
+from image_scraper import aimd, client, dedup, journal, manifest, metrics, phash, pipeline, presize, probe, resize, search, searchcache, urlcache
 
 # CONFIGURATION - Edit these variables
 SEARCH_SUBJECT = "horse"  # Change this to whatever you want to search for
 OUTPUT_FOLDER = f"images/{SEARCH_SUBJECT}"  # Will create a folder with the subject name
 NUM_IMAGES_PER_TERM = 100  # Number of images to try downloading per search term
 TOTAL_DESIRED_IMAGES = 1200  # Approximate total number of images desired
+SHARD_MB = 0  # >0: write tar shards of about this many MB (with a JSON sidecar per image) instead of files
+PRESIZE = 0  # >0: also store a PRESIZE×PRESIZE center crop of each image (the classifier's Resize) under images-PRESIZE/
+KEEP_ORIGINALS = True  # False: with PRESIZE, store only the cropped copy in OUTPUT_FOLDER
+METRICS_FOLDER = "images/.metrics"  # <subject>.jsonl / .prom (point node_exporter's textfile collector here)
 
 # Generate animal-specific search terms
 def generate_search_terms(subject="pig", num_terms=12):
@@ -157,110 +160,23 @@ def generate_search_terms(subject="pig", num_terms=12):
         selected_templates = random.sample(templates, min(num_terms, len(templates)))
         return [template.format(subject=subject) for template in selected_templates]
 
-# Function to search for images using Bing
-def search_images_bing(term, max_images=100):
-    """Search for images using Bing image search"""
-    image_urls = []
-    
-    # Multiple pages to get more images
-    for offset in range(0, max_images, 35):
-        # Bing images search URL with pagination
-        search_url = f"https://www.bing.com/images/search?q={urllib.parse.quote(term)}&form=HDRSC2&first={offset+1}"
-        
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Accept-Language": "en-US,en;q=0.5",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Referer": "https://www.bing.com/",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-            "Cache-Control": "max-age=0"
-        }
-        
-        try:
-            response = requests.get(search_url, headers=headers)
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Find image data in the page
-            for img in soup.find_all("a", class_="iusc"):
-                m = img.get("m")
-                if m:
-                    try:
-                        data = json.loads(m)
-                        if "murl" in data:
-                            image_urls.append(data["murl"])
-                    except:
-                        continue
-            
-            # Respect the site by waiting briefly
-            time.sleep(0.5)
-        except Exception as e:
-            print(f"Error searching Bing: {e}")
-        
-        # Break if we have enough URLs
-        if len(image_urls) >= max_images:
-            break
-    
-    return image_urls[:max_images]
+# Bing request headers (DuckDuckGo uses the image_scraper.search defaults)
+BING_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Referer": "https://www.bing.com/",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Cache-Control": "max-age=0"
+}
 
-# Function to search for images using DuckDuckGo (as fallback)
-def search_images_ddg(term, max_images=100, retry_delay=5):
-    """Search for images with retry mechanism and better error handling"""
-    url = 'https://duckduckgo.com/'
-    params = {'q': term}
-    
-    # Add retry logic
-    for attempt in range(3):  # Try 3 times
-        try:
-            res = requests.post(url, data=params)
-            search_obj = re.search(r'vqd=([\d-]+)\&', res.text)
-            
-            if not search_obj:
-                print(f"Token not found on attempt {attempt+1}, waiting {retry_delay} seconds...")
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Increase delay for next attempt
-                continue
-                
-            token = search_obj.group(1)
-            
-            urls = []
-            headers = {
-                'authority': 'duckduckgo.com', 
-                'accept': 'application/json', 
-                'sec-fetch-dest': 'empty',
-                'x-requested-with': 'XMLHttpRequest', 
-                'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36', 
-                'sec-fetch-site': 'same-origin',
-                'sec-fetch-mode': 'cors', 
-                'referer': 'https://duckduckgo.com/', 
-                'accept-language': 'en-US,en;q=0.9'
-            }
-            params = {'l': 'us-en', 'o': 'json', 'q': term, 'vqd': token, 'f': ',,,', 'p': '1', 'v7exp': 'a'}
-            
-            for i in range(max_images//100 + 1):
-                try:
-                    params['q'] = term
-                    res = requests.get(url + 'i.js', headers=headers, params=params)
-                    data = res.json()
-                    urls += [x['image'] for x in data['results']]
-                    if "next" not in data: break
-                    params['s'] = data['next']
-                    time.sleep(0.5)  # Be more polite to the server
-                except Exception as e:
-                    print(f"Error in search loop: {e}")
-                    break
-            
-            return urls[:max_images]
-            
-        except Exception as e:
-            print(f"Search attempt {attempt+1} failed: {e}")
-            time.sleep(retry_delay)
-            retry_delay *= 2
-    
-    # If all attempts fail, return an empty list
-    print(f"All search attempts for '{term}' failed. Skipping.")
-    return []
+# Function to search for images, one result page at a time
+def search_pages(term, max_images=100, cache=None):
+    """Yield Bing result pages for a term, topped up from DuckDuckGo if Bing comes back nearly empty"""
+    return search.image_pages(term, max_images, extra="&form=HDRSC2", headers=BING_HEADERS,
+                              cache=cache)
 
 # Function to download images
 def download_images(search_terms, output_folder, num_images_per_term=100):
@@ -270,76 +186,114 @@ def download_images(search_terms, output_folder, num_images_per_term=100):
     output_path.mkdir(parents=True, exist_ok=True)
     
     total_downloaded = 0
-    search_delay = 10  # seconds between searches
+    pending_terms = []
+    next_index = {}  # term -> [safe_term, next image number, images still wanted]
+    
+    # Terms, URLs and saved files from earlier runs; a restarted run
+    # skips whatever the last one finished
+    log = journal.Journal(output_path)
     
-    for idx, term in enumerate(search_terms):
-        print(f"\n[{idx+1}/{len(search_terms)}] Searching for: '{term}'")
+    # Every saved image under images/ (path, hash, size, source URL), kept
+    # up to date by the pipeline; counts come from here instead of a glob
+    listing = manifest.Manifest(output_path.parent)
+    listing.sync()
+    copies = None
+    if PRESIZE and KEEP_ORIGINALS:
+        copies = manifest.Manifest(presize.mirror(output_path.parent, PRESIZE))
+        copies.sync()
+        presize.mark(copies.root, False)    # until every original has its copy again
+    
+    for term in search_terms:
+        if term in log.done_terms:
+            print(f"'{term}' finished in an earlier run, skipping...")
+            continue
         
         # Create safe filename from search term
         safe_term = "".join(c if c.isalnum() else "_" for c in term)
         
         # Count existing images to avoid overwriting
-        existing_images = len([f for f in output_path.glob(f"{safe_term}_*.jpg")])
+        existing = listing.names(output_path.name, f"{safe_term}_*")
+        existing_images = len(existing)
         
         if existing_images >= num_images_per_term:
             print(f"Already have {existing_images} images for '{term}', skipping...")
             total_downloaded += existing_images
             continue
         
-        # Search for images - try Bing first, DDG as backup
-        print(f"Searching Bing Images for '{term}'...")
-        urls = search_images_bing(term, max_images=num_images_per_term)
-        
-        # If Bing didn't work well, try DuckDuckGo as fallback
-        if len(urls) < 10:
-            print(f"Bing search returned only {len(urls)} results. Trying DuckDuckGo...")
-            ddg_urls = search_images_ddg(term, max_images=num_images_per_term)
-            if len(ddg_urls) > len(urls):
-                urls = ddg_urls
-                
-        print(f"Found {len(urls)} images for '{term}'")
-        
-        if not urls:
-            print(f"No images found for '{term}', continuing to next term...")
-            if idx < len(search_terms) - 1:
-                print(f"Waiting {search_delay} seconds before next search...")
-                time.sleep(search_delay)
-            continue
-        
-        # Download images
-        term_downloaded = 0
-        for i, url in enumerate(urls):
-            try:
-                img_filename = f"{safe_term}_{existing_images + i}.jpg"
-                img_path = output_path / img_filename
-                
-                print(f"Downloading image {i+1}/{len(urls)}", end="\r")
-                
-                response = requests.get(url, timeout=4)
-                if response.status_code != 200:
-                    continue
-                
-                img_path.write_bytes(response.content)
-                
-                # Verify image is valid
-                try:
-                    from PIL import Image
-                    img = Image.open(img_path)
-                    img.verify()  # Verify it's a valid image
-                    term_downloaded += 1
-                except Exception as e:
-                    print(f"Invalid image: {img_path}, removing... ({e})")
-                    img_path.unlink(missing_ok=True)
-            except Exception as e:
-                print(f"Error downloading {url}: {e}")
-        
-        print(f"\nSuccessfully downloaded {term_downloaded} images for '{term}'")
-        total_downloaded += term_downloaded
-        
-        # Wait between searches to avoid rate limiting
-        if idx < len(search_terms) - 1:
-            print(f"Waiting {search_delay} seconds before next search...")
-            time.sleep(search_delay)
+        pending_terms.append(term)
+        # numbering continues after the highest number, not the count, so a
+        # gap (a deleted image) is never filled by overwriting the next one
+        next_number = pipeline.highest(safe_term, existing) + 1 if existing else 0
+        next_index[term] = [safe_term, next_number, num_images_per_term - existing_images]
+    
+    def image_name(term):
+        """Next free filename for a term, or None once it has enough images"""
+        safe_term, n, wanted = next_index[term]
+        if wanted <= 0:
+            return None
+        next_index[term][1:] = [n + 1, wanted - 1]
+        return f"{safe_term}_{n}.jpg"
+    
+    # Content hash index shared with every other subject under images/,
+    # so the same picture found by another term or run is not saved twice
+    seen = dedup.DedupIndex()
+    seen.backfill(output_path)
+    # ...and a perceptual-hash index for resized or re-compressed copies
+    near = phash.open_index(output_path.parent)
+    near.scan(output_path.parent)
+    # URLs already saved, rejected or failed on an earlier run are skipped
+    urls = urlcache.UrlCache()
+    # result pages from earlier runs; only new pages go to Bing / DDG
+    results = searchcache.SearchCache()
+    
+    # Downloads in flight grow while hosts answer quickly and halve on
+    # timeouts / 429s; DOWNLOAD_WORKERS is only the ceiling
+    limiter = aimd.AIMD(max_limit=pipeline.DOWNLOAD_WORKERS)
+    
+    # Per-stage timings, outcomes and queue depths, exported every few
+    # seconds while the run is going
+    exporter = metrics.Exporter(METRICS_FOLDER, job=SEARCH_SUBJECT, limiter=limiter).start()
+    
+    # Search, download, verify and save all terms as one streaming pipeline:
+    # downloads start as soon as the first result page is back
+    try:
+        stats = pipeline.run(
+            pending_terms,
+            lambda term: search_pages(term, max_images=num_images_per_term, cache=results),
+            output_path,
+            name=image_name,
+            dedup=seen,
+            near=near,
+            urls=urls,
+            journal=log,
+            limiter=limiter,
+            shard_bytes=SHARD_MB * 1024 * 1024,
+            presize=PRESIZE,
+            presize_dir=copies.root / output_path.name if copies is not None else None,
+            manifest=listing,
+            presize_manifest=copies,
+        )
+    finally:
+        exporter.close()
+        resize.shutdown()
+    seen.close()
+    log.close()
+    near.close()
+    urls.close()
+    results.close()
+    listed = listing.summary()
+    if copies is not None:
+        presize.mark(copies.root, copies.counts() == listing.counts())
+    listing.close()
+    if copies is not None:
+        copies.close()
+    
+    print(f"\n{stats.summary()}")
+    print(f"{urls.summary()}")
+    print(f"{limiter.summary()}")
+    print(f"{results.summary()}")
+    print(listed)
+    total_downloaded += stats.saved
     
     return total_downloaded
 
@@ -376,6 +330,9 @@ def main():
     print(f"Total images downloaded: {total_downloaded}")
     print(f"Images saved to: {OUTPUT_FOLDER}")
     print(f"Time taken: {elapsed_time:.1f} seconds ({elapsed_time/60:.1f} minutes)")
+    metrics.print_stats()
+    probe.print_stats()
+    client.print_stats()
     print("=" * 50)
 
 if __name__ == "__main__":
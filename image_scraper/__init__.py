@@ -0,0 +1,10 @@
+"""
+Shared building blocks for the image scrapers in `download-images/` and
+the skin-condition runner.
+
+The scripts in `download-images/` are run directly, so each one puts the
+repository root on `sys.path` before importing from this package.  The
+skin-condition classes are scraped as one job from the repository root:
+
+    python -m image_scraper.runner skin_condition/subjects.yaml
+"""
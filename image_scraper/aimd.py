@@ -0,0 +1,138 @@
+# ----------------------------------------------
+# adaptive (AIMD) download concurrency
+# ----------------------------------------------
+"""
+Replaces a hand-tuned `MAX_WORKERS` with a limit that finds itself.
+
+Every download holds a slot while it runs and reports its outcome and
+latency afterwards.  Once per `window` completions the limit is
+adjusted, TCP style:
+
+* any timeout, connection reset or 429 in the window → the limit is
+  multiplied by `backoff` (additive increase / multiplicative decrease,
+  one cut per window however many errors it had).  A 5xx is one host's
+  problem, not congestion, and doesn't count: with hundreds of hosts
+  behind a search a few always fail, and cutting the shared limit for
+  each of them kept it pinned near the bottom;
+* otherwise, if the window's median latency is within `slack` × the
+  best median seen so far → the limit grows by `increase`;
+* otherwise (latency creeping up: the link, the hosts or the local CPU
+  are saturated) it stays where it is.
+
+The thread pool behind it is sized for `max_limit`; threads beyond the
+current limit just wait in `acquire()`.
+
+    limiter = aimd.AIMD(limit=16, max_limit=64)
+    with limiter.slot():
+        t0 = time.perf_counter()
+        data, reason = engine.fetch(url, timeout)
+        limiter.record(reason, time.perf_counter() - t0)
+    print(limiter.summary())
+
+`stats()` has the current limit, the range it moved in and its history
+as (seconds since start, limit) pairs.
+"""
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+START      = 16                                    # engine.DEFAULT_CONCURRENCY, the fixed
+                                                   # download concurrency before this
+CONGESTION = {"timeout", "reset", "http_429"}
+
+
+def congested(outcome: str) -> bool:
+    return outcome in CONGESTION
+
+
+class AIMD:
+    def __init__(self, limit: int = START, min_limit: int = 1, max_limit: int = 64,
+                 increase: float = 1.0, backoff: float = 0.5,
+                 window: int = 16, slack: float = 2.0):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit     = float(min(max(limit, self.min_limit), self.max_limit))
+        self.increase  = increase
+        self.backoff   = backoff
+        self.window    = window
+        self.slack     = slack
+
+        self.cond      = threading.Condition()
+        self.inflight  = 0
+        self.samples: List[float] = []      # latencies of this window's healthy requests
+        self.errors    = 0                  # congestion signals in this window
+        self.seen      = 0
+        self.baseline  = None               # best window median so far (drifts up slowly)
+
+        self.increases = 0
+        self.decreases = 0
+        self.low       = self.high = int(self.limit)
+        self.t0        = time.monotonic()
+        self.history: List[Tuple[float, int]] = [(0.0, int(self.limit))]
+
+    # -------------------- slots --------------------
+    def acquire(self) -> None:
+        with self.cond:
+            while self.inflight >= int(self.limit):
+                self.cond.wait()
+            self.inflight += 1
+
+    def release(self) -> None:
+        with self.cond:
+            self.inflight -= 1
+            self.cond.notify()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    # -------------------- feedback --------------------
+    def record(self, outcome: str, latency: float) -> None:
+        """Report a finished request (`ok` or a `urlcache` outcome string)."""
+        with self.cond:
+            self.seen += 1
+            if congested(outcome):
+                self.errors += 1
+            else:
+                self.samples.append(latency)
+            if self.seen >= self.window:
+                self._adjust()
+
+    def _adjust(self) -> None:
+        old = int(self.limit)
+        if self.errors:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self.decreases += 1
+        elif self.samples:
+            median = statistics.median(self.samples)
+            # let the baseline creep up 10% a window so a slower network
+            # later on doesn't freeze the limit forever
+            self.baseline = median if self.baseline is None else min(self.baseline * 1.1, median)
+            if median <= self.slack * self.baseline and self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + self.increase)
+                self.increases += 1
+        self.samples, self.errors, self.seen = [], 0, 0
+        new = int(self.limit)
+        if new != old:
+            self.low, self.high = min(self.low, new), max(self.high, new)
+            self.history.append((round(time.monotonic() - self.t0, 3), new))
+            self.cond.notify_all()
+
+    # -------------------- metrics --------------------
+    def stats(self) -> dict:
+        with self.cond:
+            return {"limit": int(self.limit), "inflight": self.inflight,
+                    "min": self.low, "max": self.high,
+                    "increases": self.increases, "decreases": self.decreases,
+                    "history": list(self.history)}
+
+    def summary(self) -> str:
+        st = self.stats()
+        return (f"Concurrency: limit {st['limit']} (moved between {st['min']} and "
+                f"{st['max']}), {st['increases']} increases, {st['decreases']} back-offs")
@@ -0,0 +1,360 @@
+# ----------------------------------------------
+# offline scraper benchmarks
+# ----------------------------------------------
+"""
+Repeatable throughput numbers for the scrapers without touching Bing,
+DuckDuckGo or any image host: every request goes to a local
+`image_scraper.mockserver` with fixed sizes, delays and failure rates.
+
+    python -m image_scraper.bench
+    python -m image_scraper.bench --only pipeline animals --rounds 5 --fail 0.2
+    python -m image_scraper.bench --json > before.json
+    python -m image_scraper.bench --only bing-parse --fixtures saved_bing_pages/
+
+Benchmarks (`--only` picks some):
+
+    bing             search.bing_pages, page by page        pages/s
+    ddg              search.ddg_pages (vqd token + i.js)    pages/s
+    engine           engine.download_all over result URLs   img/s
+    pipeline         pipeline.run: search → download → save img/s
+    runner           runner.run_all, one subject per term,  img/s
+                     with its shared caches, manifest and limiter
+    download-images  download-images/download-images.py     img/s
+    animals          download-animal-images.py's download_images, its
+                     search results served from a pre-filled search cache
+                     (its search URLs are hard-coded)
+    bing-parse       search.scan_bing vs the BeautifulSoup parse, on the
+                     `*.html` pages in `--fixtures` (e.g. Bing result pages
+                     saved from a browser) or on mock pages; no server
+
+Each round runs in a fresh temporary folder (the scripts' relative
+`images/…` caches and outputs land there), so no round sees another's
+caches.  Reported: items/s and MB/s (medians over the rounds) and
+p50 / p99 latency per page or per image over all rounds.  Image latency
+is one fetch (headers + body), or one whole `_download_image` call for
+the animal downloader, which also resizes.
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from . import client, engine, metrics, mockserver, pipeline, probe, runner, search, searchcache, vqd
+
+BENCHMARKS = ("bing", "ddg", "engine", "pipeline", "runner", "download-images", "animals",
+              "bing-parse")
+TERMS      = ["red fox", "barn owl", "grey heron", "river otter"]
+ROUNDS     = 3
+SCRIPTS    = Path(__file__).resolve().parents[1] / "download-images"
+IMAGE_EXTS = set(probe.EXTENSIONS.values())
+
+
+@dataclass
+class Result:
+    name:     str
+    unit:     str                           # "pages" or "images"
+    items:    List[int] = field(default_factory=list)        # per round
+    seconds:  List[float] = field(default_factory=list)
+    bytes:    List[int] = field(default_factory=list)
+    latency:  List[float] = field(default_factory=list)      # per item, all rounds
+
+    @property
+    def per_sec(self) -> float:
+        return statistics.median(n / s for n, s in zip(self.items, self.seconds) if s)
+
+    @property
+    def mb_per_sec(self) -> float:
+        return statistics.median(b / 1e6 / s for b, s in zip(self.bytes, self.seconds) if s)
+
+    def percentile(self, q: float) -> float:
+        if not self.latency:
+            return 0.0
+        xs = sorted(self.latency)
+        return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+    def line(self) -> str:
+        return (f"  {self.name:16s} {statistics.median(self.items):6.0f} {self.unit:6s} "
+                f"{self.per_sec:8.1f} {self.unit}/s {self.mb_per_sec:7.2f} MB/s   "
+                f"p50 {self.percentile(0.5) * 1e3:7.1f} ms   p99 {self.percentile(0.99) * 1e3:7.1f} ms")
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "per_sec": self.per_sec, "mb_per_sec": self.mb_per_sec,
+                "p50": self.percentile(0.5), "p99": self.percentile(0.99),
+                "latency": len(self.latency)}
+
+
+# -------------------- helpers --------------------
+class Timings:
+    """Wraps a function so every call's duration is kept."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: List[float] = []
+
+    def wrap(self, fn: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.samples.append(time.perf_counter() - t0)
+        return timed
+
+
+@contextlib.contextmanager
+def patched(obj, name: str, value):
+    old = getattr(obj, name)
+    setattr(obj, name, value)
+    try:
+        yield
+    finally:
+        setattr(obj, name, old)
+
+
+@contextlib.contextmanager
+def scratch():
+    """A fresh temporary working directory, with the scrapers' chatter swallowed."""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="scraper-bench-") as tmp:
+        os.chdir(tmp)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()), \
+                 contextlib.redirect_stderr(io.StringIO()):
+                yield Path(tmp)
+        finally:
+            os.chdir(cwd)
+
+
+def saved(folder: Path) -> int:
+    return sum(1 for f in folder.rglob("*")
+               if f.suffix.lower() in IMAGE_EXTS and not f.name.startswith(".")
+               and f.stat().st_size > 0)
+
+
+def load_script(name: str):
+    path = SCRIPTS / name
+    spec = importlib.util.spec_from_file_location(path.stem.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def result_urls(base: str, mock: mockserver.Mock) -> List[str]:
+    return [f"{base}/img/{mockserver.term_base(t) + i}.jpg"
+            for t in TERMS for i in range(mock.results)]
+
+
+# -------------------- benchmarks --------------------
+# each runs one round in the current (scratch) directory and returns
+# (items, bytes or None for "what metrics counted", per-item latencies)
+
+def pages(make_pages) -> tuple:
+    """Time every result page of every term; bytes are the response bodies."""
+    n, size, lat = 0, 0, []
+    get = client.get
+
+    def counted(*args, **kwargs):
+        nonlocal size
+        r = get(*args, **kwargs)
+        size += len(r.content)
+        return r
+
+    with patched(client, "get", counted):
+        for term in TERMS:
+            gen = make_pages(term)
+            while True:
+                t0 = time.perf_counter()
+                page = next(gen, None)
+                if page is None:
+                    break
+                lat.append(time.perf_counter() - t0)
+                n += 1
+    return n, size, lat
+
+
+def bench_bing(base, mock):
+    return pages(lambda term: search.bing_pages(term, mock.results))
+
+
+def bench_ddg(base, mock):
+    for term in TERMS:
+        vqd.invalidate(term)                    # every round pays for its tokens
+    return pages(lambda term: search.ddg_pages(term, mock.results))
+
+
+def bench_engine(base, mock):
+    timings = Timings()
+    with patched(engine, "fetch", timings.wrap(engine.fetch)):
+        engine.download_all(result_urls(base, mock), "images/engine", "x", verbose=False)
+    return saved(Path("images")), None, timings.samples
+
+
+def bench_pipeline(base, mock):
+    timings = Timings()
+    with patched(pipeline, "fetch", timings.wrap(engine.fetch)):
+        pipeline.run(TERMS, lambda t: search.image_pages(t, mock.results),
+                     "images/pipeline", name=pipeline.sequential("x"), quiet=True)
+    return saved(Path("images")), None, timings.samples
+
+
+def bench_runner(base, mock):
+    cfg = runner.Config([runner.Subject(name=term.replace(" ", "-"), terms=[term],
+                                        images=mock.results, per_term=mock.results)
+                         for term in TERMS], output=Path("images/runner"))
+    timings = Timings()
+    with patched(pipeline, "fetch", timings.wrap(engine.fetch)):
+        runner.run_all(cfg, report_every=3600)
+    return saved(Path("images")), None, timings.samples
+
+
+def bench_download_images(base, mock):
+    script  = load_script("download-images.py")
+    timings = Timings()
+    with patched(pipeline, "fetch", timings.wrap(engine.fetch)):
+        script.download_images(TERMS, "images/x", mock.results)
+    return saved(Path("images")), None, timings.samples
+
+
+def bench_animals(base, mock):
+    script = load_script("download-animal-images.py")
+    from . import dedup, journal, phash, urlcache
+
+    per_term = mock.results // 2                # it asks for twice what it wants
+    cache = searchcache.SearchCache()
+    urls  = result_urls(base, mock)             # each term's results, one block per term
+    for k, term in enumerate(TERMS):
+        cache.put("ddg", f"{term} large", 0, urls[k * mock.results:(k + 1) * mock.results])
+
+    timings = Timings()
+    out = Path("images/animals/fox")
+    out.mkdir(parents=True)
+    seen, near, known = dedup.DedupIndex(), phash.open_index(out.parent), urlcache.UrlCache()
+    log = journal.Journal(out)
+    with patched(script, "IMAGES_PER_SUBJECT", per_term * len(TERMS)), \
+         patched(script, "_download_image", timings.wrap(script._download_image)):
+        script.download_images(TERMS, str(out), per_term, seen=seen, near=near,
+                               urls=known, cache=cache, journal=log)
+    for closeable in (log, seen, near, known, cache):
+        closeable.close()
+    return saved(Path("images")), None, timings.samples
+
+
+RUNNERS = {"bing": (bench_bing, "pages"), "ddg": (bench_ddg, "pages"),
+           "engine": (bench_engine, "images"), "pipeline": (bench_pipeline, "images"),
+           "runner": (bench_runner, "images"),
+           "download-images": (bench_download_images, "images"),
+           "animals": (bench_animals, "images")}
+
+
+# -------------------- Bing page parsing --------------------
+PARSERS = {"scan": search.scan_bing, "soup": search.soup_bing}
+
+
+def fixture_pages(folder: Optional[Path], mock: mockserver.Mock) -> List[str]:
+    """The `*.htm(l)` pages in `folder`, or the mock server's Bing pages for TERMS."""
+    if folder is not None:
+        return [f.read_text(encoding="utf-8", errors="replace")
+                for f in sorted(folder.glob("*.htm*"))]
+    return [mockserver.bing_page("http://127.0.0.1", t, first, mock)
+            for t in TERMS for first in range(1, mock.results + 1, mockserver.BING_PAGE)]
+
+
+def parse_results(pages: List[str], rounds: int = ROUNDS) -> Dict[str, Result]:
+    results = {}
+    for name, parse in PARSERS.items():
+        res = Result(f"bing-parse {name}", "pages")
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            for page in pages:
+                t = time.perf_counter()
+                parse(page)
+                res.latency.append(time.perf_counter() - t)
+            res.seconds.append(time.perf_counter() - t0)
+            res.items.append(len(pages))
+            res.bytes.append(sum(len(p.encode("utf-8")) for p in pages))
+        results[res.name] = res
+    return results
+
+
+def disagreements(pages: List[str]) -> int:
+    """Pages on which the scan and BeautifulSoup find different URLs."""
+    return sum(search.scan_bing(p) != search.soup_bing(p) for p in pages)
+
+
+def run(names, mock: mockserver.Mock, rounds: int = ROUNDS) -> Dict[str, Result]:
+    names = [n for n in names if n in RUNNERS]
+    if not names:
+        return {}
+    proc, base = mockserver.start(mock, TERMS)
+    try:
+        with patched(search, "BING_URL", f"{base}/images/search"), \
+             patched(search, "DDG_URL", f"{base}/"), \
+             patched(vqd, "TOKEN_URL", f"{base}/"):
+            results = {}
+            for name in names:
+                fn, unit = RUNNERS[name]
+                res = Result(name, unit)
+                for _ in range(rounds):
+                    with scratch():
+                        before = metrics.snapshot()["bytes"]
+                        t0 = time.perf_counter()
+                        items, size, lat = fn(base, mock)
+                        res.seconds.append(time.perf_counter() - t0)
+                        res.bytes.append(size if size is not None
+                                         else metrics.snapshot()["bytes"] - before)
+                    res.items.append(items)
+                    res.latency.extend(lat)
+                results[name] = res
+    finally:
+        proc.terminate()
+        proc.join()
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the scrapers against a local mock web")
+    ap.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    ap.add_argument("--rounds", type=int, default=ROUNDS)
+    ap.add_argument("--json", action="store_true", help="print the results as JSON")
+    ap.add_argument("--fixtures", type=Path, metavar="DIR",
+                    help="saved Bing result pages for bing-parse (default: mock pages)")
+    mockserver.add_arguments(ap)
+    args = ap.parse_args(argv)
+    mock = mockserver.from_arguments(args)
+    rounds = max(1, args.rounds)
+
+    results = run(args.only, mock, rounds)
+    differ, pages = 0, []
+    if "bing-parse" in args.only:
+        pages = fixture_pages(args.fixtures, mock)
+        if not pages:
+            ap.error(f"no .html pages in {args.fixtures}")
+        results.update(parse_results(pages, rounds))
+        differ = disagreements(pages)
+    if args.json:
+        print(json.dumps({"mock": asdict(mock), "terms": TERMS, "rounds": rounds,
+                          "results": {n: r.as_dict() for n, r in results.items()},
+                          "parse_disagreements": differ}, indent=2))
+        return
+    if any(n in RUNNERS for n in args.only):
+        print(f"{len(TERMS)} terms × {mock.results} results, {rounds} rounds; images "
+              f"{'/'.join(f'{w}x{h}' for w, h in mock.sizes)}, {mock.small:.0%} small, "
+              f"{mock.fail:.0%} failing, ~{mock.latency * 1e3:.0f} ms each")
+    for r in results.values():
+        print(r.line())
+    if pages:
+        print(f"  scan and BeautifulSoup disagree on {differ} of {len(pages)} pages")
+
+
+if __name__ == "__main__":
+    main()
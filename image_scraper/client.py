@@ -0,0 +1,198 @@
+# ----------------------------------------------
+# shared pooled HTTP client
+# ----------------------------------------------
+"""
+One `requests.Session` for every scraper, so Bing pages, DDG `i.js`
+pages and image downloads reuse keep-alive connections instead of doing
+a fresh TCP+TLS handshake per request.  Requests are paced per host by
+`image_scraper.ratelimit`.
+
+    from image_scraper import client
+    r = client.get(url, timeout=4)
+    client.print_stats()
+
+`configure()` sets the pool sizes; call it before the first request
+(calling it later rebuilds the session and drops open connections).
+
+Each request's rate-limit wait is recorded as the `ratelimit` stage of
+`image_scraper.metrics`, and `stage=` times the request itself, so that
+wait never counts towards it:
+
+    r = client.get(url, stream=True, timeout=10, stage="connect")
+
+The session's connections (not `socket`, which stays untouched) time
+the host lookup for every new connection as the `dns` stage.
+"""
+import socket
+import threading
+from collections import Counter
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.connection import allowed_gai_family
+
+from . import metrics, ratelimit
+
+POOL_CONNECTIONS = 64      # hosts kept alive at once (Bing, DDG, CDNs …)
+POOL_MAXSIZE     = 16      # sockets per host, ≥ the download concurrency
+
+
+# -------------------- DNS timing --------------------
+class _TimedLookup:
+    """urllib3 connection mixin: resolve the host under the `dns` stage, then
+    connect to each address in turn, as urllib3's own `create_connection` does."""
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            with metrics.timed("dns"):
+                infos = socket.getaddrinfo(host, self.port, allowed_gai_family(),
+                                           socket.SOCK_STREAM)
+        except OSError:
+            return super()._new_conn()          # urllib3 raises its NameResolutionError
+        error = None
+        for address in dict.fromkeys(info[4][0] for info in infos):
+            self._dns_host = address            # `host` (SNI, Host header) is read after
+            try:
+                return super()._new_conn()
+            except ConnectTimeoutError as e:    # NewConnectionError included
+                error = e
+            finally:
+                self._dns_host = host
+        raise error
+
+
+class _HTTPConnection(_TimedLookup, HTTPConnection):
+    pass
+
+
+class _HTTPSConnection(_TimedLookup, HTTPSConnection):
+    pass
+
+
+class _HTTPPool(HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+
+class _HTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    """`HTTPAdapter` whose pools open `_TimedLookup` connections."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPPool, "https": _HTTPSPool}
+
+
+_lock     = threading.Lock()
+_session: Optional[requests.Session] = None
+_requests = Counter()      # host → requests sent through the session
+_adapter: Optional[TimedAdapter] = None
+
+
+def configure(pool_connections: int = POOL_CONNECTIONS,
+              pool_maxsize: int = POOL_MAXSIZE) -> requests.Session:
+    """(Re)build the shared session with the given pool sizes."""
+    global _session, _adapter
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _adapter = TimedAdapter(pool_connections=pool_connections,
+                                pool_maxsize=pool_maxsize,
+                                pool_block=False)
+        _session = requests.Session()
+        _session.mount("http://", _adapter)
+        _session.mount("https://", _adapter)
+        _requests.clear()
+        return _session
+
+
+def session() -> requests.Session:
+    """The shared session, created with the default pool sizes on first use."""
+    if _session is None:
+        configure()
+    return _session
+
+
+def request(method: str, url: str, stage: Optional[str] = None,
+            **kwargs) -> requests.Response:
+    """Wait for the host's rate limit, then send; `stage` times the send only."""
+    host = urlsplit(url).hostname or ""
+    with _lock:
+        _requests[host] += 1
+    metrics.observe("ratelimit", ratelimit.acquire(host))
+    if stage is None:
+        return session().request(method, url, **kwargs)
+    with metrics.timed(stage):
+        return session().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def error_reason(exc: BaseException) -> str:
+    """`urlcache` outcome for a request that raised: `timeout`, `reset` or `error`."""
+    if isinstance(exc, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return "reset"
+    return "error"
+
+
+# -------------------- stats --------------------
+def stats() -> Dict[str, Dict[str, int]]:
+    """
+    Per-host connection reuse: `requests` sent, `connections` opened and
+    `reused` (requests that skipped the handshake).  Hosts whose pool was
+    evicted from the pool manager only report their request count.
+    """
+    opened = Counter()
+    if _adapter is not None:
+        pools = _adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened[pool.host] += pool.num_connections
+
+    with _lock:
+        hosts = dict(_requests)
+    return {h: {"requests":    n,
+                "connections": opened[h],
+                "reused":      max(0, n - opened[h]) if opened[h] else 0}
+            for h, n in hosts.items()}
+
+
+def print_stats(top: int = 10) -> None:
+    st = stats()
+    if not st:
+        return
+    total  = sum(s["requests"] for s in st.values())
+    reused = sum(s["reused"] for s in st.values())
+    print(f"HTTP: {total} requests to {len(st)} hosts, "
+          f"{reused} on reused connections ({reused / total:.0%})")
+    busiest = sorted(st.items(), key=lambda kv: kv[1]["requests"], reverse=True)
+    for host, s in busiest[:top]:
+        print(f"  {host:40s} {s['requests']:5d} req  "
+              f"{s['connections']:3d} conn  {s['reused']:5d} reused")
+    for rule, w in ratelimit.stats().items():
+        print(f"  rate limit {rule}: {w['waits']} waits, "
+              f"{w['wait_seconds']:.1f}s total")
+
+    from . import vqd                   # vqd imports this module
+    tokens = vqd.stats()
+    if any(tokens.values()):
+        print(f"  DDG vqd tokens: {tokens['hits']} hits, {tokens['misses']} misses, "
+              f"{tokens['refreshes']} refreshes, {tokens['invalidated']} invalidated, "
+              f"{tokens['failures']} failures")
@@ -0,0 +1,122 @@
+# ----------------------------------------------
+# content-addressed duplicate index
+# ----------------------------------------------
+"""
+SHA-256 of the downloaded bytes → the file that already holds them.
+
+The same photo keeps coming back from different search terms, from both
+Bing and DDG, and from earlier runs.  Checking the digest before a file
+is named and written means a duplicate costs one hash instead of a new
+`{subject}_{NNNN}.jpg`, disk space and a wasted training sample.
+
+The index lives in one SQLite file (by default `images/.sha256.sqlite`,
+shared by every subject under `images/`) and is loaded into a dict on
+open, so lookups stay O(1) with hundreds of thousands of files.  Files
+that were saved before the index existed are picked up by `backfill()`.
+
+Writers that share the index (the runner's subjects, the animal
+downloader's threads) `claim()` a digest before writing: the claim is
+seen by every other writer at once but only kept in memory.  `add()`
+once the file is committed on disk makes it a row; `release()` if the
+write fails.  A crash in between leaves no row pointing at a file that
+never appeared.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+DEFAULT_DB   = "images/.sha256.sqlite"
+COMMIT_EVERY = 100              # rows per transaction; backfill() repairs a crash
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class DedupIndex:
+    def __init__(self, db_path=DEFAULT_DB):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS blobs ("
+                        " sha256 TEXT PRIMARY KEY,"
+                        " path   TEXT NOT NULL,"
+                        " added  REAL NOT NULL)")
+        self.lock    = threading.Lock()
+        self.hashes  = dict(self.db.execute("SELECT sha256, path FROM blobs"))
+        self.paths   = set(self.hashes.values())
+        self.claimed: Dict[str, str] = {}   # sha → path being written, not committed yet
+        self.pending = 0
+
+    def __contains__(self, sha: str) -> bool:
+        return sha in self.hashes or sha in self.claimed
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def lookup(self, sha: str) -> Optional[str]:
+        """Path already holding (or being written with) these bytes, or None."""
+        return self.hashes.get(sha) or self.claimed.get(sha)
+
+    def add(self, sha: str, path) -> bool:
+        """Record committed `path` for `sha` (ending its claim); False if already known."""
+        with self.lock:
+            self.claimed.pop(sha, None)
+            return self._add(sha, str(path))
+
+    def claim(self, sha: str, path) -> Optional[str]:
+        """
+        Atomically reserve `sha` for `path` before writing it.  Returns the
+        existing (or claimed) path if the bytes are a duplicate, else None.
+        Call `add()` once the file is committed, `release()` if the write fails.
+        """
+        with self.lock:
+            if sha in self.hashes:
+                return self.hashes[sha]
+            if sha in self.claimed:
+                return self.claimed[sha]
+            self.claimed[sha] = str(path)
+            return None
+
+    def release(self, sha: str) -> None:
+        """Give up a claim whose write failed."""
+        with self.lock:
+            self.claimed.pop(sha, None)
+
+    def _add(self, sha: str, path: str) -> bool:
+        if sha in self.hashes:
+            return False
+        self.hashes[sha] = path
+        self.paths.add(path)
+        self.db.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?)",
+                        (sha, path, time.time()))
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY:
+            self.db.commit()
+            self.pending = 0
+        return True
+
+    def backfill(self, folder, pattern: str = "*") -> int:
+        """Hash files in `folder` the index doesn't know yet; returns how many."""
+        added = 0
+        for f in sorted(Path(folder).glob(pattern)):
+            if not f.is_file() or f.name.startswith(".") or str(f) in self.paths:
+                continue
+            if self.add(digest(f.read_bytes()), f):
+                added += 1
+            else:
+                self.paths.add(str(f))      # a duplicate already on disk
+        self.commit()
+        return added
+
+    def commit(self) -> None:
+        with self.lock:
+            self.db.commit()
+            self.pending = 0
+
+    def close(self) -> None:
+        self.commit()
+        self.db.close()
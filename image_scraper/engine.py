@@ -0,0 +1,191 @@
+# ----------------------------------------------
+# asyncio download engine
+# ----------------------------------------------
+"""
+Bounded-concurrency replacement for the serial `for url in urls:
+requests.get(...)` loops in the scrapers.
+
+Up to `concurrency` URLs are in flight at once.  Blocking network and
+PIL work runs on a private thread pool so the event loop only does the
+book-keeping: handing out `{subject}_{NNNN}.jpg` names in order and
+stopping as soon as `limit` images have been saved.
+"""
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from PIL import Image
+
+from . import client, metrics, probe
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_TIMEOUT     = 4          # seconds, same as the old serial loops
+
+
+@dataclass
+class DownloadStats:
+    attempted:  int = 0
+    saved:      int = 0
+    failed:     int = 0
+    duplicates: int = 0
+    cached:     int = 0          # skipped thanks to the URL outcome cache
+    cancelled:  int = 0          # dropped unsaved once the limit was reached
+    bytes:      int = 0
+    elapsed:    float = 0.0
+
+    @property
+    def images_per_sec(self) -> float:
+        return self.saved / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.bytes / 1e6 / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        cached = f"{self.cached} cached, " if self.cached else ""
+        cancelled = f"{self.cancelled} cancelled, " if self.cancelled else ""
+        return (f"{self.saved}/{self.attempted} saved, {self.failed} failed, "
+                f"{self.duplicates} duplicates, {cached}{cancelled}"
+                f"{self.elapsed:.1f}s → {self.images_per_sec:.1f} img/s, "
+                f"{self.mb_per_sec:.2f} MB/s")
+
+
+# -------------- blocking helpers (run on the pool) --------------
+def fetch(url: str, timeout: float,
+          max_bytes: int = probe.MAX_IMAGE) -> Tuple[Optional[bytes], str]:
+    """
+    (body, "ok") or (None, reason) with a `urlcache` reason string.
+
+    The body is streamed: a non-image Content-Type, a Content-Length over
+    `max_bytes` or a first chunk that isn't an image format (HTML error
+    pages …) end the transfer at once, and so does passing `max_bytes`
+    while reading.
+
+    Time to the response headers (after the host's rate-limit wait) and
+    the body transfer are recorded as the `connect` and `transfer` stages
+    of `image_scraper.metrics`.
+    """
+    try:
+        r = client.get(url, timeout=timeout, stream=True, stage="connect")
+    except Exception as e:
+        return None, client.error_reason(e)
+    t0 = time.perf_counter()
+    try:
+        if r.status_code != 200:
+            return None, f"http_{r.status_code}"
+        if not probe.is_image_type(r.headers.get("Content-Type")):
+            probe.aborted("not_image", r, 0)
+            return None, "invalid"
+        if probe.too_large(r, max_bytes):
+            probe.aborted("too_large", r, 0)
+            return None, "too_large"
+        chunks = r.iter_content(probe.CHUNK)
+        first = next(chunks, b"")
+        if probe.sniff(first) is None:
+            probe.aborted("not_image", r, len(first))
+            return None, "invalid"
+        data = probe.read_rest(chunks, first, max_bytes)
+        if data is None:
+            probe.aborted("too_large", r, max_bytes)
+            return None, "too_large"
+        metrics.observe("transfer", time.perf_counter() - t0)
+        metrics.transferred(len(data))
+        return data, "ok"
+    except Exception as e:
+        return None, client.error_reason(e)
+    finally:
+        r.close()
+
+
+def fetch_bytes(url: str, timeout: float) -> Optional[bytes]:
+    return fetch(url, timeout)[0]
+
+
+def verify_bytes(data: bytes) -> bool:
+    """Same `Image.verify()` check the scripts ran on the written file."""
+    try:
+        Image.open(io.BytesIO(data)).verify()
+        return True
+    except Exception:
+        return False
+
+
+# -------------------- engine --------------------
+async def _run(urls: Iterable[str], out_dir: Path, subject: str,
+               start: int, limit: int, concurrency: int,
+               timeout: float, verbose: bool) -> DownloadStats:
+    loop  = asyncio.get_running_loop()
+    stats = DownloadStats()
+    queue = iter(urls)
+    index = start                      # last number handed out
+
+    def done() -> bool:
+        return index - start >= limit
+
+    async def worker(pool: ThreadPoolExecutor) -> None:
+        nonlocal index
+        while not done():
+            url = next(queue, None)
+            if url is None:
+                return
+            stats.attempted += 1
+            try:
+                data = await loop.run_in_executor(pool, fetch_bytes, url, timeout)
+            except Exception as e:
+                if verbose:
+                    print(f"    ✗ {e}")
+                stats.failed += 1
+                continue
+            if data is None or not await loop.run_in_executor(pool, verify_bytes, data):
+                stats.failed += 1
+                continue
+            if done():                 # other workers filled the quota
+                stats.cancelled += 1
+                return
+
+            # names are only handed out for verified images, so the
+            # sequence stays gap-free exactly like the serial loop
+            index += 1
+            fn = f"{subject}_{index:04d}.jpg"
+            try:
+                await loop.run_in_executor(pool, (out_dir / fn).write_bytes, data)
+            except OSError as e:
+                print(f"    ✗ {fn}: {e}")
+                stats.failed += 1
+                continue
+            stats.saved += 1
+            stats.bytes += len(data)
+            if verbose:
+                print(f"    saved {fn}", end="\r")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        await asyncio.gather(*(worker(pool) for _ in range(concurrency)))
+    stats.elapsed = time.perf_counter() - t0
+    return stats
+
+
+def download_all(urls: Iterable[str], out_dir, subject: str, start: int = 0,
+                 limit: Optional[int] = None,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 verbose: bool = True) -> DownloadStats:
+    """
+    Download `urls` into `out_dir` as `{subject}_{NNNN}.jpg`, numbering
+    from `start + 1`, and stop once `limit` images have been saved.
+
+    Pass `concurrency=1` to reproduce the old serial behaviour when
+    comparing throughput.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if limit is None:
+        limit = float("inf")
+    if limit <= 0:
+        return DownloadStats()
+    return asyncio.run(_run(urls, out_dir, subject, start, limit,
+                            max(1, concurrency), timeout, verbose))
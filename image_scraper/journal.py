@@ -0,0 +1,186 @@
+# ----------------------------------------------
+# append-only resume journal
+# ----------------------------------------------
+"""
+Per-folder log of what a scraper run got through, so a restarted run
+picks up exactly where the last one died instead of re-deriving its
+state from the directory listing (and re-searching every term).
+
+`<folder>/.journal.jsonl` gets one JSON object per line:
+
+    {"e": "base",  "count": 412}                  folder contents before the journal
+    {"e": "alloc", "file": "acne_0413.jpg", "url": …, "atomic": true}   name handed out
+    {"e": "saved", "file": "acne_0413.jpg"}       file renamed into place
+    {"e": "url",   "url": …, "outcome": "http_404"}
+    {"e": "term",  "term": "acne on cheeks"}      every result handled for good
+
+Replaying it on open is O(journal): done terms are skipped, URLs with
+a final outcome aren't fetched again and `start()` says how many images
+the folder holds.  Transient failures (timeouts, resets, 429, 5xx,
+`error`) are logged but don't count as known: the next run asks
+`image_scraper.urlcache` again, whose TTLs decide when to retry them.
+For the same reason a term is only logged done (see `settled()`) when
+none of its results failed transiently.  Lines are flushed as they're written and fsync'ed every
+`SYNC_EVERY` records; a torn last line from a crash is ignored.  A name
+that was allocated but never marked saved is checked on disk once, so
+an image renamed just before the crash is still counted.  That a
+non-empty file exists only proves the save finished when the writer
+renames into place (`atomic`, as `store.AtomicWriter`, `sequence` and
+`shards` do); a file from any other writer must also decode, and a
+truncated one is deleted.
+
+`close()` compacts the log: it is rewritten (atomically, via a `.part`
+file) with one line per saved file, final URL outcome and done term, so
+it stays proportional to what the folder holds rather than to how many
+runs it took.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from PIL import Image
+
+JOURNAL_NAME = ".journal.jsonl"
+SYNC_EVERY   = 64
+TRANSIENT    = {"timeout", "reset", "error", "http_429"}     # plus every http_5xx
+
+
+def final(outcome: str) -> bool:
+    """True if a URL with this outcome isn't worth fetching again."""
+    return outcome not in TRANSIENT and not outcome.startswith("http_5")
+
+
+def _decodes(path: Path) -> bool:
+    try:
+        with Image.open(path) as img:
+            img.verify()
+        return True
+    except Exception:
+        return False
+
+
+class Journal:
+    def __init__(self, folder, name: str = JOURNAL_NAME, sync_every: int = SYNC_EVERY):
+        self.folder     = Path(folder)
+        self.path       = self.folder / name
+        self.sync_every = sync_every
+        self.lock       = threading.Lock()
+
+        self.base: Optional[int]  = None
+        self.done_terms: Set[str] = set()
+        self.urls: Dict[str, str] = {}        # url → outcome
+        self.files: Set[str]      = set()     # saved since `base`
+        self.allocs: Dict[str, Tuple[Optional[str], bool]] = {}   # file → (url, atomic), not saved yet
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue                      # torn write
+                    e = rec.get("e")
+                    if e == "base":
+                        self.base = rec["count"]
+                    elif e == "alloc":
+                        self.allocs[rec["file"]] = (rec.get("url"), rec.get("atomic", False))
+                    elif e == "saved":
+                        self._mark_saved(rec["file"])
+                    elif e == "url":
+                        self.urls[rec["url"]] = rec["outcome"]
+                    elif e == "term":
+                        self.done_terms.add(rec["term"])
+
+        self.out     = open(self.path, "a", encoding="utf-8")
+        self.pending = 0
+        for fn, (_, atomic) in list(self.allocs.items()):   # crashed between write and log
+            f = self.folder / fn
+            if f.exists() and f.stat().st_size > 0 and (atomic or _decodes(f)):
+                self.saved(fn)
+            else:
+                if not atomic and f.exists() and f.stat().st_size > 0:
+                    f.unlink()                       # truncated by the crash
+                del self.allocs[fn]
+
+    # -------------------- replayed state --------------------
+    def start(self, count_existing: Callable[[], int]) -> int:
+        """Images in the folder: baseline + saved.  A new journal asks `count_existing()` once."""
+        if self.base is None:
+            self.base = count_existing()
+            self._append({"e": "base", "count": self.base})
+        return self.base + len(self.files)
+
+    def knows(self, url: str) -> bool:
+        """True if `url` already has a final outcome here (saved, 404, invalid …)."""
+        outcome = self.urls.get(url)
+        return outcome is not None and final(outcome)
+
+    def settled(self, urls: Iterable[str]) -> bool:
+        """True unless one of `urls` last failed transiently (its term isn't done yet)."""
+        return all(final(self.urls.get(url, "saved")) for url in urls)
+
+    # -------------------- records --------------------
+    def allocated(self, file: str, url: Optional[str] = None, atomic: bool = True) -> None:
+        """`file` is about to be written with the image from `url` (renamed into place if `atomic`)."""
+        with self.lock:
+            self.allocs[file] = (url, atomic)
+        self._append({"e": "alloc", "file": file, "url": url, "atomic": atomic})
+
+    def saved(self, file: str) -> None:
+        """`file` is in place; its URL counts as done from now on."""
+        with self.lock:
+            self._mark_saved(file)
+        self._append({"e": "saved", "file": file})
+
+    def _mark_saved(self, file: str) -> None:
+        url, _ = self.allocs.pop(file, (None, True))
+        self.files.add(file)
+        if url:
+            self.urls[url] = "saved"
+
+    def url(self, url: str, outcome: str) -> None:
+        with self.lock:
+            self.urls[url] = outcome
+        self._append({"e": "url", "url": url, "outcome": outcome})
+
+    def term_done(self, term: str) -> None:
+        with self.lock:
+            self.done_terms.add(term)
+        self._append({"e": "term", "term": term})
+
+    def _append(self, rec: dict) -> None:
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.out.write(line)
+            self.out.flush()
+            self.pending += 1
+            if self.pending >= self.sync_every:
+                os.fsync(self.out.fileno())
+                self.pending = 0
+
+    def compact(self) -> None:
+        """Rewrite the log with just the replayed state, dropping transient outcomes."""
+        recs = [{"e": "base", "count": self.base}] if self.base is not None else []
+        recs += [{"e": "alloc", "file": fn, "url": url, "atomic": atomic}
+                 for fn, (url, atomic) in self.allocs.items()]
+        recs += [{"e": "saved", "file": fn} for fn in sorted(self.files)]
+        recs += [{"e": "url", "url": url, "outcome": outcome}
+                 for url, outcome in self.urls.items() if final(outcome)]
+        recs += [{"e": "term", "term": term} for term in sorted(self.done_terms)]
+        tmp = self.path.with_name(self.path.name + ".part")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for rec in recs:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def close(self) -> None:
+        with self.lock:
+            self.out.flush()
+            os.fsync(self.out.fileno())
+            self.out.close()
+            self.compact()
@@ -0,0 +1,386 @@
+# ----------------------------------------------
+# dataset manifest
+# ----------------------------------------------
+"""
+One SQLite row per image under a dataset folder, so training and the
+downloaders stop walking directories to list, count and number files.
+
+    <root>/.manifest.sqlite                 e.g. images/.manifest.sqlite
+
+    path                                 class  sha256  width  height  bytes  source    split
+    acne/acne_0001.jpg                   acne   9f2c…   800    600     53122  https://… train
+    acne/acne-000001.tar/acne_0413.jpg   acne   41d0…   1024   768     88410  https://… valid
+
+`path` is relative to the root; images inside tar shards (see
+`image_scraper.shards`) are `<shard>.tar/<name>` and also keep their
+byte offset in the shard.  `class` is the folder holding the image
+(fastai's `parent_label`) or the shard sidecar's label.  `split` is
+`valid` for about VALID_PCT % of the images, picked from the hash (the
+path when there is none) so a rebuilt manifest agrees with the old one,
+unless a `train` / `valid` / `test` folder on the path says otherwise.
+
+The downloaders add rows as they save (`pipeline.run(manifest=…)`, the
+runner and both download scripts) and take counts and used names from
+the manifest instead of globbing.  `sync()` stats every folder the
+manifest knows; only one whose mtime moved since it was last marked in
+sync (files copied in by hand, a crash before the rows were committed)
+is listed again, and only its new files are read.  A folder is marked
+by `commit(folder)` once its writer has finished, never by the periodic
+commits in between: a file renamed in just before a crash, whose row
+wasn't added yet, must still make the next `sync()` look.  A manifest that doesn't exist
+yet is built by a full scan on first use.
+
+    DataBlock(blocks=(ImageBlock, CategoryBlock),
+              get_items=manifest.get_items, get_x=manifest.image,
+              get_y=manifest.label, …)
+
+`get_items(folder)` returns plain files as Paths and shard members as
+`shards.Sample`s; `image` and `label` take either.
+
+    python -m image_scraper.manifest images               # sync, counts per class
+    python -m image_scraper.manifest images --rebuild     # re-read every file
+"""
+import argparse
+import fnmatch
+import io
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from . import probe, shards
+from .dedup import digest
+
+DB_NAME      = ".manifest.sqlite"
+COMMIT_EVERY = 100
+WORKERS      = 16               # threads reading files in a scan (hashing and I/O drop the GIL)
+VALID_PCT    = 20
+SPLITS       = ("train", "valid", "test")
+
+Item = Union[Path, shards.Sample]
+Facts = Tuple[Optional[int], Optional[int], int]     # (width, height, bytes)
+
+
+def describe(data: bytes) -> Facts:
+    """(width, height, bytes) of an image, from its header when the probe can parse it."""
+    size = probe.image_size(data[:probe.MAX_BYTES])
+    if size is not None:
+        return size[1], size[2], len(data)
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return img.size[0], img.size[1], len(data)
+    except Exception:
+        return None, None, len(data)
+
+
+def split_for(rel: str, sha: Optional[str]) -> str:
+    """`train` / `valid` / `test` from a folder on the path, else from the hash."""
+    for part in Path(rel).parts[:-1]:
+        if part in SPLITS:
+            return part
+    key = sha or digest(rel.encode("utf-8"))
+    return "valid" if int(key[:8], 16) % 100 < VALID_PCT else "train"
+
+
+def _is_image(name: str) -> bool:
+    return not name.startswith(".") and os.path.splitext(name)[1].lower() in shards.IMAGE_EXTS
+
+
+def _read(path: Path) -> Tuple[str, Facts]:
+    data = path.read_bytes()
+    return digest(data), describe(data)
+
+
+class Manifest:
+    def __init__(self, root, db_name: str = DB_NAME):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.path = self.root / db_name
+        self.new  = not self.path.exists()
+        self.db   = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS images ("
+                        " path         TEXT PRIMARY KEY,"
+                        " class        TEXT NOT NULL,"
+                        " sha256       TEXT,"
+                        " width        INTEGER,"
+                        " height       INTEGER,"
+                        " bytes        INTEGER,"
+                        " source       TEXT,"
+                        " split        TEXT NOT NULL,"
+                        " shard_offset INTEGER,"          # image data offset in a tar shard
+                        " folder       TEXT NOT NULL)")   # folder holding the file / shard
+        self.db.execute("CREATE INDEX IF NOT EXISTS images_class ON images (class)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS images_folder ON images (folder)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS folders ("
+                        " path  TEXT PRIMARY KEY,"
+                        " mtime INTEGER NOT NULL)")       # st_mtime_ns when last in sync
+        self.lock    = threading.Lock()
+        self.pending = 0
+        self.touched = set()                              # folders added to since they were stamped
+
+    def _rel(self, path) -> str:
+        return Path(os.path.relpath(path, self.root)).as_posix()
+
+    def _stamp(self, folder: str) -> Optional[int]:
+        try:
+            return (self.root / folder).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    # -------------------- writing --------------------
+    def add(self, path, sha: Optional[str] = None, source: Optional[str] = None,
+            width: Optional[int] = None, height: Optional[int] = None,
+            nbytes: Optional[int] = None, label: Optional[str] = None,
+            offset: Optional[int] = None) -> None:
+        """Record an image that is on disk (`offset` for one inside a tar shard)."""
+        rel    = self._rel(path)
+        parent = Path(rel).parent
+        folder = parent.parent if offset is not None else parent
+        cls    = label or (folder.name if offset is not None else parent.name)
+        row    = (rel, cls, sha, width, height, nbytes, source, split_for(rel, sha),
+                  offset, folder.as_posix())
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            row)
+            self.touched.add(row[-1])
+            self.pending += 1
+            if self.pending >= COMMIT_EVERY:
+                self._commit()
+
+    def record(self, path, data: bytes, source: Optional[str] = None,
+               sha: Optional[str] = None, label: Optional[str] = None,
+               offset: Optional[int] = None) -> None:
+        """`add()` with the hash and size taken from the image's bytes."""
+        self.add(path, sha or digest(data), source, *describe(data), label=label, offset=offset)
+
+    def _commit(self) -> None:
+        self.db.commit()
+        self.pending = 0
+
+    def commit(self, folders: Optional[Iterable] = None) -> None:
+        """
+        Commit pending rows and mark `folders` (default: every folder added
+        to) in sync at their current mtime.  Pass only folders nothing is
+        being written to any more; `()` just commits the rows.
+        """
+        with self.lock:
+            done = (set(self.touched) if folders is None
+                    else {self._rel(f) for f in folders} & self.touched)
+            for folder in done:
+                stamp = self._stamp(folder)
+                if stamp is not None:
+                    self.db.execute("INSERT OR REPLACE INTO folders VALUES (?, ?)", (folder, stamp))
+            self.touched -= done
+            self._commit()
+
+    def close(self) -> None:
+        """Commit the rows; folders not marked with `commit(folder)` are listed by the next `sync()`."""
+        self.commit(())
+        self.db.close()
+
+    # -------------------- scanning --------------------
+    def sync(self, workers: int = WORKERS) -> int:
+        """Bring the rows up to date with the folders; returns rows added or dropped."""
+        if self.new:
+            self.new = False
+            return self.build(workers)
+        self.commit(())
+        known = dict(self.db.execute("SELECT path, mtime FROM folders"))
+        todo  = ["."] + [f for f in known if f != "."]
+        return self._scan(todo, known, workers)
+
+    def build(self, workers: int = WORKERS) -> int:
+        """Forget every row and read every image under the root again."""
+        with self.lock:
+            self.db.execute("DELETE FROM images")
+            self.db.execute("DELETE FROM folders")
+            self.touched.clear()
+            self.db.commit()
+        return self._scan(["."], {}, workers)
+
+    def _scan(self, todo: List[str], known: Dict[str, int], workers: int) -> int:
+        files: List[Tuple[str, Path]] = []          # (folder, file) to read
+        tars:  List[Tuple[str, Path]] = []          # (folder, shard) to index
+        gone:  List[str] = []                       # rows and folders that vanished
+        stamps: Dict[str, int] = {}
+        seen = set(todo)
+        while todo:
+            folder = todo.pop()
+            stamp  = self._stamp(folder)
+            if stamp is None:                       # folder deleted
+                gone.append(folder)
+                continue
+            if known.get(folder) == stamp:
+                continue
+            stamps[folder] = stamp
+            with self.lock:
+                rows = dict(self.db.execute(
+                    "SELECT path, shard_offset FROM images WHERE folder = ?", (folder,)))
+            shard_rows = {p.rsplit("/", 1)[0] for p, off in rows.items() if off is not None}
+            listed = set()
+            with os.scandir(self.root / folder) as it:
+                for e in it:
+                    rel = Path(folder, e.name).as_posix() if folder != "." else e.name
+                    if e.name.startswith("."):
+                        continue
+                    if e.is_dir():
+                        if rel not in seen:
+                            seen.add(rel)
+                            todo.append(rel)
+                    elif e.name.endswith(".tar"):
+                        listed.add(rel)
+                        if rel not in shard_rows or e.stat().st_mtime_ns > known.get(folder, 0):
+                            tars.append((folder, Path(e.path)))
+                    elif _is_image(e.name):
+                        listed.add(rel)
+                        if rel not in rows:
+                            files.append((folder, Path(e.path)))
+            gone.extend(p for p, off in rows.items()
+                        if (p if off is None else p.rsplit("/", 1)[0]) not in listed)
+
+        changed = 0
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for (folder, f), (sha, facts) in zip(files, pool.map(_read, [f for _, f in files])):
+                self.add(f, sha, None, *facts)
+                changed += 1
+            for (folder, shard), samples in zip(tars, pool.map(shards.index, [s for _, s in tars])):
+                with self.lock:
+                    self.db.execute("DELETE FROM images WHERE path GLOB ?",
+                                    (self._rel(shard) + "/*",))
+                for s in samples:
+                    m = s.meta
+                    self.add(Path(s.shard, s.name), m.get("sha256"), m.get("url"),
+                             m.get("width"), m.get("height"), s.size, s.label, s.offset)
+                    changed += 1
+        with self.lock:
+            for p in gone:                          # a vanished file, or a deleted folder
+                self.db.execute("DELETE FROM images WHERE path = ? OR folder = ?", (p, p))
+                self.db.execute("DELETE FROM folders WHERE path = ?", (p,))
+            for folder, stamp in stamps.items():
+                self.db.execute("INSERT OR REPLACE INTO folders VALUES (?, ?)", (folder, stamp))
+            self.touched.difference_update(stamps)
+            self.db.commit()
+            self.pending = 0
+        return changed + len(gone)
+
+    # -------------------- reading --------------------
+    def _where(self, cls: Optional[str], split: Optional[str]) -> Tuple[str, tuple]:
+        conds, args = [], []
+        if cls is not None:
+            conds.append("class = ?")
+            args.append(cls)
+        if split is not None:
+            conds.append("split = ?")
+            args.append(split)
+        return (" WHERE " + " AND ".join(conds) if conds else ""), tuple(args)
+
+    def items(self, cls: Optional[str] = None, split: Optional[str] = None) -> List[Item]:
+        """Every image (of `cls` / `split`): Paths for files, `shards.Sample`s for shard members."""
+        where, args = self._where(cls, split)
+        out: List[Item] = []
+        with self.lock:
+            rows = self.db.execute("SELECT path, class, shard_offset, bytes, sha256, source"
+                                   " FROM images" + where + " ORDER BY path", args).fetchall()
+        for rel, label, offset, size, sha, source in rows:
+            if offset is None:
+                out.append(self.root / rel)
+            else:
+                shard, name = rel.rsplit("/", 1)
+                out.append(shards.Sample(str(self.root / shard), name, offset, size, label,
+                                         {"sha256": sha, "url": source}))
+        return out
+
+    def counts(self, split: Optional[str] = None) -> Dict[str, int]:
+        """Images per class."""
+        where, args = self._where(None, split)
+        with self.lock:
+            return dict(self.db.execute("SELECT class, COUNT(*) FROM images" + where +
+                                        " GROUP BY class ORDER BY class", args))
+
+    def names(self, cls: str, pattern: str = "*") -> List[str]:
+        """File names of `cls`'s images matching `pattern` (for picking the next number)."""
+        with self.lock:
+            rows = self.db.execute("SELECT path FROM images WHERE class = ?", (cls,)).fetchall()
+        names = [p.rsplit("/", 1)[-1] for p, in rows]
+        return names if pattern == "*" else fnmatch.filter(names, pattern)
+
+    def count(self, cls: str, pattern: str = "*") -> int:
+        if pattern == "*":
+            with self.lock:
+                return self.db.execute("SELECT COUNT(*) FROM images WHERE class = ?",
+                                       (cls,)).fetchone()[0]
+        return len(self.names(cls, pattern))
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def summary(self) -> str:
+        per_class = self.counts()
+        valid = sum(self.counts("valid").values())
+        return (f"Manifest: {sum(per_class.values())} images in {len(per_class)} classes "
+                f"({valid} valid)")
+
+
+# -------------------- fastai --------------------
+_loaded: Dict[str, Manifest] = {}
+_loaded_lock = threading.Lock()
+
+
+def load(folder) -> Manifest:
+    """`folder`'s manifest, synced once per process (built on first use)."""
+    key = os.path.abspath(folder)
+    with _loaded_lock:
+        if key not in _loaded:
+            m = Manifest(folder)
+            m.sync()
+            _loaded[key] = m
+        return _loaded[key]
+
+
+def get_items(folder) -> List[Item]:
+    """Every image under `folder`, from its manifest (a fastai `get_items`)."""
+    return load(folder).items()
+
+
+def counts(folder) -> Dict[str, int]:
+    return load(folder).counts()
+
+
+def image(item: Item):
+    """What `PILImage.create` takes: the path, or a shard member's bytes (a fastai `get_x`)."""
+    return shards.read(item) if isinstance(item, shards.Sample) else item
+
+
+def label(item: Item) -> str:
+    """The item's class (a fastai `get_y`)."""
+    return item.label if isinstance(item, shards.Sample) else Path(item).parent.name
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build or update a dataset folder's image manifest")
+    ap.add_argument("folder", type=Path, help="dataset root, e.g. images or images/train")
+    ap.add_argument("--rebuild", action="store_true", help="re-read every file, not just changed folders")
+    ap.add_argument("--workers", type=int, default=WORKERS, help="threads reading files")
+    args = ap.parse_args(argv)
+    if not args.folder.is_dir():
+        ap.error(f"no folder {args.folder}")
+
+    t0 = time.perf_counter()
+    m = Manifest(args.folder)
+    changed = m.build(args.workers) if args.rebuild else m.sync(args.workers)
+    elapsed = time.perf_counter() - t0
+    for cls, n in m.counts().items():
+        print(f"  {cls:30s} {n:7d}")
+    print(f"{m.summary()}; {changed} rows changed in {elapsed:.2f}s → {m.path}")
+    m.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+# ----------------------------------------------
+# per-stage timing, throughput and outcome metrics
+# ----------------------------------------------
+"""
+Where a scrape's time goes, not just how long it took.
+
+One process-wide registry (like the `client` and `probe` stats) that the
+scraper modules feed as they work:
+
+    with metrics.timed("transfer"):
+        data = b"".join(chunks)
+    metrics.transferred(len(data))
+    metrics.outcome("too_small")            # or "saved", "http_404" …
+    metrics.depth("download", q.qsize())
+    metrics.throttled("bing.com", 0.4)      # fed by `ratelimit`
+
+Stages, each a latency histogram:
+
+    search    one result page: rate-limit wait, request and parse (cache
+              hits aren't timed)
+    ratelimit waiting for the host's token bucket before a request (0 for
+              hosts without a rule)
+    dns       host lookup for a new connection
+    connect   request sent → response headers (the lookup and TCP/TLS on
+              new connections plus the server's time to first byte)
+    transfer  response headers → last body byte
+    verify    magic sniff + header parse / `Image.verify()`
+    decode    full decode for the perceptual hash
+    resize    decode + resample + re-encode on the resize pool
+    disk      writing the file (and its batch's fsync)
+
+An `Exporter` thread snapshots the registry every `every` seconds into
+`<folder>/<job>.jsonl` (one JSON object per line: per-stage count / mean /
+p50 / p99, bytes/s since the last line, outcomes, queue depths, and per
+rate-limit rule the requests that waited and seconds spent) and into
+`<folder>/<job>.prom` in the Prometheus text format (every series
+labelled `scraper="<job>"`), replaced atomically so node_exporter's
+textfile collector (`--collector.textfile.directory`) never reads half
+a file:
+
+    with metrics.Exporter("images/.metrics", job="animals", limiter=limiter):
+        ...
+
+`summary()` is the same per-stage table as a few lines of text.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+STAGES  = ("search", "ratelimit", "dns", "connect", "transfer",
+           "verify", "decode", "resize", "disk")
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0)          # seconds; +Inf is implicit
+EVERY   = 15.0                                  # seconds between exports
+PREFIX  = "image_scraper"
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, Prometheus style."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts  = [0] * (len(self.buckets) + 1)    # last one is +Inf
+        self.count   = 0
+        self.sum     = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum   += seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the largest bound past the last one)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def snapshot(self) -> dict:
+        return {"count": self.count, "sum": round(self.sum, 6),
+                "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+
+class Registry:
+    def __init__(self):
+        self.lock     = threading.Lock()
+        self.t0       = time.time()
+        self.stages: Dict[str, Histogram] = {s: Histogram() for s in STAGES}
+        self.outcomes = Counter()               # "saved" / reject reason → count
+        self.depths: Dict[str, int] = {}        # queue → items waiting
+        self.bytes    = 0                       # response bytes read
+        self.waits: Dict[str, List] = {}        # rate-limit rule → [waits, seconds]
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram()
+            self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def outcome(self, outcome: str, n: int = 1) -> None:
+        with self.lock:
+            self.outcomes[outcome] += n
+
+    def transferred(self, n: int) -> None:
+        with self.lock:
+            self.bytes += n
+
+    def throttled(self, rule: str, seconds: float) -> None:
+        """A request held back `seconds` by the rate limit for `rule`."""
+        with self.lock:
+            w = self.waits.setdefault(rule, [0, 0.0])
+            w[0] += 1
+            w[1] += seconds
+
+    def depth(self, queue: str, n: int) -> None:
+        with self.lock:
+            self.depths[queue] = n
+
+    def adjust(self, queue: str, delta: int) -> None:
+        """Move a queue depth by `delta` (for queues that can't be asked their size)."""
+        with self.lock:
+            self.depths[queue] = self.depths.get(queue, 0) + delta
+
+    # -------------------- views --------------------
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"time":     round(time.time(), 3),
+                    "uptime":   round(time.time() - self.t0, 3),
+                    "bytes":    self.bytes,
+                    "stages":   {s: h.snapshot() for s, h in self.stages.items() if h.count},
+                    "outcomes": dict(self.outcomes),
+                    "depths":   dict(self.depths),
+                    "ratelimit": {r: {"waits": n, "wait_seconds": round(t, 6)}
+                                  for r, (n, t) in self.waits.items()}}
+
+    def prometheus(self, labels: Optional[Dict[str, str]] = None,
+                   gauges: Optional[Dict[str, float]] = None) -> str:
+        """The registry in the Prometheus text exposition format."""
+        base = "".join(f'{k}="{_escape(v)}",' for k, v in (labels or {}).items())
+        lines: List[str] = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+        with self.lock:
+            family("stage_seconds", "histogram", "Time spent per item in each scraper stage.")
+            for stage, h in self.stages.items():
+                lab, cum = f'{base}stage="{stage}"', 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cum += n
+                    lines.append(f'{PREFIX}_stage_seconds_bucket{{{lab},le="{bound}"}} {cum}')
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{{lab},le="+Inf"}} {h.count}')
+                lines.append(f"{PREFIX}_stage_seconds_sum{{{lab}}} {h.sum:.6f}")
+                lines.append(f"{PREFIX}_stage_seconds_count{{{lab}}} {h.count}")
+
+            family("downloaded_bytes_total", "counter", "Response body bytes read.")
+            lines.append(f"{PREFIX}_downloaded_bytes_total{{{base.rstrip(',')}}} {self.bytes}")
+
+            family("outcomes_total", "counter", "Images saved, and URLs rejected by reason.")
+            for outcome, n in sorted(self.outcomes.items()):
+                lines.append(f'{PREFIX}_outcomes_total{{{base}outcome="{outcome}"}} {n}')
+
+            family("queue_depth", "gauge", "Items waiting in each queue.")
+            for queue, n in sorted(self.depths.items()):
+                lines.append(f'{PREFIX}_queue_depth{{{base}queue="{queue}"}} {n}')
+
+            family("ratelimit_waits_total", "counter",
+                   "Requests held back by each rate-limit rule.")
+            for rule, (n, _) in sorted(self.waits.items()):
+                lines.append(f'{PREFIX}_ratelimit_waits_total{{{base}rule="{_escape(rule)}"}} {n}')
+
+            family("ratelimit_wait_seconds_total", "counter",
+                   "Seconds requests spent waiting for each rate-limit rule.")
+            for rule, (_, t) in sorted(self.waits.items()):
+                lines.append(f'{PREFIX}_ratelimit_wait_seconds_total'
+                             f'{{{base}rule="{_escape(rule)}"}} {t:.6f}')
+
+            family("start_time_seconds", "gauge", "Unix time the scrape started.")
+            lines.append(f"{PREFIX}_start_time_seconds{{{base.rstrip(',')}}} {self.t0:.3f}")
+
+        for name, value in (gauges or {}).items():
+            family(name, "gauge", name.replace("_", " ").capitalize() + ".")
+            lines.append(f"{PREFIX}_{name}{{{base.rstrip(',')}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        st = self.snapshot()
+        if not st["stages"]:
+            return "Stages: nothing timed"
+        rows = [f"  {s:9s} {h['count']:7d} × {h['mean'] * 1e3:8.1f} ms mean  "
+                f"p50 ≤ {h['p50'] * 1e3:6.0f} ms  p99 ≤ {h['p99'] * 1e3:6.0f} ms  "
+                f"{h['sum']:8.1f} s total"
+                for s, h in st["stages"].items()]
+        rate = st["bytes"] / 1e6 / max(st["uptime"], 1e-9)
+        bad  = {o: n for o, n in st["outcomes"].items() if o != "saved"}
+        rejected = ", ".join(f"{n} {o}" for o, n in sorted(bad.items(), key=lambda kv: -kv[1]))
+        return "\n".join([f"Stages ({st['bytes'] / 1e6:.1f} MB read, {rate:.2f} MB/s):", *rows,
+                          f"  saved {st['outcomes'].get('saved', 0)}, "
+                          f"rejected {rejected or 'none'}"])
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# -------------------- process-wide registry --------------------
+_registry = Registry()
+
+observe     = _registry.observe
+timed       = _registry.timed
+outcome     = _registry.outcome
+transferred = _registry.transferred
+depth       = _registry.depth
+throttled   = _registry.throttled
+adjust      = _registry.adjust
+snapshot    = _registry.snapshot
+prometheus  = _registry.prometheus
+summary     = _registry.summary
+
+
+def print_stats() -> None:
+    if _registry.snapshot()["stages"]:
+        print(summary())
+
+
+# -------------------- export --------------------
+class Exporter:
+    """Background thread writing `<job>.jsonl` and `<job>.prom` under `folder`."""
+
+    def __init__(self, folder, job: str = "scraper", every: float = EVERY,
+                 limiter=None, registry: Registry = _registry):
+        self.folder   = Path(folder)
+        self.job      = job
+        self.every    = every
+        self.limiter  = limiter                 # an aimd.AIMD: its limit is exported too
+        self.registry = registry
+        self.jsonl    = self.folder / f"{job}.jsonl"
+        self.textfile = self.folder / f"{job}.prom"
+        self.stop     = threading.Event()
+        self.thread   = threading.Thread(target=self._loop, daemon=True)
+        self.last     = (time.time(), registry.snapshot()["bytes"])
+
+    def start(self) -> "Exporter":
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.thread.start()
+        return self
+
+    def _loop(self) -> None:
+        while not self.stop.wait(self.every):
+            self.export()
+
+    def _gauges(self) -> Dict[str, float]:
+        if self.limiter is None:
+            return {}
+        st = self.limiter.stats()
+        return {"download_limit": st["limit"], "downloads_in_flight": st["inflight"]}
+
+    def export(self) -> None:
+        """Append one JSON line and rewrite the textfile now."""
+        snap   = self.registry.snapshot()
+        gauges = self._gauges()
+        t, b   = self.last
+        snap["job"]           = self.job
+        snap["bytes_per_sec"] = round((snap["bytes"] - b) / max(snap["time"] - t, 1e-9), 1)
+        snap.update(gauges)
+        self.last = (snap["time"], snap["bytes"])
+        try:
+            with open(self.jsonl, "a", encoding="utf-8") as f:
+                f.write(json.dumps(snap, ensure_ascii=False) + "\n")
+            tmp = self.textfile.with_name(f".{self.textfile.name}.tmp")
+            tmp.write_text(self.registry.prometheus({"scraper": self.job}, gauges), encoding="utf-8")
+            os.replace(tmp, self.textfile)
+        except OSError as e:
+            print(f"Metrics export failed: {e}")
+
+    def close(self) -> None:
+        self.stop.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.export()                           # final numbers for the finished run
+
+    def __enter__(self) -> "Exporter":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,247 @@
+# ----------------------------------------------
+# local stand-in for Bing, DuckDuckGo and image hosts
+# ----------------------------------------------
+"""
+An HTTP server that answers like the sites the scrapers talk to, so
+they can be timed (see `image_scraper.bench`) or tried out without a
+network:
+
+    GET  /images/search?q=…&first=N    Bing results page, `a.iusc` tiles
+    POST /                             DDG page carrying a `vqd` token
+    GET  /i.js?q=…&vqd=…[&s=N]         DDG JSON page, `next` cursor
+    GET  /img/<n>.jpg                  synthetic image number n
+
+Everything is a pure function of the request and the `Mock` settings:
+image n always has the same size, bytes, delay and fate (served, 404,
+500 or an HTML error page), so two runs see exactly the same "web".
+Images are smooth blow-ups of a random 8×8 colour grid seeded with n;
+they compress like photos and no two are near-duplicates.
+
+    python -m image_scraper.mockserver --port 8000 --fail 0.1 --latency 0.05
+
+`start()` runs the server in a child process (so its work doesn't share
+the scrapers' GIL) and returns it with the base URL once the images for
+the given terms are encoded, so no timed request pays for that.  Point
+the scrapers at it with `search.BING_URL`, `search.DDG_URL` and
+`vqd.TOKEN_URL`.
+"""
+import argparse
+import html
+import io
+import json
+import multiprocessing
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+BING_PAGE = 35                  # tiles per Bing page, like the real one
+DDG_PAGE  = 100                 # results per i.js page
+
+
+@dataclass
+class Mock:
+    results:        int = 140               # result URLs per search term
+    sizes:          Tuple[Tuple[int, int], ...] = ((1024, 768), (800, 600), (1600, 1200))
+    small:          float = 0.1             # share of images below 512 px
+    fail:           float = 0.05            # share of URLs that 404 / 500 / return HTML
+    latency:        float = 0.05            # mean seconds before an image is sent
+    search_latency: float = 0.1             # seconds before a result page is sent
+    page_kb:        int = 150               # filler markup per Bing page (real ones are big)
+    seed:           int = 0
+
+
+class Images:
+    """Image n's bytes and fate, computed on first request and kept."""
+
+    def __init__(self, mock: Mock):
+        self.mock  = mock
+        self.lock  = threading.Lock()
+        self.cache: Dict[int, bytes] = {}
+
+    def plan(self, n: int) -> Tuple[str, float, Tuple[int, int]]:
+        """(fate, delay, size) of image n; fate is "ok", "404", "500" or "html"."""
+        rng = random.Random(n * 1_000_003 + self.mock.seed)
+        fate = "ok"
+        if rng.random() < self.mock.fail:
+            fate = rng.choice(["404", "500", "html"])
+        delay = self.mock.latency * (0.5 + rng.random())
+        size = (rng.choice([(320, 240), (400, 300)]) if rng.random() < self.mock.small
+                else rng.choice(self.mock.sizes))
+        return fate, delay, size
+
+    def get(self, n: int, size: Tuple[int, int]) -> bytes:
+        with self.lock:
+            data = self.cache.get(n)
+        if data is None:
+            rng  = random.Random(n * 7_919 + self.mock.seed)
+            grid = Image.frombytes("RGB", (8, 8), bytes(rng.randrange(256) for _ in range(192)))
+            out  = io.BytesIO()
+            grid.resize(size, Image.BILINEAR).save(out, "JPEG", quality=90)
+            data = out.getvalue()
+            with self.lock:
+                self.cache[n] = data
+        return data
+
+
+def term_base(q: str) -> int:
+    """First image number of a term's results (terms don't share images)."""
+    return (zlib.crc32(q.encode("utf-8")) % 100_000) * 10_000
+
+
+def bing_page(base_url: str, q: str, first: int, mock: Mock) -> str:
+    start = first - 1
+    tiles = []
+    for i in range(start, min(start + BING_PAGE, mock.results)):
+        m = json.dumps({"murl": f"{base_url}/img/{term_base(q) + i}.jpg",
+                        "turl": f"{base_url}/thumb/{i}", "t": f"{q} {i}"})
+        tiles.append(f'<li><div class="imgpt"><a class="iusc" style="height:180px" '
+                     f'm="{html.escape(m)}" href="/images/search?view=detailV2&amp;id={i}">'
+                     f'<img class="mimg" src="{base_url}/thumb/{i}" alt="{html.escape(q)}"/>'
+                     f'</a></div></li>')
+    filler = '<div class="b_hide" data-x="' + "x" * 1000 + '"></div>'
+    pad = max(1, mock.page_kb * 1024 // len(filler))
+    return ("<!DOCTYPE html><html><head><title>" + html.escape(q) + " - Bing images</title>"
+            "<script>var _w={};</script></head><body>" + filler * (pad // 2)
+            + '<ul class="dgControl_list">' + "".join(tiles) + "</ul>"
+            + filler * (pad - pad // 2) + "</body></html>")
+
+
+def ddg_page(base_url: str, q: str, offset: int, mock: Mock) -> dict:
+    results = [{"image": f"{base_url}/img/{term_base(q) + i}.jpg",
+                "thumbnail": f"{base_url}/thumb/{i}", "title": f"{q} {i}"}
+               for i in range(offset, min(offset + DDG_PAGE, mock.results))]
+    page = {"results": results}
+    if offset + DDG_PAGE < mock.results:
+        page["next"] = str(offset + DDG_PAGE)
+    return page
+
+
+def handler(mock: Mock, images: Images):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"           # keep-alive, like the real hosts
+
+        def log_message(self, *args):
+            pass
+
+        def send(self, status: int, body: bytes, ctype: str) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            q = parse_qs(self.rfile.read(length).decode()).get("q", [""])[0]
+            token = f"4-{zlib.crc32(q.encode('utf-8'))}"
+            self.send(200, f'<script>vqd="{token}";</script>'.encode(), "text/html")
+
+        def do_GET(self):
+            url  = urlsplit(self.path)
+            args = {k: v[0] for k, v in parse_qs(url.query).items()}
+            base = f"http://{self.headers.get('Host')}"
+            if url.path == "/images/search":
+                time.sleep(mock.search_latency)
+                page = bing_page(base, args.get("q", ""), int(args.get("first", 1)), mock)
+                self.send(200, page.encode(), "text/html; charset=utf-8")
+            elif url.path == "/i.js":
+                if not args.get("vqd"):
+                    return self.send(403, b"", "text/plain")
+                time.sleep(mock.search_latency)
+                page = ddg_page(base, args.get("q", ""), int(args.get("s", 0)), mock)
+                self.send(200, json.dumps(page).encode(), "application/json")
+            elif url.path.startswith("/img/"):
+                try:
+                    n = int(url.path[5:].split(".")[0])
+                except ValueError:
+                    return self.send(404, b"", "text/plain")
+                fate, delay, size = images.plan(n)
+                time.sleep(delay)
+                if fate == "ok":
+                    self.send(200, images.get(n, size), "image/jpeg")
+                elif fate == "html":
+                    self.send(200, b"<html><body>Image not available</body></html>", "text/html")
+                else:
+                    self.send(int(fate), b"not found" if fate == "404" else b"oops", "text/plain")
+            else:
+                self.send(404, b"", "text/plain")
+
+    return Handler
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass                                    # clients drop transfers on purpose
+
+
+def serve(mock: Mock, port: int = 0, ready=None, terms: Sequence[str] = ()) -> None:
+    """Serve forever on 127.0.0.1:`port` (0 = any free port, sent to `ready`)."""
+    images = Images(mock)
+    for q in terms:
+        for i in range(mock.results):
+            n = term_base(q) + i
+            fate, _, size = images.plan(n)
+            if fate == "ok":
+                images.get(n, size)
+    server = Server(("127.0.0.1", port), handler(mock, images))
+    if ready is not None:
+        ready.send(server.server_address[1])
+    server.serve_forever()
+
+
+def start(mock: Optional[Mock] = None,
+          terms: Sequence[str] = ()) -> Tuple[multiprocessing.Process, str]:
+    """Run a server in a child process; returns it and the base URL.  Terminate it when done."""
+    parent, child = multiprocessing.Pipe()
+    proc = multiprocessing.Process(target=serve, args=(mock or Mock(), 0, child, list(terms)),
+                                   daemon=True)
+    proc.start()
+    return proc, f"http://127.0.0.1:{parent.recv()}"
+
+
+def sizes(text: str) -> Tuple[Tuple[int, int], ...]:
+    """"1024x768,800x600" → ((1024, 768), (800, 600))"""
+    return tuple(tuple(int(d) for d in s.lower().split("x")) for s in text.split(","))
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    d = Mock()
+    ap.add_argument("--results", type=int, default=d.results, help="result URLs per term")
+    ap.add_argument("--sizes", type=sizes, default=d.sizes, metavar="WxH,…")
+    ap.add_argument("--small", type=float, default=d.small, help="share of undersized images")
+    ap.add_argument("--fail", type=float, default=d.fail, help="share of failing image URLs")
+    ap.add_argument("--latency", type=float, default=d.latency, help="mean image delay (s)")
+    ap.add_argument("--search-latency", type=float, default=d.search_latency)
+    ap.add_argument("--page-kb", type=int, default=d.page_kb, help="Bing page padding")
+    ap.add_argument("--seed", type=int, default=d.seed)
+
+
+def from_arguments(args) -> Mock:
+    return Mock(results=args.results, sizes=args.sizes, small=args.small, fail=args.fail,
+                latency=args.latency, search_latency=args.search_latency,
+                page_kb=args.page_kb, seed=args.seed)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve fake Bing / DDG / image responses")
+    ap.add_argument("--port", type=int, default=8000)
+    add_arguments(ap)
+    args = ap.parse_args(argv)
+    print(f"Mock search + image server on http://127.0.0.1:{args.port}/")
+    try:
+        serve(from_arguments(args), args.port)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# ----------------------------------------------
+# perceptual-hash near-duplicate index
+# ----------------------------------------------
+"""
+SHA-256 (see `image_scraper.dedup`) only catches byte-identical files;
+scraped results are full of resized and re-compressed copies of the same
+photo.  This module catches those with a 64-bit difference hash (dHash)
+and a multi-index hamming lookup.
+
+* hashing: images are shrunk to 9×8 grey (JPEG draft mode keeps the
+  decode cheap) and a whole batch is hashed at once with NumPy.
+* lookup: the 64 bits are split into `max_distance + 1` chunks with one
+  hash table per chunk.  By pigeonhole, any hash within `max_distance`
+  bits matches at least one chunk exactly, so a query only checks a
+  handful of candidates — well under a millisecond at 100k images.
+* persistence: hashes are cached per file path (with its mtime) in
+  `<root>/.phash.sqlite`, so re-opening an index only hashes new files.
+  Entries whose file was deleted, moved or rewritten since are dropped
+  on load and on every `scan()`.
+
+Standalone scan of a class-folder dataset, e.g. for the classifiers:
+
+    python -m image_scraper.phash skin_condition/images/train
+    python -m image_scraper.phash animal_compare/images --move dupes/
+
+Near-duplicates that sit in *different* class folders are flagged
+separately — those are label noise, not just wasted epochs.
+"""
+import argparse
+import io
+import shutil
+import sqlite3
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE    = 8                       # 8×8 comparisons → 64-bit hash
+MAX_DISTANCE = 4                       # bits; ≤4 is "same photo" for dHash
+IMAGE_EXTS   = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"}
+DB_NAME      = ".phash.sqlite"
+_U64         = (1 << 64) - 1
+
+
+# -------------------- hashing --------------------
+def grey_thumb(img: Image.Image) -> np.ndarray:
+    """9×8 greyscale thumbnail as int16, the only input dHash needs."""
+    img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))     # JPEG: decode at ≤1/8 scale
+    small = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    return np.asarray(small, dtype=np.int16)
+
+
+def dhash_arrays(thumbs: np.ndarray) -> np.ndarray:
+    """Vectorised dHash of a (N, 8, 9) stack of thumbnails → (N,) uint64."""
+    bits   = thumbs[:, :, 1:] > thumbs[:, :, :-1]                 # (N, 8, 8)
+    packed = np.packbits(bits.reshape(len(thumbs), -1), axis=1)   # (N, 8) bytes
+    return packed.view(">u8")[:, 0].astype(np.uint64)
+
+
+def dhash(img: Image.Image) -> int:
+    return int(dhash_arrays(grey_thumb(img)[None])[0])
+
+
+def dhash_bytes(data: bytes) -> int:
+    return dhash(Image.open(io.BytesIO(data)))
+
+
+def dhash_files(paths: Sequence[Path], workers: int = 8) -> List[Optional[int]]:
+    """Hash many files: decode in parallel, hash the whole stack in one go."""
+    def thumb(p):
+        try:
+            with Image.open(p) as img:
+                return grey_thumb(img)
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        thumbs = list(pool.map(thumb, paths))
+    ok = [i for i, t in enumerate(thumbs) if t is not None]
+    out: List[Optional[int]] = [None] * len(paths)
+    if ok:
+        hashes = dhash_arrays(np.stack([thumbs[i] for i in ok]))
+        for i, h in zip(ok, hashes):
+            out[i] = int(h)
+    return out
+
+
+def distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def current(path: str, mtime: float) -> bool:
+    """Is the file an index entry was hashed from still there, unchanged?
+
+    Shard samples (`<shard>.tar/<name>`) count as long as their shard does;
+    an mtime of 0 means it wasn't known when the entry was added."""
+    p = Path(path)
+    if p.parent.suffix == ".tar":
+        return p.parent.is_file()
+    try:
+        st = p.stat()
+    except OSError:
+        return False
+    return not mtime or st.st_mtime == mtime
+
+
+# -------------------- index --------------------
+class NearDupIndex:
+    """Multi-index hamming lookup over 64-bit perceptual hashes."""
+
+    def __init__(self, max_distance: int = MAX_DISTANCE, db_path=None):
+        self.max_distance = max_distance
+        m = max_distance + 1
+        widths, shift = [64 // m + (i < 64 % m) for i in range(m)], 0
+        self.chunks = []
+        for w in widths:
+            self.chunks.append((shift, (1 << w) - 1))
+            shift += w
+        self.lock  = threading.Lock()
+        self._reset()
+
+        self.db = None
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS phash ("
+                            " path  TEXT PRIMARY KEY,"
+                            " hash  INTEGER NOT NULL,"
+                            " mtime REAL NOT NULL)")
+            stale = []
+            for path, h, mtime in self.db.execute("SELECT path, hash, mtime FROM phash"):
+                if current(path, mtime):
+                    self._insert(h & _U64, path, mtime)
+                else:
+                    stale.append(path)
+            self._forget(stale)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def _reset(self) -> None:
+        self.tables = [defaultdict(list) for _ in self.chunks]
+        self.hashes: List[int] = []
+        self.paths:  List[str] = []
+        self.known:  Dict[str, float] = {}     # path → mtime it was hashed at
+
+    def _insert(self, h: int, path: str, mtime: float = 0.0) -> None:
+        i = len(self.hashes)
+        self.hashes.append(h)
+        self.paths.append(path)
+        self.known[path] = mtime
+        for table, (shift, mask) in zip(self.tables, self.chunks):
+            table[(h >> shift) & mask].append(i)
+
+    def _persist(self, h: int, path: str, mtime: float) -> None:
+        if self.db is not None:
+            signed = h - (1 << 64) if h >= 1 << 63 else h
+            self.db.execute("INSERT OR REPLACE INTO phash VALUES (?, ?, ?)",
+                            (path, signed, mtime))
+
+    def _forget(self, paths: List[str]) -> None:
+        if self.db is not None and paths:
+            self.db.executemany("DELETE FROM phash WHERE path = ?", [(p,) for p in paths])
+            self.db.commit()
+
+    def prune(self) -> int:
+        """Drop entries whose file is gone or changed; returns how many."""
+        with self.lock:
+            keep = [(h, p, self.known[p]) for h, p in zip(self.hashes, self.paths)]
+            stale = [p for _, p, mtime in keep if not current(p, mtime)]
+            if stale:
+                gone = set(stale)
+                self._reset()
+                for h, p, mtime in keep:
+                    if p not in gone:
+                        self._insert(h, p, mtime)
+                self._forget(stale)
+            return len(stale)
+
+    def query(self, h: int) -> List[Tuple[int, str]]:
+        """All indexed images within `max_distance` bits, nearest first."""
+        with self.lock:
+            return self._query(h)
+
+    def _query(self, h: int) -> List[Tuple[int, str]]:
+        seen, hits = set(), []
+        for table, (shift, mask) in zip(self.tables, self.chunks):
+            for i in table.get((h >> shift) & mask, ()):
+                if i in seen:
+                    continue
+                seen.add(i)
+                d = distance(h, self.hashes[i])
+                if d <= self.max_distance:
+                    hits.append((d, self.paths[i]))
+        return sorted(hits)
+
+    def match(self, h: int) -> Optional[str]:
+        """Path of the nearest indexed near-duplicate, or None."""
+        hits = self.query(h)
+        return hits[0][1] if hits else None
+
+    def add(self, h: int, path, mtime: float = 0.0) -> None:
+        with self.lock:
+            self._insert(h, str(path), mtime)
+            self._persist(h, str(path), mtime)
+
+    def claim(self, h: int, path) -> Optional[str]:
+        """Atomically: return the near-duplicate's path, or index `path` and return None."""
+        with self.lock:
+            hits = self._query(h)
+            hit = hits[0][1] if hits else None
+            if hit is None:
+                self._insert(h, str(path))
+                self._persist(h, str(path), 0.0)
+            return hit
+
+    def scan(self, root, workers: int = 8) -> int:
+        """Drop stale entries, then hash and index image files under `root`
+        that aren't indexed yet."""
+        self.prune()
+        files = [f for f in sorted(Path(root).rglob("*"))
+                 if f.suffix.lower() in IMAGE_EXTS and str(f) not in self.known]
+        for f, h in zip(files, dhash_files(files, workers)):
+            if h is not None:
+                self.add(h, f, f.stat().st_mtime)
+        self.commit()
+        return len(files)
+
+    def commit(self) -> None:
+        if self.db is not None:
+            with self.lock:
+                self.db.commit()
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.commit()
+            self.db.close()
+            self.db = None
+
+
+def open_index(root, max_distance: int = MAX_DISTANCE) -> NearDupIndex:
+    """Index for the `images/<class>/` tree at `root`, cached in `root/.phash.sqlite`."""
+    root = Path(root)
+    return NearDupIndex(max_distance, root / DB_NAME)
+
+
+# -------------------- standalone scan --------------------
+def find_duplicates(files: Iterable[Path], max_distance: int = MAX_DISTANCE,
+                    workers: int = 8) -> List[Tuple[Path, str, int]]:
+    """(duplicate, first copy, bits) for every file that repeats an earlier one."""
+    files = list(files)
+    index = NearDupIndex(max_distance)
+    dupes = []
+    for f, h in zip(files, dhash_files(files, workers)):
+        if h is None:
+            continue
+        hits = index.query(h)
+        if hits:
+            dupes.append((f, hits[0][1], hits[0][0]))
+        else:
+            index.add(h, f)
+    return dupes
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(
+        description="Find near-duplicate images in an images/<class>/ tree")
+    ap.add_argument("root", type=Path, help="folder whose sub-folders are classes")
+    ap.add_argument("--distance", type=int, default=MAX_DISTANCE,
+                    help=f"max differing bits (default {MAX_DISTANCE})")
+    ap.add_argument("--move", type=Path, metavar="DIR",
+                    help="move duplicates here (keeping their class folder)")
+    args = ap.parse_args(argv)
+
+    files = sorted(f for f in args.root.rglob("*") if f.suffix.lower() in IMAGE_EXTS)
+    dupes = find_duplicates(files, args.distance)
+    cross = [(f, o, d) for f, o, d in dupes if f.parent != Path(o).parent]
+
+    for f, orig, d in dupes:
+        flag = "  ← different class!" if f.parent != Path(orig).parent else ""
+        print(f"{f}  ≈  {orig}  ({d} bits){flag}")
+    print(f"\n{len(files)} images, {len(dupes)} near-duplicates "
+          f"({len(cross)} across classes)")
+
+    if args.move:
+        for f, _, _ in dupes:
+            dest = args.move / f.relative_to(args.root)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(f), str(dest))
+        print(f"moved {len(dupes)} files to {args.move}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+# ----------------------------------------------
+# streaming search → download → validate → write pipeline
+# ----------------------------------------------
+"""
+Stages connected by bounded asyncio queues:
+
+    search (per term, page by page) → download → validate → write
+
+Downloads start as soon as the first result page of the first term is
+back, and every stage has its own worker count.  The bounded queues give
+backpressure: when downloads fall behind, search producers block on
+`put` instead of piling up thousands of URLs.
+
+Blocking work (HTTP through `image_scraper.client`, PIL, disk) runs on
+a thread pool; the event loop only moves items between queues.
+
+Validation happens in memory: `Image.verify()` on the downloaded bytes
+plus a magic-byte sniff (see `image_scraper.probe.sniff`), so rejected
+URLs never touch the disk.
+
+File names come from a `name(term)` callable that is only asked once an
+image has passed validation; it may return None to drop the image (e.g.
+when a per-term quota is full).  Its extension is replaced by the real
+one from the sniff.  `sequential()` builds the `{subject}_{NNNN}.jpg`
+namer the skin scrapers use.  Files are written atomically (temp file +
+rename) with batched fsyncs; see `image_scraper.store`.  With
+`shard_bytes` set they are appended to `<out_dir>/<folder>-NNNNNN.tar`
+shards with a JSON sidecar each instead; see `image_scraper.shards`.
+
+With `presize` set validators also make a `presize`×`presize` center
+crop of each image on the resize process pool (see
+`image_scraper.presize`).  It is written under the same name to
+`presize_dir`, next to the original, or replaces the original when
+there is no `presize_dir`.
+
+With a `manifest` (see `image_scraper.manifest`) every committed file
+is listed there with its hash, size and source URL, and the pre-sized
+copies in `presize_manifest`.
+
+With a `dedup` index (see `image_scraper.dedup`) validators also hash
+the bytes and the writer drops anything already on disk before it is
+named, so duplicates never use up a sequence number.  A `near` index
+(see `image_scraper.phash`) does the same for resized / re-compressed
+copies using a perceptual hash.  Both indexes only learn a file once the
+store has committed it.  Until then the exact digest is held by a
+`DedupIndex.claim()`, which every pipeline sharing the index sees (two
+subjects can't both save the same bytes), and the writer checks new
+images' perceptual hashes against its files still waiting for their
+batch's fsync.
+
+With a `urls` cache (see `image_scraper.urlcache`) downloaders skip URLs
+whose outcome is already known, and every fetch, rejection and save is
+recorded for the next run.
+
+Downloads hold a slot of an AIMD `limiter` (see `image_scraper.aimd`),
+so the number in flight follows what the network and hosts can take;
+`download_workers` is only the ceiling.
+
+With a `journal` (see `image_scraper.journal`) a restarted run skips
+terms whose every result was handled and URLs that already have an
+outcome.  Saves are logged only once the file is renamed into place.
+
+Every stage reports to `image_scraper.metrics`: fetch, verify, decode
+and disk times, each outcome, and the depth of the three queues
+(sampled every `DEPTH_EVERY` seconds).
+"""
+import asyncio
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+from . import metrics, shards
+from .aimd import AIMD, START
+from .dedup import DedupIndex, digest
+from .engine import DownloadStats, fetch, verify_bytes
+from .journal import Journal, final
+from .manifest import Manifest, describe
+from .phash import NearDupIndex, dhash_bytes, distance
+from .presize import crop
+from .probe import EXTENSIONS, sniff
+from .store import FSYNC_EVERY, AtomicWriter
+from .urlcache import UrlCache
+
+SEARCH_WORKERS   = 2
+DOWNLOAD_WORKERS = 64           # ceiling; the AIMD limiter picks how many are busy
+VALIDATE_WORKERS = 4
+QUEUE_SIZE       = 64           # per stage
+TIMEOUT          = 4
+DEPTH_EVERY      = 1.0          # seconds between queue depth samples
+
+NAME_EXTS        = set(EXTENSIONS.values()) | {".jpeg"}
+
+_DONE = object()                # end-of-stream marker
+
+
+def _silent(*args, **kwargs) -> None:
+    pass
+
+
+def existing(out_dir, pattern: str = "*") -> int:
+    """How many images matching `pattern` the pipeline has already written to `out_dir`
+    (as files or inside its shards)."""
+    exts = set(EXTENSIONS.values())
+    files = sum(1 for f in Path(out_dir).glob(pattern) if f.suffix.lower() in exts)
+    return files + len(shards.names(out_dir, pattern))
+
+
+def highest(prefix: str, names: Iterable[str]) -> int:
+    """Largest N among `{prefix}_N.ext` names (any extension), or 0."""
+    pattern = re.compile(re.escape(prefix) + r"_(\d+)\.")
+    return max((int(m.group(1)) for m in map(pattern.match, names) if m), default=0)
+
+
+def sequential(subject: str, start: int = 0, taken: Iterable[str] = ()) -> Callable[[str], str]:
+    """Namer for `{subject}_{NNNN}.jpg`, continuing after `start` and every number in `taken`."""
+    n = max(start, highest(subject, taken))
+
+    def name(term: str) -> str:
+        nonlocal n
+        n += 1
+        return f"{subject}_{n:04d}.jpg"
+    return name
+
+
+async def _run(terms: Sequence[str], pages: Callable[[str], Iterator[List[str]]],
+               out_dir: Path, name: Callable[[str], Optional[str]],
+               limit: float, workers: dict, queue_size: int,
+               timeout: float, dedup: Optional[DedupIndex],
+               near: Optional[NearDupIndex],
+               urls: Optional[UrlCache], journal: Optional[Journal],
+               fsync_every: int, shard_bytes: int, presize: int,
+               presize_dir: Optional[Path], manifest: Optional[Manifest],
+               presize_manifest: Optional[Manifest], stats: DownloadStats,
+               limiter: AIMD, say: Callable[..., None]) -> DownloadStats:
+    loop  = asyncio.get_running_loop()
+    stop  = asyncio.Event()
+    url_q, data_q, write_q = (asyncio.Queue(queue_size) for _ in range(3))
+    term_q = asyncio.Queue()
+    for i, t in enumerate(terms, 1):
+        term_q.put_nowait((i, t))
+
+    n_search   = min(workers["search"], len(terms)) or 1
+    n_download = workers["download"]
+    n_validate = workers["validate"]
+    pool = ThreadPoolExecutor(max_workers=n_search + n_download + n_validate + 1)
+
+    async def blocking(fn, *args):
+        return await loop.run_in_executor(pool, fn, *args)
+
+    pending  = Counter()                # term → URLs queued but not settled yet
+    searched = set()                    # terms whose result pages are used up
+    retry    = set()                    # terms with a transiently failed URL: not done
+    writing  = {}                       # file name → (url, sha, dhash, listing) until renamed
+    copying  = {}                       # file name → (url, listing) of its pre-sized copy
+
+    def term_done(term):
+        if journal is not None and term not in retry:
+            store.flush()               # its files go on disk before the term is logged
+            journal.term_done(term)
+
+    def settle(term):
+        pending[term] -= 1
+        if term in searched and pending[term] == 0:
+            term_done(term)
+
+    def remember(term, url, outcome, path=None, sha=None):
+        metrics.outcome(outcome)
+        if urls is not None:
+            urls.record(url, outcome, path, sha)
+        if journal is not None:
+            journal.url(url, outcome)
+            if not final(outcome):
+                retry.add(term)
+        settle(term)
+
+    def listing(book: Optional[Manifest], data: bytes, sha: Optional[str] = None):
+        """What `book` needs to list a file: (sha256, width, height, bytes)."""
+        return None if book is None else (sha or digest(data), *describe(data))
+
+    def listed(book, path: Path, url: str, entry, sidecar: Optional[dict]):
+        if entry is not None:
+            book.add(path, entry[0], url, *entry[1:],
+                     offset=sidecar.get("offset") if sidecar else None)
+
+    def committed(path: Path, sidecar: Optional[dict] = None):
+        """Called by the store once a file is renamed into place (or its shard synced)."""
+        url, sha, ph, entry = writing.pop(path.name)
+        if dedup is not None:
+            dedup.add(sha, path)
+        if near is not None:
+            near.add(ph, path)
+        metrics.outcome("saved")
+        if urls is not None:
+            urls.record(url, "saved", path, sha)
+        if journal is not None:
+            journal.saved(path.name)
+        listed(manifest, path, url, entry, sidecar)
+
+    def uncommitted(ph: int) -> Optional[str]:
+        """A file written but not committed yet with a near-identical image."""
+        for fn, (_, _, other_ph, _) in writing.items():
+            if distance(ph, other_ph) <= near.max_distance:
+                return str(out_dir / fn)
+        return None
+
+    def free_name(term: str, ext: str) -> Optional[str]:
+        """`name(term)` with `ext`, skipping any whose stem is already a file here
+        (a gap in the numbering, another extension): the store's rename would replace it."""
+        while (fn := name(term)) is not None:
+            fn = Path(fn).stem + ext
+            stem = Path(fn).stem
+            if shard_bytes > 0 or not any((out_dir / f"{stem}{e}").exists() for e in NAME_EXTS):
+                return fn
+        return None
+
+    def copied(path: Path, sidecar: Optional[dict] = None):
+        url, entry = copying.pop(path.name)
+        listed(presize_manifest, path, url, entry, sidecar)
+
+    def open_store(folder: Path, on_commit=None):
+        if shard_bytes > 0:
+            return shards.ShardWriter(folder, out_dir.name, label=out_dir.name,
+                                      max_bytes=shard_bytes, fsync_every=fsync_every,
+                                      on_commit=on_commit)
+        return AtomicWriter(folder, fsync_every, on_commit=on_commit)
+
+    store = open_store(out_dir, committed)
+    store.cleanup()
+    copies = None                       # pre-sized copies kept next to the originals
+    if presize > 0 and presize_dir is not None:
+        copies = open_store(presize_dir, copied)
+        copies.cleanup()
+
+    def limited_fetch(url):
+        with limiter.slot():
+            t0 = time.perf_counter()
+            data, reason = fetch(url, timeout)
+            limiter.record(reason, time.perf_counter() - t0)
+        return data, reason
+
+    # ---------------- stages ----------------
+    async def searcher():
+        while not stop.is_set() and not term_q.empty():
+            i, term = term_q.get_nowait()
+            if journal is not None and term in journal.done_terms:
+                say(f"\n[{i}/{len(terms)}] '{term}' finished in an earlier run")
+                continue
+            gen, found = pages(term), 0
+            while not stop.is_set():
+                try:
+                    page = await blocking(next, gen, None)
+                except Exception as e:
+                    say(f"Search error for '{term}': {e}")
+                    break
+                if page is None:
+                    searched.add(term)
+                    if pending[term] == 0:
+                        term_done(term)
+                    break
+                found += len(page)
+                for url in page:
+                    pending[term] += 1
+                    await url_q.put((term, url))
+            say(f"\n[{i}/{len(terms)}] '{term}' → {found} URLs")
+
+    async def downloader():
+        while (item := await url_q.get()) is not _DONE:
+            if stop.is_set():
+                stats.cancelled += 1            # drain so producers unblock
+                continue
+            term, url = item
+            if ((journal is not None and journal.knows(url))
+                    or (urls is not None and urls.skip(url))):
+                stats.cached += 1
+                metrics.outcome("cached")
+                settle(term)
+                continue
+            stats.attempted += 1
+            data, reason = await blocking(limited_fetch, url)
+            if data is None:
+                stats.failed += 1
+                remember(term, url, reason)
+                continue
+            await data_q.put((term, url, data))
+
+    def check(data: bytes):
+        """None if the image is invalid, else its (extension, sha256, dhash)."""
+        with metrics.timed("verify"):
+            ext = sniff(data)
+            if ext is None or not verify_bytes(data):
+                return None
+        ph = None
+        if near is not None:
+            try:
+                with metrics.timed("decode"):
+                    ph = dhash_bytes(data)
+            except Exception:
+                return None
+        return ext, (digest(data) if dedup is not None else None), ph
+
+    async def presized(data: bytes, ext: str) -> Optional[bytes]:
+        """The center crop for `presize`, from the resize process pool."""
+        t0 = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(crop(data, presize, ext))
+        except Exception:
+            return None
+        finally:
+            metrics.observe("resize", time.perf_counter() - t0)
+
+    async def validator():
+        while (item := await data_q.get()) is not _DONE:
+            if stop.is_set():
+                continue
+            term, url, data = item
+            keys = await blocking(check, data)
+            small = None
+            if keys and presize > 0:
+                small = await presized(data, keys[0])
+                if small is None:
+                    keys = None
+            if keys:
+                await write_q.put((term, url, data, *keys, small))
+            else:
+                stats.failed += 1
+                remember(term, url, "invalid")
+
+    async def writer():
+        while (item := await write_q.get()) is not _DONE:
+            if stop.is_set():
+                continue
+            term, url, data, ext, sha, ph, small = item
+            if dedup is not None and sha in dedup:
+                stats.duplicates += 1
+                remember(term, url, "duplicate", dedup.lookup(sha), sha)
+                continue
+            if near is not None and (copy_of := near.match(ph) or uncommitted(ph)) is not None:
+                stats.duplicates += 1
+                remember(term, url, "duplicate", copy_of, sha)
+                continue
+            fn = free_name(term, ext)
+            if fn is None:
+                settle(term)
+                continue
+            if dedup is not None and (copy_of := dedup.claim(sha, out_dir / fn)) is not None:
+                # another subject claimed the same bytes since the check above
+                stats.duplicates += 1
+                remember(term, url, "duplicate", copy_of, sha)
+                continue
+            if small is not None and copies is None:
+                data = small                    # only the pre-sized copy is kept
+                writing[fn] = (url, sha, ph, listing(manifest, data))
+            else:
+                writing[fn] = (url, sha, ph, listing(manifest, data, sha))
+            if copies is not None:
+                copying[fn] = (url, listing(presize_manifest, small))
+            if journal is not None:
+                journal.allocated(fn, url)
+            meta = ({"url": url, "sha256": sha or digest(data)},) if shard_bytes > 0 else ()
+            try:
+                t0 = time.perf_counter()
+                await blocking(store.write, fn, data, *meta)
+                if copies is not None:
+                    await blocking(copies.write, fn, small, *meta)
+                metrics.observe("disk", time.perf_counter() - t0)
+            except OSError as e:
+                say(f"    ✗ {fn}: {e}")
+                stats.failed += 1
+                if dedup is not None:
+                    dedup.release(sha)
+                writing.pop(fn, None)
+                copying.pop(fn, None)
+                remember(term, url, "error")
+                continue
+            settle(term)
+            stats.saved += 1
+            stats.bytes += len(data)
+            say(f"    saved {fn}", end="\r")
+            if stats.saved >= limit:
+                stop.set()
+
+    def sample_depths():
+        for q, queue in (("url", url_q), ("data", data_q), ("write", write_q)):
+            metrics.depth(q, queue.qsize())
+
+    async def depths():
+        while True:
+            sample_depths()
+            await asyncio.sleep(DEPTH_EVERY)
+
+    async def stage(coros, n_next, q_next):
+        """Run one stage's workers, then tell each next-stage worker to stop."""
+        await asyncio.gather(*coros)
+        for _ in range(n_next):
+            await q_next.put(_DONE)
+
+    t0 = time.perf_counter()
+    sampler = asyncio.create_task(depths())
+    finished = False                    # every stage ran to the end
+    try:
+        await asyncio.gather(
+            stage([searcher() for _ in range(n_search)], n_download, url_q),
+            stage([downloader() for _ in range(n_download)], n_validate, data_q),
+            stage([validator() for _ in range(n_validate)], 1, write_q),
+            writer(),
+        )
+        finished = True
+    finally:
+        sampler.cancel()
+        sample_depths()
+        pool.shutdown(wait=False, cancel_futures=True)
+        store.close()
+        if copies is not None:
+            copies.close()
+        for book, folder in ((manifest, out_dir), (presize_manifest, presize_dir or out_dir)):
+            if book is not None:        # stamped only after a clean finish, see Manifest.commit
+                book.commit([folder] if finished else ())
+    stats.elapsed = time.perf_counter() - t0
+    return stats
+
+
+def run(terms: Iterable[str], pages: Callable[[str], Iterator[List[str]]],
+        out_dir, name: Callable[[str], Optional[str]],
+        limit: Optional[int] = None,
+        search_workers: int = SEARCH_WORKERS,
+        download_workers: int = DOWNLOAD_WORKERS,
+        validate_workers: int = VALIDATE_WORKERS,
+        queue_size: int = QUEUE_SIZE,
+        timeout: float = TIMEOUT,
+        dedup: Optional[DedupIndex] = None,
+        near: Optional[NearDupIndex] = None,
+        urls: Optional[UrlCache] = None,
+        journal: Optional[Journal] = None,
+        fsync_every: int = FSYNC_EVERY,
+        shard_bytes: int = 0,
+        presize: int = 0,
+        presize_dir=None,
+        manifest: Optional[Manifest] = None,
+        presize_manifest: Optional[Manifest] = None,
+        stats: Optional[DownloadStats] = None,
+        limiter: Optional[AIMD] = None,
+        quiet: bool = False) -> DownloadStats:
+    """
+    Stream every term through the pipeline until `limit` images are
+    saved or all search results are used up.
+
+    `pages(term)` yields lists of image URLs, one per result page (see
+    `image_scraper.search.image_pages`).  Files become visible in batches
+    of `fsync_every` (0 = rename at once, no fsync).  `shard_bytes` > 0
+    writes tar shards of about that size instead of one file per image.
+    `presize` > 0 also stores a `presize`-pixel square center crop of each
+    image, under the same name in `presize_dir`, or instead of the
+    original when `presize_dir` is None.  Saved files are listed in
+    `manifest`, and their pre-sized copies in `presize_manifest`.
+
+    Pass a `stats` object to watch progress from another thread while the
+    run is going (see `image_scraper.runner`); `quiet` drops the per-term
+    and per-file output.  Without a shared `limiter` the run gets its own,
+    starting at `aimd.START` and capped at `download_workers`.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if presize_dir is not None:
+        presize_dir = Path(presize_dir)
+    terms = list(terms)
+    if limit is None:
+        limit = float("inf")
+    if stats is None:
+        stats = DownloadStats()
+    if limit <= 0 or not terms:
+        return stats
+    workers = {"search":   max(1, search_workers),
+               "download": max(1, download_workers),
+               "validate": max(1, validate_workers)}
+    if limiter is None:
+        limiter = AIMD(limit=min(START, workers["download"]), max_limit=workers["download"])
+    return asyncio.run(_run(terms, pages, out_dir, name, limit, workers,
+                            queue_size, timeout, dedup, near, urls, journal,
+                            fsync_every, shard_bytes, presize, presize_dir,
+                            manifest, presize_manifest, stats, limiter,
+                            _silent if quiet else print))
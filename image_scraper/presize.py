@@ -0,0 +1,175 @@
+# ----------------------------------------------
+# pre-sized training copies
+# ----------------------------------------------
+"""
+The classifiers' `Resize(460)` (`Resize(224)` for birds) decodes every
+full-size download and crops it again on every access, every epoch.
+Pre-sizing does that once, at ingest: each image gets a center-cropped
+`size`×`size` copy (aspect kept, see `resize.submit(crop=True)`) in a
+mirror of its folder, so training decodes a ~50 KB file instead of a
+multi-megapixel one:
+
+    images/train/acne/acne_0001.jpg  →  images/train-460/acne/acne_0001.jpg
+
+The scrapers write the copy as they save each image (`pipeline.run(
+presize=…)`, `presize:` in a runner config, PRESIZE in the downloaders).
+This command builds or tops up the mirror for folders scraped before:
+
+    python -m image_scraper.presize images/train --size 460
+    python -m image_scraper.presize images --size 224 --out /data/images-224
+
+Only images missing from the mirror or newer than their copy are
+resized, on the `image_scraper.resize` process pool.  Tar shards (see
+`image_scraper.shards`) are mirrored shard by shard.  Training scripts
+pick the mirror once it is complete:
+
+    path = presize.prefer(Path('images/train'), 460)
+
+A mirror counts as complete while it holds a `MARKER` file.  `build()`
+writes it once every image has been looked at (images that can't be
+decoded have no copy).  A scraper that writes copies as it goes removes
+it when it starts and puts it back only if the mirror's manifest lists
+as many images per class as the originals' when it is done.  A
+half-built or crashed mirror is therefore never picked over the full
+set of originals.
+"""
+import argparse
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from . import resize, shards
+from .probe import EXTENSIONS
+from .store import AtomicWriter
+
+SIZE   = 460                    # fastai Resize(460) in the animal and skin classifiers
+WINDOW = 64                     # images being resized at once
+MARKER = ".complete"            # in a mirror holding a copy of every image
+
+
+def mirror(folder, size: int = SIZE) -> Path:
+    """Where `folder`'s pre-sized copies go: `<folder>-<size>` next to it."""
+    folder = Path(folder)
+    return folder.parent / f"{folder.name}-{size}"
+
+
+def complete(small) -> bool:
+    """True if the mirror `small` has a copy of every image it mirrors."""
+    return (Path(small) / MARKER).is_file()
+
+
+def mark(small, done: bool = True) -> None:
+    """Mark the mirror `small` complete, or (`done=False`) not any more."""
+    marker = Path(small) / MARKER
+    if done:
+        Path(small).mkdir(parents=True, exist_ok=True)
+        marker.touch()
+    else:
+        marker.unlink(missing_ok=True)
+
+
+def prefer(folder, size: int = SIZE) -> Path:
+    """`folder`'s pre-sized mirror if it is complete, else `folder` itself."""
+    small = mirror(folder, size)
+    return small if complete(small) else Path(folder)
+
+
+def crop(data: bytes, size: int = SIZE, ext: str = ".jpg") -> Future:
+    """A `size`×`size` center crop of `data`, resized on the shared process pool."""
+    return resize.submit(data, (size, size), ext, crop=True)
+
+
+def _stale(src: Path, dst: Path) -> bool:
+    try:
+        return dst.stat().st_mtime < src.stat().st_mtime
+    except FileNotFoundError:
+        return True
+
+
+def _images(src: Path) -> List[Path]:
+    exts = set(EXTENSIONS.values()) | {".jpeg"}
+    return sorted(f for f in src.rglob("*")
+                  if f.suffix.lower() in exts and f.is_file()
+                  and not any(p.startswith(".") for p in f.relative_to(src).parts))
+
+
+def build(src, size: int = SIZE, dst=None, say=print) -> Tuple[int, int, int]:
+    """Bring `dst` (default `mirror(src, size)`) up to date; returns (made, fresh, failed)."""
+    src = Path(src)
+    dst = Path(dst) if dst is not None else mirror(src, size)
+    made = fresh = failed = 0
+    mark(dst, False)
+
+    writers: Dict[Path, AtomicWriter] = {}
+    running: List[Tuple[Path, Future]] = []
+
+    def finish(item: Tuple[Path, Future]) -> None:
+        nonlocal made, failed
+        f, fut = item
+        out = dst / f.relative_to(src)
+        try:
+            data = fut.result()
+        except Exception as e:
+            say(f"  ✗ {f}: {e}")
+            failed += 1
+            return
+        if out.parent not in writers:
+            writers[out.parent] = AtomicWriter(out.parent, fsync_every=0)
+        writers[out.parent].write(out.name, data)
+        made += 1
+
+    for f in _images(src):
+        if not _stale(f, dst / f.relative_to(src)):
+            fresh += 1
+            continue
+        running.append((f, crop(f.read_bytes(), size, f.suffix)))
+        if len(running) >= WINDOW:
+            finish(running.pop(0))
+    for item in running:
+        finish(item)
+
+    for shard in shards.shard_files(src):
+        out = dst / shard.relative_to(src)
+        if not _stale(shard, out):
+            fresh += len(shards.index(out))
+            continue
+        found = list(shards.samples(shard))
+        crops = [crop(data, size, Path(s.name).suffix) for s, data in found]
+        batch = []
+        for (s, _), fut in zip(found, crops):
+            try:
+                batch.append((s.name, fut.result(), s.meta))
+            except Exception as e:
+                say(f"  ✗ {shard}/{s.name}: {e}")
+                failed += 1
+        made += shards.pack(out, batch)
+    mark(dst)
+    return made, fresh, failed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build center-cropped training-size copies of an image tree")
+    ap.add_argument("folder", type=Path, help="e.g. images/train (class folders inside)")
+    ap.add_argument("--size", type=int, default=SIZE, help="side in pixels (the classifier's Resize)")
+    ap.add_argument("--out", type=Path, help="default: <folder>-<size> next to it")
+    ap.add_argument("--workers", type=int, default=resize.WORKERS, help="resize processes")
+    args = ap.parse_args(argv)
+    if not args.folder.is_dir():
+        ap.error(f"no folder {args.folder}")
+
+    resize.configure(args.workers)
+    dst = args.out or mirror(args.folder, args.size)
+    t0 = time.perf_counter()
+    try:
+        made, fresh, failed = build(args.folder, args.size, dst)
+    finally:
+        resize.shutdown()
+    elapsed = time.perf_counter() - t0
+    print(f"{args.folder} → {dst} ({args.size}×{args.size}): {made} resized, "
+          f"{fresh} already up to date, {failed} failed in {elapsed:.1f}s "
+          f"({made / max(elapsed, 1e-9):.1f} img/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# ----------------------------------------------
+# header-only image dimension probe
+# ----------------------------------------------
+"""
+Image size from the first few KB of a download.
+
+`image_size()` parses JPEG (SOFn segment), PNG (IHDR), GIF (logical
+screen) and WebP (VP8 / VP8L / VP8X) headers without decoding anything.
+`read_head()` pulls chunks off a streamed `requests` response until the
+size is known (or `max_bytes` have been read), so a downloader can drop
+an undersized image, or a response that isn't an image at all, before
+paying for the rest of the body:
+
+    r = client.get(url, stream=True, timeout=10)
+    chunks = r.iter_content(CHUNK)
+    head, size = probe.read_head(chunks)
+    if size and min(size[1:]) < 512:
+        probe.aborted("too_small", r, len(head))
+        r.close()
+    else:
+        data = head + b"".join(chunks)
+
+`sniff()` names the real format from the magic bytes alone.
+
+`too_large()` and `read_rest()` bound what one download can cost: the
+Content-Length is checked before anything is read, and the body is
+streamed in CHUNK pieces and dropped as soon as it passes `max_bytes`,
+so a worker never holds more than MAX_IMAGE however big (or endless)
+the response is.
+
+`aborted()` keeps a tally of what was skipped and how many bytes that
+saved (known when the server sent Content-Length); see `stats()`.
+"""
+import struct
+import threading
+from collections import Counter
+from typing import Dict, Iterator, Optional, Tuple
+
+CHUNK     = 8 * 1024
+MAX_BYTES = 64 * 1024           # give up probing after this much (huge EXIF blocks)
+MAX_IMAGE = 25 * 1024 * 1024    # largest download kept in memory
+
+Size = Tuple[str, int, int]     # (format, width, height)
+
+_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+        0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg(b: bytes) -> Optional[Size]:
+    i = 2
+    while i + 9 < len(b):
+        if b[i] != 0xFF:
+            return None                         # lost sync: not a JPEG we understand
+        marker = b[i + 1]
+        if marker == 0xFF:                      # fill byte
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            i += 2                              # standalone marker, no length
+            continue
+        length = struct.unpack(">H", b[i + 2:i + 4])[0]
+        if marker in _SOF:
+            h, w = struct.unpack(">HH", b[i + 5:i + 9])
+            return "jpeg", w, h
+        i += 2 + length
+    return None
+
+
+def image_size(head: bytes) -> Optional[Size]:
+    """(format, width, height) from the start of an image file, or None."""
+    if head[:2] == b"\xff\xd8":
+        return _jpeg(head)
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and len(head) >= 24:
+        w, h = struct.unpack(">II", head[16:24])
+        return "png", w, h
+    if head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+        w, h = struct.unpack("<HH", head[6:10])
+        return "gif", w, h
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+        kind = head[12:16]
+        if kind == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+            w, h = struct.unpack("<HH", head[26:30])
+            return "webp", w & 0x3FFF, h & 0x3FFF
+        if kind == b"VP8L" and head[20] == 0x2F:
+            bits = struct.unpack("<I", head[21:25])[0]
+            return "webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if kind == b"VP8X":
+            w = int.from_bytes(head[24:27], "little") + 1
+            h = int.from_bytes(head[27:30], "little") + 1
+            return "webp", w, h
+    return None
+
+
+# file extension for each format we accept, by magic bytes
+EXTENSIONS = {"jpeg": ".jpg", "png": ".png", "gif": ".gif", "webp": ".webp", "bmp": ".bmp"}
+
+
+def sniff(data: bytes) -> Optional[str]:
+    """Real file extension from the magic bytes, or None if it isn't one of EXTENSIONS."""
+    if data[:3] == b"\xff\xd8\xff":
+        return EXTENSIONS["jpeg"]
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return EXTENSIONS["png"]
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return EXTENSIONS["gif"]
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return EXTENSIONS["webp"]
+    if data[:2] == b"BM":
+        return EXTENSIONS["bmp"]
+    return None
+
+
+def read_head(chunks: Iterator[bytes], max_bytes: int = MAX_BYTES) -> Tuple[bytes, Optional[Size]]:
+    """Read from `chunks` until the size is known; returns (bytes read, size)."""
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        size = image_size(head)
+        if size is not None or len(head) >= max_bytes:
+            return head, size
+    return head, image_size(head)
+
+
+def too_large(response, max_bytes: int = MAX_IMAGE) -> bool:
+    """True if the response announces a body over `max_bytes` (Content-Length)."""
+    try:
+        return int(response.headers.get("Content-Length", "")) > max_bytes
+    except (TypeError, ValueError):
+        return False
+
+
+def read_rest(chunks: Iterator[bytes], head: bytes = b"",
+              max_bytes: int = MAX_IMAGE) -> Optional[bytes]:
+    """`head` plus the remaining `chunks`, or None once the total passes `max_bytes`."""
+    parts, n = [head], len(head)
+    if n > max_bytes:
+        return None
+    for chunk in chunks:
+        n += len(chunk)
+        if n > max_bytes:
+            return None
+        parts.append(chunk)
+    return b"".join(parts)
+
+
+def is_image_type(content_type: Optional[str]) -> bool:
+    """False only for a Content-Type that is clearly not an image (HTML error pages …)."""
+    if not content_type:
+        return True
+    ctype = content_type.split(";")[0].strip().lower()
+    return ctype.startswith("image/") or ctype in ("application/octet-stream",
+                                                   "binary/octet-stream")
+
+
+# -------------------- stats --------------------
+_lock   = threading.Lock()
+_counts = Counter()              # reason → aborted downloads
+_saved  = Counter()              # reason → body bytes not downloaded
+
+
+def aborted(reason: str, response, bytes_read: int) -> None:
+    """Record an early abort; bytes saved come from Content-Length when sent."""
+    try:
+        total = int(response.headers.get("Content-Length", ""))
+    except (TypeError, ValueError):
+        total = None
+    with _lock:
+        _counts[reason] += 1
+        if total is not None:
+            _saved[reason] += max(0, total - bytes_read)
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    with _lock:
+        return {r: {"aborted": n, "bytes_saved": _saved[r]} for r, n in _counts.items()}
+
+
+def print_stats() -> None:
+    st = stats()
+    if not st:
+        return
+    total = sum(s["bytes_saved"] for s in st.values())
+    detail = ", ".join(f"{s['aborted']} {r}" for r, s in st.items())
+    print(f"Header probe: aborted {detail}; saved {total / 1e6:.1f} MB of downloads")
@@ -0,0 +1,122 @@
+# ----------------------------------------------
+# per-host token-bucket rate limiter
+# ----------------------------------------------
+"""
+Replaces the fixed `time.sleep(...)` pacing in the scrapers.
+
+Every request made through `image_scraper.client` first takes a token
+from its host's bucket.  Search engines get small polite budgets; hosts
+without a rule (the image CDNs) are not limited at all, so a slow Bing
+page no longer holds up downloads from unrelated servers.
+
+Rules match the host itself or any subdomain (`bing.com` covers
+`www.bing.com`) and all matching hosts share one bucket.
+Requests that had to wait are counted per rule, both in `stats()` and
+in `image_scraper.metrics`, whose exporter writes them out with the
+stage timings.
+
+`slot(host)` separately caps how many requests to one host are in
+flight at once, so a large shared download pool doesn't open dozens of
+connections to the same CDN:
+
+    with ratelimit.slot(host):
+        r = client.get(url, stream=True)
+        data = r.content
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from . import metrics
+
+# host → (requests per second, burst)
+HOST_LIMITS: Dict[str, Tuple[float, int]] = {
+    "bing.com":       (1.0, 3),
+    "duckduckgo.com": (1.0, 2),
+}
+
+PER_HOST = 8                    # requests in flight per host, see slot()
+
+
+class TokenBucket:
+    """Thread-safe token bucket; waiters queue up by reserving tokens ahead."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate   = rate
+        self.burst  = burst
+        self.tokens = float(burst)
+        self.stamp  = time.monotonic()
+        self.lock   = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait for it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+_lock    = threading.Lock()
+_buckets: Dict[str, TokenBucket] = {}
+_waits   = defaultdict(lambda: [0, 0.0])     # rule → [times waited, seconds]
+_slots:  Dict[str, threading.BoundedSemaphore] = {}
+
+
+def _rule(host: str) -> Optional[str]:
+    for h in HOST_LIMITS:
+        if host == h or host.endswith("." + h):
+            return h
+    return None
+
+
+def configure(host: str, rate: float, burst: int = 1) -> None:
+    """Set (or replace) the budget for `host` and its subdomains."""
+    with _lock:
+        HOST_LIMITS[host] = (rate, burst)
+        _buckets.pop(host, None)
+
+
+def acquire(host: str) -> float:
+    """Block until `host` may be contacted; returns the seconds waited."""
+    rule = _rule(host)
+    if rule is None:
+        return 0.0
+    with _lock:
+        bucket = _buckets.get(rule)
+        if bucket is None:
+            bucket = _buckets[rule] = TokenBucket(*HOST_LIMITS[rule])
+    wait = bucket.acquire()
+    if wait:
+        with _lock:
+            _waits[rule][0] += 1
+            _waits[rule][1] += wait
+        metrics.throttled(rule, wait)
+    return wait
+
+
+@contextmanager
+def slot(host: str) -> Iterator[None]:
+    """Hold one of `host`'s PER_HOST in-flight slots for the duration of the block."""
+    with _lock:
+        sem = _slots.get(host)
+        if sem is None:
+            sem = _slots[host] = threading.BoundedSemaphore(PER_HOST)
+    with sem:
+        yield
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Per rule: how many requests had to wait and for how long in total."""
+    with _lock:
+        return {h: {"waits": n, "wait_seconds": s} for h, (n, s) in _waits.items()}
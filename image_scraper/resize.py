@@ -0,0 +1,142 @@
+# ----------------------------------------------
+# process-pool decode + resize
+# ----------------------------------------------
+"""
+Decoding an 8–20 MP JPEG and LANCZOS-resizing it is pure CPU work, and
+in the downloaders' thread pools it all queues up behind the GIL.  Here
+it runs on a shared process pool instead, and JPEGs are decoded with
+`Image.draft()` at the smallest 1/2, 1/4 or 1/8 scale that is still at
+least the target size, so a 4000×3000 photo bound for 512×512 is decoded
+at 1000×750 before the final resample.
+
+    from image_scraper import resize
+    data = resize.submit(raw, (512, 512), ".jpg").result()
+    data = resize.submit(raw, (460, 460), ".jpg", crop=True).result()
+    resize.shutdown()
+
+`crop=True` keeps the aspect ratio: the image is scaled until it covers
+`size` and the overflow is cut off evenly on both sides (fastai's
+`Resize` on a validation item), instead of being stretched to fit.
+
+Download threads only wait on the returned future.  The pool is created
+on first use (like `client.session()`).
+
+    python -m image_scraper.resize --bench images/cat --size 512
+
+times the old path (full decode + LANCZOS on a thread pool) against this
+one on local files and prints images/s for both.
+"""
+import argparse
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+WORKERS = os.cpu_count() or 2
+
+_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG",
+            ".gif": "GIF", ".webp": "WEBP"}
+
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+# -------------------- worker side --------------------
+def resize_bytes(data: bytes, size: Tuple[int, int], ext: str = ".jpg",
+                 draft: bool = True, crop: bool = False) -> bytes:
+    """Decode `data`, resize to exactly `size` (stretched, or center-cropped
+    with `crop`) and re-encode for `ext`."""
+    img = Image.open(io.BytesIO(data))
+    if draft:                               # no-op for anything but JPEG
+        img.draft(img.mode, cover(img.size, size) if crop else size)
+    if crop:
+        # upright first (EXIF orientation), so the crop is what a viewer shows
+        img = ImageOps.fit(ImageOps.exif_transpose(img), size, Image.LANCZOS)
+    else:
+        img = img.resize(size, Image.LANCZOS)
+    fmt = _FORMATS.get(ext.lower(), "JPEG")
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    out = io.BytesIO()
+    img.save(out, fmt)
+    return out.getvalue()
+
+
+def cover(image: Tuple[int, int], size: Tuple[int, int]) -> Tuple[int, int]:
+    """Smallest scale of `image` (same aspect) that covers `size` either way up."""
+    side  = max(size)
+    scale = side / min(image)
+    return max(side, round(image[0] * scale)), max(side, round(image[1] * scale))
+
+
+# -------------------- pool --------------------
+def configure(workers: int = WORKERS) -> ProcessPoolExecutor:
+    """(Re)create the shared process pool."""
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+
+def submit(data: bytes, size: Tuple[int, int], ext: str = ".jpg",
+           crop: bool = False) -> Future:
+    """Resize on the shared pool, creating it with WORKERS processes on first use."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=WORKERS)
+        pool = _pool
+    return pool.submit(resize_bytes, data, size, ext, True, crop)
+
+
+def shutdown() -> None:
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+# -------------------- benchmark --------------------
+def _bench(files, size, executor, draft: bool) -> float:
+    blobs = [f.read_bytes() for f in files]     # keep disk reads out of the timing
+    t0 = time.perf_counter()
+    list(executor.map(resize_bytes, blobs, [size] * len(blobs),
+                      [f.suffix for f in files], [draft] * len(blobs)))
+    return len(blobs) / (time.perf_counter() - t0)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compare threaded vs process-pool resizing")
+    ap.add_argument("--bench", type=Path, required=True, metavar="DIR",
+                    help="folder of sample images (JPEGs show the draft speed-up)")
+    ap.add_argument("--size", type=int, default=512)
+    ap.add_argument("--threads", type=int, default=5, help="old MAX_WORKERS")
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    args = ap.parse_args(argv)
+
+    files = sorted(f for f in args.bench.iterdir() if f.suffix.lower() in _FORMATS)
+    if not files:
+        ap.error(f"no images in {args.bench}")
+    size = (args.size, args.size)
+
+    with ThreadPoolExecutor(args.threads) as ex:
+        before = _bench(files, size, ex, draft=False)
+    with ProcessPoolExecutor(args.workers) as ex:
+        ex.submit(int).result()                 # start the workers before timing
+        after = _bench(files, size, ex, draft=True)
+    print(f"{len(files)} images → {size[0]}×{size[1]}")
+    print(f"  before: full decode, {args.threads} threads   {before:7.1f} img/s")
+    print(f"  after:  draft decode, {args.workers} processes {after:7.1f} img/s "
+          f"({after / before:.1f}×)")
+
+
+if __name__ == "__main__":
+    main()
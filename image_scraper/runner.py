@@ -0,0 +1,373 @@
+# ----------------------------------------------
+# config-driven multi-subject runner
+# ----------------------------------------------
+"""
+Scrape every subject listed in a YAML or JSON file as one job:
+
+    python -m image_scraper.runner skin_condition/subjects.yaml
+    python -m image_scraper.runner skin_condition/subjects.yaml --only acne rosacea
+    python -m image_scraper.runner skin_condition/subjects.yaml --dry-run
+
+Up to `concurrency.subjects` pipelines (see `image_scraper.pipeline`) run
+side by side and share one AIMD limiter (see `image_scraper.aimd`) that
+keeps at most `concurrency.downloads` downloads in flight across all of
+them, one HTTP session, the dedup / near-dup / URL / search caches
+and the per-host search-engine limits from `politeness`.  Each subject
+resumes from its own journal, nothing asks for confirmation, and a
+progress line per running subject is printed every few seconds.
+Per-stage timings, outcomes and queue depths go to `runner.jsonl` and
+`runner.prom` under `metrics` (see `image_scraper.metrics`).  With
+`shards` (MB) set, each subject's images go into tar shards of about
+that size instead of one file each (see `image_scraper.shards`).  With
+`presize` (pixels) set, a center-cropped square copy of each image at
+the classifier's input size goes to `<output>-<presize>/<subject>/`, or
+replaces the original with `originals: false` (see
+`image_scraper.presize`); the mirror is marked complete when every
+original has its copy.  Saved images are listed in
+`<output>/.manifest.sqlite` (and the copies in the mirror's), which is
+also where subjects' counts come from (see `image_scraper.manifest`).
+The dedup, URL and search caches live in `<output>/` too, unless
+`caches` points one of them elsewhere (e.g. one search cache shared by
+several datasets).
+
+Config layout (see `skin_condition/subjects.yaml`):
+
+    output: images
+    defaults:    {images: 1200, per_term: 80, max_terms: 30, banned: [baby]}
+    concurrency: {subjects: 4, downloads: 48}
+    politeness:  {bing.com: [1.0, 3]}
+    metrics:     images/.metrics        # default: <output>/.metrics
+    shards:      256                    # MB per tar shard; leave out for plain files
+    presize:     460                    # px; training-size copies in images-460/
+    originals:   true                   # false: keep only the pre-sized copies
+    caches:      {search: /var/cache/scraper/search.sqlite}   # default: <output>/.<name>.sqlite
+    subjects:
+      acne:
+        title: Acne
+        terms: [acne, acne vulgaris, "site:dermnetnz.org acne"]
+
+Reading YAML needs PyYAML; JSON configs work without it.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from . import client, dedup, journal, metrics, phash, pipeline, presize, probe, ratelimit, resize, search, searchcache, urlcache
+from .aimd import AIMD, START
+from .engine import DownloadStats
+from .manifest import Manifest
+
+SUBJECTS     = 4                # pipelines at once
+DOWNLOADS    = 48               # ceiling for downloads in flight across all of them
+REPORT_EVERY = 5.0              # seconds between progress lines
+CACHES       = {"dedup":  Path(dedup.DEFAULT_DB).name,        # file names under `output`
+                "urls":   Path(urlcache.DEFAULT_DB).name,
+                "search": Path(searchcache.DEFAULT_DB).name}
+
+
+def ascii_hyphens(text: str) -> str:
+    """Fancy hyphens (‐ ‑ ‒ – —) → ASCII, so they don't choke URL quoting."""
+    return text.translate({0x2010: "-", 0x2011: "-", 0x2012: "-",
+                           0x2013: "-", 0x2014: "-"})
+
+
+@dataclass
+class Subject:
+    name:      str
+    terms:     List[str]
+    title:     str = ""
+    images:    int = 1200       # stop once the folder holds this many
+    per_term:  int = 80         # result URLs asked for per term
+    max_terms: int = 30         # random sample of terms per run
+    banned:    List[str] = field(default_factory=list)
+
+    def sample(self) -> List[str]:
+        """This run's terms: banned words dropped, shuffled, `max_terms` of them."""
+        terms = [t for t in self.terms
+                 if not any(b in t.lower() for b in self.banned)]
+        random.shuffle(terms)
+        return terms[:self.max_terms]
+
+
+@dataclass
+class Config:
+    subjects:         List[Subject]
+    output:           Path = Path("images")
+    subjects_at_once: int = SUBJECTS
+    downloads:        int = DOWNLOADS
+    politeness:       Dict[str, Tuple[float, int]] = field(default_factory=dict)
+    metrics:          Optional[Path] = None      # None: <output>/.metrics
+    shard_mb:         int = 0                    # 0: one file per image
+    presize:          int = 0                    # 0: no pre-sized copies
+    originals:        bool = True                # False: the pre-sized copy replaces them
+    caches:           Dict[str, Path] = field(default_factory=dict)   # overrides of CACHES
+
+    def cache(self, name: str) -> Path:
+        """Where the `name` cache (a key of CACHES) lives."""
+        return self.caches.get(name) or self.output / CACHES[name]
+
+
+def load(path) -> Config:
+    """Parse a subjects file; raises ValueError for anything malformed."""
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+    if path.suffix.lower() == ".json":
+        raw = json.loads(text)
+    else:
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"{path}: reading YAML needs PyYAML "
+                             f"(pip install pyyaml), or use a .json config")
+        raw = yaml.safe_load(text)
+    if not isinstance(raw, dict) or not raw.get("subjects"):
+        raise ValueError(f"{path}: no subjects")
+
+    known    = {f.name for f in fields(Subject)}
+    defaults = raw.get("defaults") or {}
+    subjects = []
+    for name, spec in raw["subjects"].items():
+        spec = {**defaults, **(spec or {})}
+        unknown = set(spec) - known
+        if unknown:
+            raise ValueError(f"{path}: {name}: unknown keys {sorted(unknown)}")
+        if not spec.get("terms"):
+            raise ValueError(f"{path}: {name}: no terms")
+        subjects.append(Subject(name=str(name), **spec))
+
+    caches = raw.get("caches") or {}
+    unknown = set(caches) - set(CACHES)
+    if unknown:
+        raise ValueError(f"{path}: caches: unknown keys {sorted(unknown)}")
+
+    conc = raw.get("concurrency") or {}
+    return Config(subjects=subjects,
+                  output=Path(raw.get("output", "images")),
+                  subjects_at_once=int(conc.get("subjects", SUBJECTS)),
+                  downloads=int(conc.get("downloads", DOWNLOADS)),
+                  politeness={h: tuple(v) for h, v in (raw.get("politeness") or {}).items()},
+                  metrics=Path(raw["metrics"]) if raw.get("metrics") else None,
+                  shard_mb=int(raw.get("shards") or 0),
+                  presize=int(raw.get("presize") or 0),
+                  originals=bool(raw.get("originals", True)),
+                  caches={k: Path(v) for k, v in caches.items()})
+
+
+# -------------------- progress --------------------
+class Board:
+    """Live per-subject counters, printed by a background thread."""
+
+    def __init__(self, limiter: Optional[AIMD] = None):
+        self.lock    = threading.Lock()
+        self.limiter = limiter
+        self.rows: Dict[str, Tuple[Subject, int, DownloadStats, float]] = {}
+
+    def start(self, subject: Subject, have: int, stats: DownloadStats) -> None:
+        with self.lock:
+            self.rows[subject.name] = (subject, have, stats, time.perf_counter())
+
+    def finish(self, subject: Subject) -> None:
+        with self.lock:
+            self.rows.pop(subject.name, None)
+
+    def line(self) -> str:
+        with self.lock:
+            rows = list(self.rows.values())
+        now = time.perf_counter()
+        line = " | ".join(
+            f"{s.name} {have + st.saved}/{s.images} "
+            f"({st.saved / max(now - t0, 1e-9):.1f} img/s, {st.failed} failed)"
+            for s, have, st, t0 in rows)
+        if line and self.limiter is not None:
+            line += f" | limit {self.limiter.stats()['limit']}"
+        return line
+
+    def report(self, stop: threading.Event, every: float = REPORT_EVERY) -> None:
+        while not stop.wait(every):
+            line = self.line()
+            if line:
+                print(f"  … {line}", flush=True)
+
+
+# -------------------- scraping --------------------
+@dataclass
+class Shared:
+    """Indices, caches and the download limiter every subject's pipeline uses."""
+    seen:     dedup.DedupIndex
+    near:     phash.NearDupIndex
+    urls:     urlcache.UrlCache
+    results:  searchcache.SearchCache
+    limiter:  AIMD
+    manifest: Manifest
+    copies:   Optional[Manifest] = None  # the pre-sized mirror's
+
+    def close(self) -> None:
+        self.seen.close()
+        self.near.close()
+        self.urls.close()
+        self.results.close()
+        self.manifest.close()
+        if self.copies is not None:
+            self.copies.close()
+
+
+def scrape(subject: Subject, out_root: Path, shared: Shared, workers: int,
+           board: Optional[Board] = None, shard_mb: int = 0, size: int = 0,
+           originals: bool = True) -> DownloadStats:
+    """Run one subject's pipeline until its folder holds `subject.images`."""
+    out = out_root / subject.name
+    small = presize.mirror(out_root, size) / subject.name if size and originals else None
+    out.mkdir(parents=True, exist_ok=True)
+    log  = journal.Journal(out)
+    have = log.start(lambda: shared.manifest.count(subject.name))
+    shared.seen.backfill(out)
+    stats = DownloadStats()
+    if board is not None:
+        board.start(subject, have, stats)
+    try:
+        pipeline.run(subject.sample(),
+                     lambda t: search.image_pages(ascii_hyphens(t), subject.per_term,
+                                                  cache=shared.results),
+                     out, name=pipeline.sequential(subject.name, have,
+                                                   [*shared.manifest.names(subject.name), *log.files]),
+                     limit=subject.images - have,
+                     download_workers=workers,
+                     dedup=shared.seen, near=shared.near, urls=shared.urls,
+                     journal=log, stats=stats, limiter=shared.limiter,
+                     shard_bytes=shard_mb * 1024 * 1024,
+                     presize=size, presize_dir=small,
+                     manifest=shared.manifest, presize_manifest=shared.copies,
+                     quiet=board is not None)
+    finally:
+        log.close()
+        if board is not None:
+            board.finish(subject)
+    print(f"✓ {subject.title or subject.name}: {have + stats.saved} images "
+          f"(+{stats.saved}) — {stats.summary()}", flush=True)
+    return stats
+
+
+def run_all(cfg: Config, report_every: float = REPORT_EVERY) -> Dict[str, DownloadStats]:
+    """Scrape every subject in `cfg`, `cfg.subjects_at_once` at a time."""
+    at_once = max(1, min(cfg.subjects_at_once, len(cfg.subjects)))
+    workers = max(1, cfg.downloads)     # any subject may use the whole budget
+    for host, (rate, burst) in cfg.politeness.items():
+        ratelimit.configure(host, rate, burst)
+    client.configure(pool_maxsize=max(client.POOL_MAXSIZE, workers))
+
+    cfg.output.mkdir(parents=True, exist_ok=True)
+    near = phash.open_index(cfg.output)
+    near.scan(cfg.output)
+    listing = Manifest(cfg.output)
+    listing.sync()
+    copies = None
+    if cfg.presize and cfg.originals:
+        copies = Manifest(presize.mirror(cfg.output, cfg.presize))
+        copies.sync()
+        presize.mark(copies.root, False)    # until every original has its copy again
+    shared = Shared(dedup.DedupIndex(cfg.cache("dedup")), near,
+                    urlcache.UrlCache(cfg.cache("urls")),
+                    searchcache.SearchCache(cfg.cache("search")),
+                    AIMD(limit=min(START, workers), max_limit=workers), listing, copies)
+
+    board, stop = Board(shared.limiter), threading.Event()
+    reporter = threading.Thread(target=board.report, args=(stop, report_every), daemon=True)
+    reporter.start()
+    exporter = metrics.Exporter(cfg.metrics or cfg.output / ".metrics", job="runner",
+                                limiter=shared.limiter).start()
+    try:
+        with ThreadPoolExecutor(max_workers=at_once) as pool:
+            futures = {s.name: pool.submit(scrape, s, cfg.output, shared, workers, board,
+                                           cfg.shard_mb, cfg.presize, cfg.originals)
+                       for s in cfg.subjects}
+            results = {}
+            for name, fut in futures.items():
+                try:
+                    results[name] = fut.result()
+                except Exception as e:
+                    print(f"✗ {name}: {e}", flush=True)
+    finally:
+        stop.set()
+        reporter.join()
+        exporter.close()
+        listed = listing.summary()
+        if copies is not None:
+            presize.mark(copies.root, copies.counts() == listing.counts())
+        shared.close()
+    print(f"  {shared.urls.summary()}")
+    print(f"  {shared.results.summary()}")
+    print(f"  {shared.limiter.summary()}")
+    print(f"  {listed}")
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Scrape every subject in a YAML/JSON config")
+    ap.add_argument("config", type=Path)
+    ap.add_argument("--only", nargs="+", metavar="SUBJECT", help="subset of the config's subjects")
+    ap.add_argument("--subjects", type=int, help="pipelines at once (overrides the config)")
+    ap.add_argument("--downloads", type=int, help="shared download workers (overrides the config)")
+    ap.add_argument("--metrics", type=Path, metavar="DIR",
+                    help="folder for runner.jsonl / runner.prom (overrides the config)")
+    ap.add_argument("--shards", type=int, metavar="MB",
+                    help="write tar shards of this size instead of files (overrides the config)")
+    ap.add_argument("--presize", type=int, metavar="PX",
+                    help="also store PX×PX center crops under <output>-PX (overrides the config)")
+    ap.add_argument("--no-originals", action="store_true",
+                    help="with --presize, keep only the pre-sized copies")
+    ap.add_argument("--dry-run", action="store_true", help="print each subject's terms and exit")
+    args = ap.parse_args(argv)
+
+    try:
+        cfg = load(args.config)
+    except (OSError, ValueError) as e:
+        ap.error(str(e))
+    if args.only:
+        missing = set(args.only) - {s.name for s in cfg.subjects}
+        if missing:
+            ap.error(f"not in {args.config}: {', '.join(sorted(missing))}")
+        cfg.subjects = [s for s in cfg.subjects if s.name in args.only]
+    if args.subjects:
+        cfg.subjects_at_once = args.subjects
+    if args.downloads:
+        cfg.downloads = args.downloads
+    if args.metrics:
+        cfg.metrics = args.metrics
+    if args.shards is not None:
+        cfg.shard_mb = args.shards
+    if args.presize is not None:
+        cfg.presize = args.presize
+    if args.no_originals:
+        cfg.originals = False
+
+    print(f"=== {len(cfg.subjects)} subjects → {cfg.output}/ "
+          f"({cfg.subjects_at_once} at once, {cfg.downloads} downloads) ===")
+    for s in cfg.subjects:
+        print(f"  {s.name:24s} {len(s.terms):3d} terms, target {s.images}")
+    if args.dry_run:
+        for s in cfg.subjects:
+            print(f"\n{s.title or s.name}:")
+            for i, t in enumerate(s.sample(), 1):
+                print(f"  {i:2d}. {t}")
+        return
+
+    t0 = time.perf_counter()
+    results = run_all(cfg)
+    saved = sum(st.saved for st in results.values())
+    elapsed = time.perf_counter() - t0
+    print(f"\nDone: {saved} new images for {len(results)}/{len(cfg.subjects)} subjects "
+          f"in {elapsed / 60:.1f} min")
+    metrics.print_stats()
+    probe.print_stats()
+    resize.shutdown()
+    client.print_stats()
+
+
+if __name__ == "__main__":
+    main()
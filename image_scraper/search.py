@@ -0,0 +1,190 @@
+# ----------------------------------------------
+# Bing / DuckDuckGo image search, page by page
+# ----------------------------------------------
+"""
+Generators that yield image URLs one result page at a time, so callers
+(see `image_scraper.pipeline`) can start downloading as soon as the
+first page is back instead of waiting for the whole term.
+
+Pacing is left to `image_scraper.ratelimit`; there are no sleeps here.
+Pass a `cache` (see `image_scraper.searchcache`) to reuse result pages
+fetched by earlier runs.
+
+Bing pages are scanned for their `a.iusc` tags with a regex instead of
+being parsed into a BeautifulSoup tree, which cost far more CPU than the
+request itself; BeautifulSoup is only used (and only imported) when the
+scan finds nothing on a page that mentions `iusc`.  Compare the two with
+`python -m image_scraper.bench --only bing-parse`.
+"""
+import html
+import json
+import re
+import urllib.parse
+from typing import Dict, Iterator, List, Optional
+
+from . import client, metrics, vqd
+from .searchcache import SearchCache
+
+AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+         "AppleWebKit/537.36 (KHTML, like Gecko) "
+         "Chrome/118.0 Safari/537.36")
+
+BING_URL      = "https://www.bing.com/images/search"
+BING_PAGE     = 35              # results Bing returns per page
+DDG_URL       = "https://duckduckgo.com/"
+MIN_BING_HITS = 10              # below this, fall back to DuckDuckGo
+
+
+# -------------------- Bing --------------------
+_A_TAG = re.compile(r"""<a\s(?:[^>"']|"[^"]*"|'[^']*')*>""", re.IGNORECASE)
+_ATTR  = re.compile(r"""([^\s=/>]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+
+
+def _murl(m: Optional[str], urls: List[str]) -> None:
+    if not m:
+        return
+    try:
+        urls.append(json.loads(m)["murl"])
+    except Exception:
+        pass
+
+
+def scan_bing(page: str) -> List[str]:
+    """`murl`s of the `a.iusc` tiles, found by scanning the opening tags only."""
+    urls = []
+    for tag in _A_TAG.finditer(page):
+        tag = tag.group()
+        if "iusc" not in tag:
+            continue
+        attrs = {k.lower(): html.unescape(dq or sq or bare)
+                 for k, dq, sq, bare in _ATTR.findall(tag[2:])}
+        if "iusc" in attrs.get("class", "").split():
+            _murl(attrs.get("m"), urls)
+    return urls
+
+
+def soup_bing(page: str) -> List[str]:
+    """Same as `scan_bing`, through a full BeautifulSoup parse (slow, but lenient)."""
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        return []
+    urls = []
+    for tag in BeautifulSoup(page, "html.parser").find_all("a", class_="iusc"):
+        _murl(tag.get("m"), urls)
+    return urls
+
+
+def parse_bing(page: str) -> List[str]:
+    """Pull the full-size `murl` out of every `a.iusc` result tile."""
+    urls = scan_bing(page)
+    if not urls and "iusc" in page:         # markup the scan doesn't understand
+        urls = soup_bing(page)
+    return urls
+
+
+def bing_pages(term: str, max_images: int = 100, extra: str = "",
+               headers: Optional[Dict[str, str]] = None,
+               cache: Optional[SearchCache] = None) -> Iterator[List[str]]:
+    """Yield up to `max_images` Bing image URLs, one result page at a time.
+
+    `extra` is appended to the query string (e.g. `&form=HDRSC2` or a
+    `qft` size filter) and is part of the cache key.
+    """
+    headers = headers or {"User-Agent": AGENT}
+    query = term + extra
+    found = 0
+    for offset in range(0, max_images, BING_PAGE):
+        page = cache.get("bing", query, offset) if cache is not None else None
+        if page is None:
+            url = (f"{BING_URL}?q={urllib.parse.quote(term)}"
+                   f"&first={offset + 1}{extra}")
+            try:
+                with metrics.timed("search"):
+                    r = client.get(url, headers=headers, timeout=10)
+                    r.raise_for_status()
+                    page_urls = parse_bing(r.text)
+            except Exception as e:
+                print(f"Bing error: {e}")
+                continue
+            if cache is not None and page_urls:        # empty = blocked or end
+                cache.put("bing", query, offset, page_urls)
+        else:
+            page_urls = page.urls
+        urls = page_urls[:max_images - found]
+        if urls:
+            found += len(urls)
+            yield urls
+        if found >= max_images:
+            break
+
+
+# ----------------- DuckDuckGo -----------------
+def _ddg_json(term: str, params: dict, headers: Dict[str, str]) -> dict:
+    """One `i.js` page; if DDG rejects the token, refresh it once and retry."""
+    r = client.get(DDG_URL + "i.js", params=params, headers=headers, timeout=10)
+    if r.status_code in (401, 403):
+        vqd.invalidate(term)
+        token = vqd.token(term)
+        if token is not None:
+            params["vqd"] = token
+            r = client.get(DDG_URL + "i.js", params=params, headers=headers, timeout=10)
+    r.raise_for_status()
+    return r.json()
+
+
+def ddg_pages(term: str, max_images: int = 100,
+              headers: Optional[Dict[str, str]] = None,
+              cache: Optional[SearchCache] = None) -> Iterator[List[str]]:
+    """Yield up to `max_images` DuckDuckGo image URLs, one `i.js` page at a time.
+
+    Tokens come from `image_scraper.vqd`, so a term that was searched
+    before costs one request per page; none at all for cached pages.
+    """
+    headers = headers or {"User-Agent": AGENT}
+    params  = None
+    cursor  = None
+    found, page_no = 0, 0
+    while found < max_images:
+        page = cache.get("ddg", term, page_no) if cache is not None else None
+        if page is None:
+            if params is None:
+                token = vqd.token(term)
+                if token is None:
+                    return
+                params = {"l": "us-en", "o": "json", "q": term, "vqd": token,
+                          "f": ",,,", "p": "1", "v7exp": "a"}
+            if cursor is not None:
+                params["s"] = cursor
+            try:
+                with metrics.timed("search"):
+                    data = _ddg_json(term, params, headers)
+            except Exception as e:
+                print(f"DDG loop error: {e}")
+                return
+            page_urls = [x["image"] for x in data.get("results", [])]
+            cursor    = data.get("next")
+            if cache is not None and page_urls:
+                cache.put("ddg", term, page_no, page_urls, cursor)
+        else:
+            page_urls, cursor = page
+        urls = page_urls[:max_images - found]
+        found += len(urls)
+        if urls:
+            yield urls
+        if cursor is None:
+            return
+        page_no += 1
+
+
+# ------------------ combined ------------------
+def image_pages(term: str, max_images: int = 100,
+                cache: Optional[SearchCache] = None, **bing_kwargs) -> Iterator[List[str]]:
+    """Bing first; if it comes back with fewer than MIN_BING_HITS, top up from DDG."""
+    found = 0
+    for page in bing_pages(term, max_images, cache=cache, **bing_kwargs):
+        found += len(page)
+        yield page
+    if found < MIN_BING_HITS:
+        print(f"  ↳ only {found} Bing hits for '{term}', trying DuckDuckGo …")
+        yield from ddg_pages(term, max_images, cache=cache)
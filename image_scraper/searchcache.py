@@ -0,0 +1,113 @@
+# ----------------------------------------------
+# on-disk cache of search result pages
+# ----------------------------------------------
+"""
+(engine, query, offset) → the image URLs extracted from that result page.
+
+Every run shuffles its search terms but asks Bing and DuckDuckGo for the
+same pages again.  `image_scraper.search` checks this cache before each
+page request, so a repeated run or a restart after a crash goes straight
+to downloading.
+
+* offset is Bing's `first=` value minus one, or the page number for DDG
+  (whose pages are chained through a `next` cursor, stored alongside).
+* entries older than `ttl` are ignored and dropped on the next eviction.
+* once the stored URL lists exceed `max_bytes` the least recently used
+  pages go first.
+
+Eviction runs on open and on `close()`; the cache lives in
+`images/.search.sqlite` by default, next to the other indices.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+DEFAULT_DB = "images/.search.sqlite"
+TTL        = 7 * 24 * 3600          # results drift; a week is close enough
+MAX_BYTES  = 64 * 1024 * 1024       # of stored URL text
+
+
+class Page(NamedTuple):
+    urls:   List[str]
+    cursor: Optional[str]            # DDG `next` cursor, None for Bing / last page
+
+
+class SearchCache:
+    def __init__(self, db_path=DEFAULT_DB, ttl: float = TTL, max_bytes: int = MAX_BYTES):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS pages ("
+                        " engine  TEXT NOT NULL,"
+                        " query   TEXT NOT NULL,"
+                        " offset  INTEGER NOT NULL,"
+                        " urls    TEXT NOT NULL,"
+                        " cursor  TEXT,"
+                        " size    INTEGER NOT NULL,"
+                        " fetched REAL NOT NULL,"
+                        " used    REAL NOT NULL,"
+                        " PRIMARY KEY (engine, query, offset))")
+        self.ttl       = ttl
+        self.max_bytes = max_bytes
+        self.lock      = threading.Lock()
+        self.hits      = 0
+        self.misses    = 0
+        self.evict()
+
+    def get(self, engine: str, query: str, offset: int) -> Optional[Page]:
+        """The cached page if it is younger than `ttl`, else None."""
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT urls, cursor FROM pages"
+                                  " WHERE engine = ? AND query = ? AND offset = ?"
+                                  " AND fetched > ?",
+                                  (engine, query, offset, now - self.ttl)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute("UPDATE pages SET used = ?"
+                            " WHERE engine = ? AND query = ? AND offset = ?",
+                            (now, engine, query, offset))
+        return Page(json.loads(row[0]), row[1])
+
+    def put(self, engine: str, query: str, offset: int,
+            urls: List[str], cursor: Optional[str] = None) -> None:
+        blob = json.dumps(urls)
+        now  = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (engine, query, offset, blob, cursor,
+                             len(blob) + len(cursor or ""), now, now))
+            self.db.commit()
+
+    def evict(self) -> int:
+        """Drop expired pages, then LRU pages until under `max_bytes`."""
+        with self.lock:
+            cur = self.db.execute("DELETE FROM pages WHERE fetched <= ?",
+                                  (time.time() - self.ttl,))
+            dropped = cur.rowcount
+            total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+            if total > self.max_bytes:
+                doomed, excess = [], total - self.max_bytes
+                for rowid, size in self.db.execute("SELECT rowid, size FROM pages ORDER BY used"):
+                    if excess <= 0:
+                        break
+                    doomed.append((rowid,))
+                    excess -= size
+                self.db.executemany("DELETE FROM pages WHERE rowid = ?", doomed)
+                dropped += len(doomed)
+            self.db.commit()
+        return dropped
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate  = f" ({self.hits / total:.0%})" if total else ""
+        return f"search cache: {self.hits}/{total} pages from cache{rate}"
+
+    def close(self) -> None:
+        self.evict()
+        self.db.close()
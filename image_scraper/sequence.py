@@ -0,0 +1,102 @@
+# ----------------------------------------------
+# atomic file-name allocation
+# ----------------------------------------------
+"""
+Hands out `{prefix}{N}{ext}` names in a folder, each one exactly once,
+to any number of threads and processes.
+
+A name is claimed by creating the file with `O_CREAT | O_EXCL`, which
+the OS does atomically: if another thread or process got there first,
+the claim moves on to the next number.  The number, not the name, is
+what's claimed: once the placeholder exists any other `{prefix}{N}.*`
+(a `.png` claimed by another process a moment earlier) makes the claim
+give the number up and move on, so `cat-5.jpg` and `cat-5.png` never
+both end up in the folder.  `write()` then replaces the empty
+placeholder with the image through a `.part` file and `os.replace`, so
+a crash mid-write never leaves a truncated image under a real name.
+
+    names = Sequence("images/animals/cat", "cat-", start=413)
+    path = names.claim(".jpg")          # only once the image is accepted
+    try:
+        names.write(path.name, data)
+    except OSError:
+        names.release(path)
+        raise
+
+Claim a name only after the image has passed every check, so rejected
+downloads never use up a number.  `cleanup()` removes empty placeholders
+and `.part` files left behind by a crash between claim and rename.
+"""
+import glob
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from .store import PART
+
+
+class Sequence:
+    def __init__(self, folder, prefix: str, start: int = 1, width: int = 0):
+        self.folder  = Path(folder)
+        self.prefix  = prefix
+        self.width   = width            # zero-pad N to this many digits
+        self.next    = start
+        self.taken   = 0                # numbers found already used by someone else
+        self.lock    = threading.Lock()
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    def name(self, n: int, ext: str) -> str:
+        return f"{self.prefix}{n:0{self.width}d}{ext}"
+
+    def claim(self, ext: str = ".jpg") -> Path:
+        """Reserve the next free name by creating it empty; returns its path."""
+        while True:
+            with self.lock:
+                n = self.next
+                self.next += 1
+            path = self.folder / self.name(n, ext)
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            except FileExistsError:
+                with self.lock:
+                    self.taken += 1
+                continue
+            # checked after creating ours: of two racing claims with different
+            # extensions at least the later one sees the other and backs off
+            if any(f != path for f in self.folder.glob(glob.escape(self.name(n, "")) + ".*")):
+                path.unlink(missing_ok=True)
+                with self.lock:
+                    self.taken += 1
+                continue
+            return path
+
+    def write(self, name: str, data: bytes, meta: Optional[dict] = None) -> Path:
+        """Put `data` under the claimed `name` atomically (`meta` is for `shards.ShardWriter` parity)."""
+        final = self.folder / name
+        tmp   = self.folder / f".{name}{PART}"
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, final)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return final
+
+    def release(self, path) -> None:
+        """Give up a claimed name whose write failed (its number is not reused)."""
+        path = Path(path)
+        try:
+            if path.stat().st_size == 0:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def cleanup(self) -> int:
+        """Delete empty `{prefix}*` placeholders and their `.part` files; returns how many."""
+        stale = [f for f in self.folder.glob(f"{self.prefix}*")
+                 if f.is_file() and f.stat().st_size == 0]
+        stale += self.folder.glob(f".{glob.escape(self.prefix)}*{PART}")
+        for f in stale:
+            f.unlink(missing_ok=True)
+        return len(stale)
@@ -0,0 +1,325 @@
+# ----------------------------------------------
+# WebDataset-style tar shard output and reader
+# ----------------------------------------------
+"""
+Accepted images streamed into a few size-bounded tar files instead of
+one small file each, so listing, copying and rsyncing a 67k-image
+dataset means handling dozens of files, not tens of thousands.
+
+`<folder>/<prefix>-000001.tar`, `-000002.tar` … hold, per sample, the
+image followed by a JSON sidecar with the same key (the WebDataset
+layout, so `webdataset.WebDataset(urls)` reads them as well):
+
+    acne_0413.jpg
+    acne_0413.json   {"label": "acne", "url": …, "sha256": …,
+                      "format": "jpeg", "width": 800, "height": 600, "bytes": 53122}
+
+    shard = ShardWriter("images/acne", "acne", label="acne",
+                        on_commit=lambda path, info: print("saved", path, info["url"]))
+    shard.write("acne_0413.jpg", data, {"url": url, "sha256": sha})
+    shard.close()
+
+A shard is written in place and rolls over to the next number once it
+passes `max_bytes` or `max_count` samples.  Like `store.AtomicWriter`,
+samples are fsync'ed in batches of `fsync_every` (0 = no fsync) and only
+then passed to `on_commit` (as `<shard>.tar/<name>`, with the sidecar
+plus the image's `offset` in the shard),
+so the resume journal never counts a sample a crash could still take.
+A crash leaves the open shard without its end-of-archive blocks, which
+readers don't need; a torn last sample is skipped.  Every run starts a
+new shard.
+
+`claim()` / `release()` / `cleanup()` match `sequence.Sequence`, so the
+animal downloader can hand out names the same way in either mode.
+
+Reading, e.g. as a fastai `DataBlock` source:
+
+    DataBlock(blocks=(ImageBlock, CategoryBlock),
+              get_items=shards.get_items, get_x=shards.read, get_y=shards.label, …)
+
+`get_items(folder)` indexes every shard under `folder` from the tar
+headers and sidecars, one sequential pass per shard; `read(sample)` is
+then a single positioned read from an already open shard, no per-image
+open / stat.  `iterate(folder)` streams (sample, bytes) in file order,
+and `pack(path, samples)` writes a whole shard at once (e.g. a
+pre-sized copy, see `image_scraper.presize`).
+"""
+import fnmatch
+import io
+import json
+import os
+import re
+import tarfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from . import probe
+
+SHARD_BYTES = 256 * 1024 * 1024
+SHARD_COUNT = 10_000
+FSYNC_EVERY = 32
+IMAGE_EXTS  = set(probe.EXTENSIONS.values()) | {".jpeg"}
+
+_NUMBER = re.compile(r"-(\d+)\.tar$")
+
+
+class Sample(NamedTuple):
+    shard:  str                 # path of the tar file
+    name:   str                 # member name, e.g. acne_0413.jpg
+    offset: int                 # where the image bytes start in the shard
+    size:   int
+    label:  str
+    meta:   dict                # the sidecar
+
+
+def shard_files(folder) -> List[Path]:
+    """Every `*.tar` shard under `folder`, in name order."""
+    return sorted(Path(folder).rglob("*.tar"))
+
+
+def found(folder) -> bool:
+    return any(True for _ in Path(folder).rglob("*.tar"))
+
+
+# -------------------- writing --------------------
+class ShardWriter:
+    def __init__(self, folder, prefix: str = "shard", label: Optional[str] = None,
+                 max_bytes: int = SHARD_BYTES, max_count: int = SHARD_COUNT,
+                 fsync_every: int = FSYNC_EVERY,
+                 on_commit: Optional[Callable[[Path, dict], None]] = None, start: int = 1):
+        self.folder      = Path(folder)
+        self.prefix      = prefix
+        self.label       = label if label is not None else self.folder.name
+        self.max_bytes   = max_bytes
+        self.max_count   = max_count
+        self.fsync_every = fsync_every
+        self.on_commit   = on_commit
+        self.lock        = threading.Lock()
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+        numbers = [int(m.group(1)) for f in self.folder.glob(f"{prefix}-*.tar")
+                   if (m := _NUMBER.search(f.name))]
+        self.number  = max(numbers, default=0)     # last shard used; a run starts a new one
+        self.tar: Optional[tarfile.TarFile] = None
+        self.path: Optional[Path] = None
+        self.size    = 0                            # bytes in the open shard
+        self.count   = 0                            # samples in the open shard
+        self.pending: List[Tuple[Path, dict]] = []  # written, not fsync'ed yet
+        self.next    = start                        # for claim()
+
+    # -------------------- Sequence-compatible names --------------------
+    def name(self, n: int, ext: str) -> str:
+        return f"{self.prefix}-{n}{ext}"
+
+    def claim(self, ext: str = ".jpg") -> Path:
+        """The next `<prefix>-N` sample name (nothing is created until `write`)."""
+        with self.lock:
+            n = self.next
+            self.next += 1
+        return self.folder / self.name(n, ext)
+
+    def release(self, path) -> None:
+        pass
+
+    def cleanup(self) -> int:
+        return 0
+
+    # -------------------- samples --------------------
+    def write(self, name: str, data: bytes, meta: Optional[dict] = None) -> Path:
+        """Append `data` as `name` plus its sidecar; returns `<shard>.tar/<name>`."""
+        info    = _info(self.label, data, meta)
+        sidecar = json.dumps(info, ensure_ascii=False).encode("utf-8")
+
+        with self.lock:
+            if self.tar is None:
+                self._open()
+            offset = _add(self.tar, name, data)
+            _add(self.tar, f"{Path(name).stem}.json", sidecar)
+            self.size  += len(data) + len(sidecar)
+            self.count += 1
+            path = self.path / name
+            self.pending.append((path, {**info, "offset": offset}))
+            full = self.size >= self.max_bytes or self.count >= self.max_count
+            batch = (self._sync() if full or len(self.pending) >= max(1, self.fsync_every)
+                     else [])
+            if full:
+                self._close()
+        self._committed(batch)
+        return path
+
+    def _open(self) -> None:
+        self.number += 1
+        self.path  = self.folder / f"{self.prefix}-{self.number:06d}.tar"
+        self.tar   = tarfile.open(self.path, "w")
+        self.size  = self.count = 0
+
+    def _sync(self) -> List[Tuple[Path, dict]]:
+        if self.tar is not None:
+            self.tar.fileobj.flush()
+            if self.fsync_every > 0:
+                os.fsync(self.tar.fileobj.fileno())
+        batch, self.pending = self.pending, []
+        return batch
+
+    def _close(self) -> None:
+        if self.tar is not None:
+            self.tar.close()                        # end-of-archive blocks
+            self.tar = None
+
+    def _committed(self, batch: List[Tuple[Path, dict]]) -> None:
+        if self.on_commit is not None:
+            for path, info in batch:
+                self.on_commit(path, info)
+
+    def flush(self) -> None:
+        """fsync the open shard and commit what is in it so far (it stays open)."""
+        with self.lock:
+            batch = self._sync()
+        self._committed(batch)
+
+    def close(self) -> None:
+        with self.lock:
+            batch = self._sync()
+            self._close()
+        self._committed(batch)
+
+
+def _info(label: str, data: bytes, meta: Optional[dict]) -> dict:
+    """A sample's sidecar: label, the caller's `meta`, and the image's own format / size."""
+    info = {"label": label, **(meta or {})}
+    size = probe.image_size(data[:probe.MAX_BYTES])
+    if size is not None:
+        info.update(format=size[0], width=size[1], height=size[2])
+    info["bytes"] = len(data)
+    return info
+
+
+def _add(tar: tarfile.TarFile, name: str, data: bytes) -> int:
+    """Append one member; returns where its data starts in the file."""
+    info = tarfile.TarInfo(name)
+    info.size, info.mtime, info.mode = len(data), int(time.time()), 0o644
+    tar.addfile(info, io.BytesIO(data))
+    return tar.offset - -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+
+
+def pack(path, samples: Iterable[Tuple[str, bytes, dict]]) -> int:
+    """Write a complete shard of (name, image bytes, sidecar) at `path`, atomically.
+
+    Each sidecar keeps its label and other keys; format, size and bytes
+    are taken from the new image.  Returns the number of samples."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp, n = path.with_name(f".{path.name}.part"), 0
+    with tarfile.open(tmp, "w") as tar:
+        for name, data, meta in samples:
+            info = _info(str(meta.get("label", path.parent.name)), data, meta)
+            _add(tar, name, data)
+            _add(tar, f"{Path(name).stem}.json", json.dumps(info, ensure_ascii=False).encode("utf-8"))
+            n += 1
+    os.replace(tmp, path)
+    return n
+
+
+# -------------------- reading --------------------
+def _members(shard: Path) -> Iterator[Tuple[tarfile.TarInfo, tarfile.TarFile]]:
+    """Members of `shard` up to the first damaged one (a crash's torn tail)."""
+    try:
+        with tarfile.open(shard, "r:") as tar:
+            while True:
+                try:
+                    member = tar.next()
+                except tarfile.ReadError:
+                    return
+                if member is None:
+                    return
+                yield member, tar
+    except (OSError, tarfile.ReadError):
+        return
+
+
+def index(shard) -> List[Sample]:
+    """The complete samples in one shard, in file order."""
+    shard = Path(shard)
+    end   = shard.stat().st_size
+    images: Dict[str, tarfile.TarInfo] = {}
+    out = []
+    for member, tar in _members(shard):
+        key, ext = os.path.splitext(member.name)
+        if ext.lower() in IMAGE_EXTS:
+            images[key] = member
+        elif ext == ".json" and key in images:
+            img = images.pop(key)
+            if img.offset_data + img.size > end or member.offset_data + member.size > end:
+                break
+            try:
+                meta = json.loads(tar.extractfile(member).read())
+            except (ValueError, tarfile.ReadError, OSError):
+                break
+            out.append(Sample(str(shard), img.name, img.offset_data, img.size,
+                              str(meta.get("label", shard.parent.name)), meta))
+    return out
+
+
+def get_items(folder) -> List[Sample]:
+    """Every sample of every shard under `folder` (a fastai `get_items`)."""
+    return [s for shard in shard_files(folder) for s in index(shard)]
+
+
+def names(folder, pattern: str = "*") -> List[str]:
+    """Member names of the images in `folder`'s shards matching `pattern`."""
+    return [s.name for s in get_items(folder) if fnmatch.fnmatch(s.name, pattern)]
+
+
+def counts(folder) -> Dict[str, int]:
+    """Samples per label."""
+    out: Dict[str, int] = {}
+    for s in get_items(folder):
+        out[s.label] = out.get(s.label, 0) + 1
+    return out
+
+
+_handles: Dict[Tuple[int, str], int] = {}     # (pid, shard) → fd; DataLoader workers fork
+_handles_lock = threading.Lock()
+
+
+def _fd(shard: str) -> int:
+    key = (os.getpid(), shard)
+    fd = _handles.get(key)
+    if fd is None:
+        with _handles_lock:
+            fd = _handles.get(key)
+            if fd is None:
+                fd = _handles[key] = os.open(shard, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    return fd
+
+
+def read(sample: Sample) -> bytes:
+    """The image bytes of `sample` (a fastai `get_x`; `PILImage.create` takes bytes)."""
+    fd = _fd(sample.shard)
+    if hasattr(os, "pread"):
+        return os.pread(fd, sample.size, sample.offset)
+    with _handles_lock:                         # no pread on Windows: seek + read
+        os.lseek(fd, sample.offset, os.SEEK_SET)
+        return os.read(fd, sample.size)
+
+
+def label(sample: Sample) -> str:
+    """The sample's class (a fastai `get_y`)."""
+    return sample.label
+
+
+def samples(shard) -> Iterator[Tuple[Sample, bytes]]:
+    """(sample, image bytes) for one shard, read front to back."""
+    found = index(shard)
+    with open(shard, "rb") as f:
+        for s in found:
+            f.seek(s.offset)
+            yield s, f.read(s.size)
+
+
+def iterate(folder) -> Iterator[Tuple[Sample, bytes]]:
+    """(sample, image bytes) for every shard under `folder`, in file order."""
+    for shard in shard_files(folder):
+        yield from samples(shard)
@@ -0,0 +1,136 @@
+# ----------------------------------------------
+# persistent URL outcome cache
+# ----------------------------------------------
+"""
+URL → what happened last time we fetched it.
+
+Re-running a scraper used to re-fetch every search hit, including the
+ones that were saved already, 404'd, were too small or failed
+`Image.verify()`.  Downloaders now look each URL up here first and only
+fetch the ones that are new or whose cached failure has expired.
+
+Outcomes are short strings: `saved`, `duplicate`, `too_small`,
+`too_large`, `invalid`, `http_<status>`, `timeout`, `reset` (connection
+errors) or `error` (anything else).  Each has a TTL in `TTLS`; permanent
+ones (None) are never re-tried, transient ones (5xx, 429, network
+errors) are forgotten after a while.  Pass `ttls={...}` to override any
+of them.
+
+Like `image_scraper.dedup` the table is loaded into a dict on open and
+shared by every subject (`images/.urls.sqlite` by default).
+"""
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+DEFAULT_DB   = "images/.urls.sqlite"
+COMMIT_EVERY = 100
+
+HOUR = 3600
+DAY  = 24 * HOUR
+
+TTLS: Dict[str, Optional[float]] = {     # seconds; None = remember for good
+    "saved":     None,
+    "duplicate": None,
+    "too_small": None,
+    "too_large": None,                  # over probe.MAX_IMAGE
+    "invalid":   None,                  # not an image / failed verify()
+    "http_4xx":  7 * DAY,               # 404, 403, 410 … rarely come back
+    "http_429":  1 * HOUR,
+    "http_5xx":  6 * HOUR,
+    "timeout":   1 * HOUR,
+    "reset":     1 * HOUR,
+    "error":     1 * HOUR,
+}
+
+
+class Outcome(NamedTuple):
+    outcome: str
+    path:    Optional[str]
+    sha256:  Optional[str]
+    checked: float
+
+
+def http_reason(status: int) -> str:
+    return f"http_{status}"
+
+
+class UrlCache:
+    def __init__(self, db_path=DEFAULT_DB, ttls: Optional[Dict[str, Optional[float]]] = None):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS urls ("
+                        " url     TEXT PRIMARY KEY,"
+                        " outcome TEXT NOT NULL,"
+                        " path    TEXT,"
+                        " sha256  TEXT,"
+                        " checked REAL NOT NULL)")
+        self.ttls    = {**TTLS, **(ttls or {})}
+        self.lock    = threading.Lock()
+        self.entries = {url: Outcome(*rest) for url, *rest in
+                        self.db.execute("SELECT url, outcome, path, sha256, checked FROM urls")}
+        self.hits    = Counter()             # outcome → URLs skipped because of it
+        self.misses  = 0
+        self.pending = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def ttl(self, outcome: str) -> Optional[float]:
+        """TTL for `outcome`: exact match, then `http_4xx`/`http_5xx`, then `error`."""
+        if outcome in self.ttls:
+            return self.ttls[outcome]
+        if outcome.startswith("http_") and outcome[5:].isdigit():
+            cls = f"http_{outcome[5]}xx"
+            if cls in self.ttls:
+                return self.ttls[cls]
+        return self.ttls["error"]
+
+    def lookup(self, url: str) -> Optional[Outcome]:
+        """The cached outcome if it hasn't expired, else None."""
+        entry = self.entries.get(url)
+        if entry is not None:
+            ttl = self.ttl(entry.outcome)
+            if ttl is not None and time.time() - entry.checked > ttl:
+                entry = None
+        return entry
+
+    def skip(self, url: str) -> bool:
+        """True if `url` has a fresh outcome and needn't be fetched; counts hits."""
+        entry = self.lookup(url)
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return False
+            self.hits[entry.outcome] += 1
+            return True
+
+    def record(self, url: str, outcome: str, path=None, sha: Optional[str] = None) -> None:
+        entry = Outcome(outcome, None if path is None else str(path), sha, time.time())
+        with self.lock:
+            self.entries[url] = entry
+            self.db.execute("INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?)",
+                            (url, *entry))
+            self.pending += 1
+            if self.pending >= COMMIT_EVERY:
+                self.db.commit()
+                self.pending = 0
+
+    def summary(self) -> str:
+        skipped = sum(self.hits.values())
+        detail  = ", ".join(f"{n} {o}" for o, n in self.hits.most_common())
+        return (f"URL cache: {skipped} skipped, {self.misses} fetched"
+                + (f" ({detail})" if detail else ""))
+
+    def commit(self) -> None:
+        with self.lock:
+            self.db.commit()
+            self.pending = 0
+
+    def close(self) -> None:
+        self.commit()
+        self.db.close()
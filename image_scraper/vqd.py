@@ -0,0 +1,98 @@
+# ----------------------------------------------
+# DuckDuckGo vqd token manager
+# ----------------------------------------------
+"""
+DuckDuckGo's `i.js` only answers requests that carry a `vqd` token issued
+for that exact query.  The scrapers used to POST to duckduckgo.com for a
+fresh token before every search, and retried with 5 s, 10 s, 20 s sleeps
+whenever the regex missed.
+
+Here a token is fetched once per query and reused for every page and
+every later search of the same query, until it is older than `TTL` or
+a caller `invalidate()`s it after DDG rejected it.  Concurrent callers
+asking for the same query wait for one fetch instead of sending their
+own.  Pacing of the token requests is left to `image_scraper.ratelimit`.
+
+    from image_scraper import vqd
+    token = vqd.token("red fox")       # None if DDG wouldn't give one
+    vqd.invalidate("red fox")          # after a 403 from i.js
+"""
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from . import client
+
+TOKEN_URL = "https://duckduckgo.com/"
+TTL       = 30 * 60                 # seconds a token is reused
+RETRIES   = 2                       # token requests per miss, no sleeps
+
+_PATTERN = re.compile(r"vqd=[\"']?([\d-]+)")
+
+_lock     = threading.Lock()
+_tokens: Dict[str, Tuple[str, float]] = {}      # query → (token, fetched)
+_fetching: Dict[str, threading.Lock] = {}       # query → lock held while fetching
+_known    = set()                               # queries we ever had a token for
+_counts   = Counter()
+
+
+def _fetch(query: str) -> Optional[str]:
+    for _ in range(RETRIES):
+        try:
+            m = _PATTERN.search(client.post(TOKEN_URL, data={"q": query}, timeout=10).text)
+        except Exception:
+            m = None
+        if m:
+            return m.group(1)
+    return None
+
+
+def _cached(query: str) -> Optional[str]:
+    hit = _tokens.get(query)
+    if hit is not None and time.time() - hit[1] < TTL:
+        _counts["hits"] += 1
+        return hit[0]
+    return None
+
+
+def token(query: str) -> Optional[str]:
+    """A vqd token for `query`, from the cache or freshly fetched."""
+    with _lock:
+        tok = _cached(query)
+        if tok is not None:
+            return tok
+        fetching = _fetching.setdefault(query, threading.Lock())
+
+    with fetching:
+        with _lock:
+            tok = _cached(query)            # fetched while we waited
+            if tok is not None:
+                return tok
+            _counts["refreshes" if query in _known else "misses"] += 1
+        tok = _fetch(query)
+        with _lock:
+            if tok is None:
+                _counts["failures"] += 1
+            else:
+                _tokens[query] = (tok, time.time())
+                _known.add(query)
+            # callers already waiting hold this lock object; later ones
+            # find the token cached (or, after a failure, fetch again)
+            if _fetching.get(query) is fetching:
+                del _fetching[query]
+        return tok
+
+
+def invalidate(query: str) -> None:
+    """Forget the token for `query` (DDG rejected it); the next call refetches."""
+    with _lock:
+        if _tokens.pop(query, None) is not None:
+            _counts["invalidated"] += 1
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return {k: _counts[k] for k in ("hits", "misses", "refreshes",
+                                        "invalidated", "failures")}
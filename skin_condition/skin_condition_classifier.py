@@ -12,21 +12,31 @@ The script assumes the following layout
        └─ (optionally valid/  or test/)
 
 If there is no explicit *valid* folder the script performs a random
-20% split.
+20% split.  Images are listed from `images/train/.manifest.sqlite`
+(built on first use, see `image_scraper.manifest`), so class folders
+holding tar shards (`python -m image_scraper.runner … --shards MB`)
+work too, and `images/train-460/` is used instead of `images/train/`
+once it has been built (`python -m image_scraper.presize images/train`).
 """
 from fastai.vision.all import *
 from pathlib import Path
 import multiprocessing
+import sys
 import torch
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root
+from image_scraper import manifest, presize
+
 def main():
     # ------------------------------------------------------------------
     # 1. locate dataset and collect class names
     # ------------------------------------------------------------------
     path = Path('images/train')      # <- adjust only if you move folders
+    path = presize.prefer(path, 460) # pre-sized 460×460 copies, if built
     classes = sorted([p.name for p in path.ls() if p.is_dir()])
     
-    counts = {c: len((path/c).ls()) for c in classes}
+    listed = manifest.counts(path)
+    counts = {c: listed.get(c, 0) for c in classes}
     print('📷  images per class →', counts)
 
     # basic sanity‑check
@@ -39,9 +49,10 @@ def main():
     # ------------------------------------------------------------------
     dblock = DataBlock(
         blocks     = (ImageBlock, CategoryBlock),
-        get_items  = get_image_files,
+        get_items  = manifest.get_items,
+        get_x      = manifest.image,
         splitter   = RandomSplitter(valid_pct=0.2, seed=42),
-        get_y      = parent_label,
+        get_y      = manifest.label,
         item_tfms  = Resize(460),
         batch_tfms = [*aug_transforms(size=224, min_scale=0.75),
                       Normalize.from_stats(*imagenet_stats)]
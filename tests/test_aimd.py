@@ -0,0 +1,60 @@
+import threading
+import time
+
+from image_scraper.aimd import AIMD
+
+
+def feed(limiter, outcome="ok", latency=0.1, n=None):
+    for _ in range(n or limiter.window):
+        limiter.record(outcome, latency)
+
+
+def test_healthy_windows_increase_the_limit():
+    limiter = AIMD(limit=4, max_limit=6, window=4)
+    for _ in range(5):
+        feed(limiter)
+    st = limiter.stats()
+    assert st["limit"] == 6 and st["increases"] == 2      # capped at max_limit
+    assert [limit for _, limit in st["history"]] == [4, 5, 6]
+
+
+def test_congestion_backs_off_once_per_window():
+    limiter = AIMD(limit=16, window=4)
+    feed(limiter, "timeout", n=3)
+    feed(limiter, "http_429", n=1)
+    assert limiter.stats()["limit"] == 8
+    feed(limiter, "reset", n=1)
+    feed(limiter, n=3)
+    st = limiter.stats()
+    assert (st["limit"], st["decreases"]) == (4, 2)
+
+
+def test_server_errors_and_slow_windows_hold_the_limit():
+    limiter = AIMD(limit=8, window=4, slack=2.0)
+    feed(limiter, latency=0.1)                            # baseline 0.1 s → 9
+    feed(limiter, "http_503", latency=0.1)                # a 5xx isn't congestion → 10
+    feed(limiter, latency=0.5)                            # 5× the baseline → stays
+    st = limiter.stats()
+    assert (st["limit"], st["increases"], st["decreases"]) == (10, 2, 0)
+
+
+def test_slots_wait_for_the_limit():
+    limiter = AIMD(limit=2, max_limit=2)
+    busy, peak, lock = 0, 0, threading.Lock()
+
+    def work():
+        nonlocal busy, peak
+        with limiter.slot():
+            with lock:
+                busy += 1
+                peak = max(peak, busy)
+            time.sleep(0.02)
+            with lock:
+                busy -= 1
+
+    runs = [threading.Thread(target=work) for _ in range(6)]
+    for t in runs:
+        t.start()
+    for t in runs:
+        t.join()
+    assert peak == 2 and limiter.stats()["inflight"] == 0
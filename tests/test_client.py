@@ -0,0 +1,38 @@
+import socket
+
+import pytest
+
+from image_scraper import client, metrics, mockserver, ratelimit
+
+
+@pytest.fixture(scope="module")
+def server():
+    proc, base = mockserver.start(mockserver.Mock(latency=0, fail=0))
+    yield base.replace("127.0.0.1", "localhost")
+    proc.terminate()
+
+
+def counts(*stages):
+    seen = metrics.snapshot()["stages"]
+    return [seen.get(s, {}).get("count", 0) for s in stages]
+
+
+def test_new_connections_time_the_lookup(server):
+    lookup = socket.getaddrinfo
+    client.configure()
+    dns, connect = counts("dns", "connect")
+    for n in range(3):
+        r = client.get(f"{server}/img/{n}.jpg", timeout=10, stage="connect")
+        assert r.status_code == 200 and r.content
+    assert counts("dns", "connect") == [dns + 1, connect + 3]     # one keep-alive connection
+    assert socket.getaddrinfo is lookup
+
+
+def test_rate_limit_wait_is_its_own_stage(server, monkeypatch):
+    monkeypatch.setitem(ratelimit.HOST_LIMITS, "localhost", (20.0, 1))
+    client.configure()
+    waited, = counts("ratelimit")
+    for n in range(3):
+        client.get(f"{server}/img/{n}.jpg", timeout=10).close()
+    assert counts("ratelimit") == [waited + 3]
+    assert ratelimit.stats()["localhost"]["waits"] == 2
@@ -0,0 +1,43 @@
+import io
+import time
+
+from PIL import Image
+
+from image_scraper import engine
+
+
+def jpeg(n: int) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), (n * 7 % 256, 0, 0)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def serve(monkeypatch, delay=0.02):
+    def fetch_bytes(url, timeout):
+        time.sleep(delay)
+        n = int(url.rsplit("/", 1)[1])
+        return None if n % 5 == 4 else jpeg(n)
+    monkeypatch.setattr(engine, "fetch_bytes", fetch_bytes)
+
+
+def test_saves_in_order_until_the_limit(tmp_path, monkeypatch):
+    serve(monkeypatch)
+    stats = engine.download_all([f"http://img/{n}" for n in range(10)], tmp_path, "cat",
+                                start=7, concurrency=1, verbose=False)
+    assert (stats.saved, stats.failed, stats.cancelled) == (8, 2, 0)
+    assert sorted(f.name for f in tmp_path.iterdir()) == [f"cat_{n:04d}.jpg" for n in range(8, 16)]
+
+
+def test_limit_cancels_downloads_in_flight(tmp_path, monkeypatch):
+    serve(monkeypatch)
+    stats = engine.download_all((f"http://img/{n}" for n in range(100)), tmp_path, "cat",
+                                limit=3, concurrency=8, verbose=False)
+    assert stats.saved == 3 and len(list(tmp_path.iterdir())) == 3
+    assert stats.cancelled >= 1
+    assert stats.attempted == stats.saved + stats.failed + stats.cancelled
+    assert stats.attempted < 100
+    assert f"{stats.cancelled} cancelled" in stats.summary()
+
+
+def test_nothing_to_do(tmp_path):
+    assert engine.download_all(["http://img/1"], tmp_path, "cat", limit=0) == engine.DownloadStats()
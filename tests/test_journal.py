@@ -0,0 +1,98 @@
+import io
+import json
+
+from PIL import Image
+
+from image_scraper.journal import JOURNAL_NAME, Journal
+
+
+def jpeg() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 30, 30)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def lines(folder):
+    return [json.loads(line) for line in (folder / JOURNAL_NAME).read_text().splitlines()]
+
+
+def test_replay_after_crash(tmp_path):
+    log = Journal(tmp_path)
+    assert log.start(lambda: 3) == 3
+    log.allocated("a_0004.jpg", "http://x/4")
+    (tmp_path / "a_0004.jpg").write_bytes(b"jpeg")      # renamed, then the crash
+    log.allocated("a_0005.jpg", "http://x/5")           # never written
+    log.url("http://x/6", "http_404")
+    log.term_done("cats")
+    log.out.write('{"e": "url", "url": "http://x/7", "outc')   # torn last line
+    log.out.flush()
+
+    again = Journal(tmp_path)
+    assert again.start(lambda: 0) == 4
+    assert again.files == {"a_0004.jpg"}
+    assert again.urls == {"http://x/4": "saved", "http://x/6": "http_404"}
+    assert again.done_terms == {"cats"}
+    assert not again.allocs
+    again.close()
+
+
+def test_non_atomic_alloc_must_decode(tmp_path):
+    log = Journal(tmp_path)
+    log.start(lambda: 0)
+    whole, cut = jpeg(), jpeg()[:200]
+    log.allocated("a_0001.jpg", "http://x/1", atomic=False)
+    (tmp_path / "a_0001.jpg").write_bytes(whole)
+    log.allocated("a_0002.jpg", "http://x/2", atomic=False)
+    (tmp_path / "a_0002.jpg").write_bytes(cut)          # crash mid-write
+    log._append({"e": "alloc", "file": "a_0003.jpg", "url": "http://x/3"})   # older journal
+    (tmp_path / "a_0003.jpg").write_bytes(cut)
+    log.out.flush()
+
+    again = Journal(tmp_path)
+    assert again.files == {"a_0001.jpg"}
+    assert again.knows("http://x/1") and not again.knows("http://x/2")
+    assert not (tmp_path / "a_0002.jpg").exists()
+    assert not (tmp_path / "a_0003.jpg").exists()
+    again.close()
+
+
+def test_only_final_outcomes_are_known(tmp_path):
+    log = Journal(tmp_path)
+    for url, outcome in [("saved", "saved"), ("dup", "duplicate"), ("bad", "invalid"),
+                         ("gone", "http_404"), ("slow", "timeout"), ("cut", "reset"),
+                         ("busy", "http_429"), ("down", "http_503"), ("oops", "error")]:
+        log.url(url, outcome)
+    assert {u for u in log.urls if log.knows(u)} == {"saved", "dup", "bad", "gone"}
+    assert not log.knows("never-seen")
+    assert log.settled(["saved", "gone", "never-seen"])
+    assert not log.settled(["saved", "slow"])
+    log.close()
+
+
+def test_close_compacts(tmp_path):
+    log = Journal(tmp_path)
+    log.start(lambda: 0)
+    for i in range(5):
+        log.url("http://x/flaky", "timeout")
+    log.url("http://x/flaky", "http_404")
+    log.url("http://x/slow", "timeout")
+    log.allocated("a_0001.jpg", "http://x/1")
+    (tmp_path / "a_0001.jpg").write_bytes(b"jpeg")
+    log.saved("a_0001.jpg")
+    log.term_done("cats")
+    log.close()
+
+    assert lines(tmp_path) == [
+        {"e": "base", "count": 0},
+        {"e": "saved", "file": "a_0001.jpg"},
+        {"e": "url", "url": "http://x/flaky", "outcome": "http_404"},
+        {"e": "url", "url": "http://x/1", "outcome": "saved"},
+        {"e": "term", "term": "cats"},
+    ]
+    assert not (tmp_path / (JOURNAL_NAME + ".part")).exists()
+
+    again = Journal(tmp_path)
+    assert again.start(lambda: 99) == 1
+    assert again.knows("http://x/1") and again.knows("http://x/flaky")
+    assert not again.knows("http://x/slow")
+    again.close()
@@ -0,0 +1,74 @@
+import io
+
+from PIL import Image
+
+from image_scraper import manifest
+from image_scraper.manifest import Manifest
+
+
+def png(n: int) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (16, 12), (n % 256, n // 256, 0)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def save(folder, n: int) -> bytes:
+    folder.mkdir(parents=True, exist_ok=True)
+    data = png(n)
+    (folder / f"{n}.png").write_bytes(data)
+    return data
+
+
+def stamp(book: Manifest, folder: str):
+    row = book.db.execute("SELECT mtime FROM folders WHERE path = ?", (folder,)).fetchone()
+    return row and row[0]
+
+
+def test_periodic_commits_leave_folder_unstamped(tmp_path):
+    book = Manifest(tmp_path)
+    book.sync()
+    cats = tmp_path / "cats"
+    for n in range(manifest.COMMIT_EVERY + 20):
+        data = save(cats, n)
+        if n < manifest.COMMIT_EVERY + 10:      # the last files' rows never make it
+            book.record(cats / f"{n}.png", data)
+    assert book.count("cats") == manifest.COMMIT_EVERY + 10
+    assert stamp(book, "cats") is None
+    book.db.close()                             # crash: no commit(), no close()
+
+    again = Manifest(tmp_path)
+    assert again.count("cats") == manifest.COMMIT_EVERY
+    assert again.sync() == 20
+    assert again.count("cats") == manifest.COMMIT_EVERY + 20
+    again.close()
+
+
+def test_commit_stamps_finished_folder_only(tmp_path):
+    book = Manifest(tmp_path)
+    book.sync()
+    for n in range(3):
+        book.record(tmp_path / "cats" / f"{n}.png", save(tmp_path / "cats", n))
+        book.record(tmp_path / "dogs" / f"{n}.png", save(tmp_path / "dogs", n))
+    book.commit([tmp_path / "cats"])
+    assert stamp(book, "cats") == (tmp_path / "cats").stat().st_mtime_ns
+    assert stamp(book, "dogs") is None
+    book.close()
+    assert stamp(Manifest(tmp_path), "dogs") is None    # close() commits rows only
+
+    again = Manifest(tmp_path)
+    save(tmp_path / "dogs", 3)                  # written, no row: a crash
+    assert again.sync() == 1
+    assert again.counts() == {"cats": 3, "dogs": 4}
+    assert again.sync() == 0                    # both folders stamped by the scan
+    again.close()
+
+
+def test_sync_drops_vanished_files(tmp_path):
+    for n in range(4):
+        save(tmp_path / "cats", n)
+    book = Manifest(tmp_path)
+    assert book.sync() == 4
+    (tmp_path / "cats" / "2.png").unlink()
+    assert book.sync() == 1
+    assert sorted(book.names("cats")) == ["0.png", "1.png", "3.png"]
+    book.close()
@@ -0,0 +1,68 @@
+import os
+import threading
+
+from image_scraper import phash
+from image_scraper.phash import NearDupIndex
+
+
+def flip(h: int, *bits: int) -> int:
+    for b in bits:
+        h ^= 1 << b
+    return h
+
+
+def test_distance():
+    assert phash.distance(0, 0) == 0
+    assert phash.distance(0, (1 << 64) - 1) == 64
+    assert phash.distance(0b1011, 0b0110) == 3
+
+
+def test_hamming_lookup():
+    index = NearDupIndex(max_distance=4)
+    base = 0x0123456789ABCDEF
+    index.add(base, "a.jpg")
+    index.add(flip(base, 0, 20, 40, 60, 63), "far.jpg")        # 5 bits: too far
+    assert index.query(flip(base, 1, 2)) == [(2, "a.jpg")]
+    assert index.match(flip(base, 3, 17, 33, 50)) == "a.jpg"     # one bit per chunk
+    assert index.match(flip(base, 3, 17, 33, 50, 62)) is None
+    assert index.query(flip(base, 0, 20, 40, 60)) == [(1, "far.jpg"), (4, "a.jpg")]
+
+
+def test_claim_is_exclusive_under_threads():
+    index = NearDupIndex()
+    wins = []
+    def claim(i):
+        if index.claim(flip(0xFFFF0000FFFF0000, i % 3), f"{i}.jpg") is None:
+            wins.append(i)
+    runs = [threading.Thread(target=claim, args=(i,)) for i in range(32)]
+    for t in runs:
+        t.start()
+    for t in runs:
+        t.join()
+    assert len(wins) == 1 and len(index) == 1
+
+
+def test_stale_entries_are_dropped(tmp_path):
+    a, b, c, d, e = (0x1111 << (12 * i) for i in range(5))      # pairwise ≥ 8 bits apart
+    kept, gone, changed = (tmp_path / f"{n}.jpg" for n in ("kept", "gone", "changed"))
+    for f in (kept, gone, changed):
+        f.write_bytes(b"jpeg")
+    index = phash.open_index(tmp_path)
+    index.add(a, kept, kept.stat().st_mtime)
+    index.add(b, gone, gone.stat().st_mtime)
+    index.add(c, changed, changed.stat().st_mtime)
+    index.add(d, tmp_path / "cats-000001.tar" / "cat_0001.jpg")
+    index.close()
+
+    gone.unlink()
+    os.utime(changed, (1, 1))
+    again = phash.open_index(tmp_path)
+    assert sorted(again.known) == [str(kept)]
+    assert again.match(b) is None and again.match(c) is None
+    again.close()
+
+    index = phash.open_index(tmp_path)
+    index.add(e, tmp_path / "later.jpg")                      # moved away after indexing
+    assert index.prune() == 1 and index.match(e) is None
+    assert index.match(a) == str(kept)
+    index.close()
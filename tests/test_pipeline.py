@@ -0,0 +1,108 @@
+import io
+import threading
+
+import pytest
+from PIL import Image
+
+from image_scraper import pipeline
+from image_scraper.dedup import DedupIndex
+from image_scraper.store import AtomicWriter
+
+
+def jpeg(n: int) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), (n * 7 % 256, n * 13 % 256, n * 29 % 256)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def web(monkeypatch):
+    """URLs `http://img/<n>` serve image n; `http://img/<n>/again` serves the same bytes."""
+    def fetch(url, timeout):
+        return jpeg(int(url.split("/")[3])), "ok"
+    monkeypatch.setattr(pipeline, "fetch", fetch)
+
+
+def scrape(out, dedup, urls, **kwargs):
+    return pipeline.run(["t"], lambda term: iter([urls]), out,
+                        name=pipeline.sequential("x"), dedup=dedup, quiet=True, **kwargs)
+
+
+def test_dedup_rows_match_files(tmp_path, web):
+    dedup = DedupIndex(tmp_path / "sha.sqlite")
+    stats = scrape(tmp_path / "x", dedup, [f"http://img/{n}" for n in range(10)], fsync_every=4)
+    assert stats.saved == 10
+    assert len(dedup) == 10
+    for path in dedup.hashes.values():
+        assert (tmp_path / "x" / path.rsplit("/", 1)[-1]).is_file()
+    dedup.close()
+
+
+def test_duplicate_inside_one_batch(tmp_path, web):
+    dedup = DedupIndex(tmp_path / "sha.sqlite")
+    stats = scrape(tmp_path / "x", dedup, ["http://img/1", "http://img/2", "http://img/1/again"],
+                   fsync_every=100, download_workers=1)
+    assert (stats.saved, stats.duplicates) == (2, 1)
+    assert sorted(f.name for f in (tmp_path / "x").glob("*.jpg")) == ["x_0001.jpg", "x_0002.jpg"]
+    dedup.close()
+
+
+def test_subjects_sharing_an_index_never_save_the_same_bytes(tmp_path, web):
+    dedup = DedupIndex(tmp_path / "sha.sqlite")
+    urls = [f"http://img/{n}" for n in range(20)]
+    runs = [threading.Thread(target=scrape, args=(tmp_path / sub, dedup, urls),
+                             kwargs={"fsync_every": 100})
+            for sub in ("a", "b")]
+    for t in runs:
+        t.start()
+    for t in runs:
+        t.join()
+    saved = list(tmp_path.glob("[ab]/*.jpg"))
+    assert len(saved) == 20
+    assert len({f.read_bytes() for f in saved}) == 20
+    assert len(dedup) == 20 and not dedup.claimed
+    dedup.close()
+
+
+def test_claims_are_not_rows_until_added(tmp_path):
+    dedup = DedupIndex(tmp_path / "sha.sqlite")
+    assert dedup.claim("abc", tmp_path / "x_0001.jpg") is None
+    assert dedup.claim("abc", tmp_path / "y_0001.jpg") == str(tmp_path / "x_0001.jpg")
+    assert "abc" in dedup and len(dedup) == 0
+    dedup.release("abc")
+    assert "abc" not in dedup
+    dedup.claim("abc", tmp_path / "x_0001.jpg")
+    dedup.add("abc", tmp_path / "x_0001.jpg")
+    dedup.close()
+    assert DedupIndex(tmp_path / "sha.sqlite").lookup("abc") == str(tmp_path / "x_0001.jpg")
+
+
+def test_crash_before_commit_leaves_no_dedup_rows(tmp_path, web, monkeypatch):
+    def crash(self):
+        raise RuntimeError("power cut")
+    monkeypatch.setattr(AtomicWriter, "flush", crash)
+
+    dedup = DedupIndex(tmp_path / "sha.sqlite")
+    with pytest.raises(RuntimeError):
+        scrape(tmp_path / "x", dedup, [f"http://img/{n}" for n in range(5)], fsync_every=100)
+    assert len(dedup) == 0
+    assert not list((tmp_path / "x").glob("*.jpg"))
+    dedup.close()
+
+
+def test_numbering_gap_never_overwrites(tmp_path, web):
+    out = tmp_path / "x"
+    out.mkdir()
+    (out / "x_0001.jpg").write_bytes(jpeg(101))
+    (out / "x_0003.png").write_bytes(jpeg(103))         # x_0002 was deleted
+    stats = pipeline.run(["t"], lambda term: iter([[f"http://img/{n}" for n in range(3)]]), out,
+                         name=pipeline.sequential("x", 2), quiet=True, fsync_every=0)
+    assert stats.saved == 3
+    assert (out / "x_0003.png").read_bytes() == jpeg(103)
+    assert sorted(f.name for f in out.glob("x_*")) == [
+        "x_0001.jpg", "x_0003.png", "x_0004.jpg", "x_0005.jpg", "x_0006.jpg"]
+
+
+def test_sequential_continues_after_highest_taken():
+    name = pipeline.sequential("acne", 2, ["acne_0001.jpg", "acne_0007.png", "other_0099.jpg"])
+    assert [name("t"), name("t")] == ["acne_0008.jpg", "acne_0009.jpg"]
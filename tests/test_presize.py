@@ -0,0 +1,44 @@
+import io
+
+import pytest
+from PIL import Image
+
+from image_scraper import presize, resize
+
+
+@pytest.fixture
+def pool():
+    resize.configure(2)
+    yield
+    resize.shutdown()
+
+
+def tree(root, n: int = 3):
+    for i in range(n):
+        buf = io.BytesIO()
+        Image.new("RGB", (120, 80), (i * 40, 0, 0)).save(buf, "JPEG")
+        (root / "cats").mkdir(parents=True, exist_ok=True)
+        (root / "cats" / f"cat_{i}.jpg").write_bytes(buf.getvalue())
+
+
+def test_half_built_mirror_is_not_preferred(tmp_path):
+    images = tmp_path / "images"
+    tree(images)
+    small = presize.mirror(images, 32)
+    (small / "cats").mkdir(parents=True)
+    (small / "cats" / "cat_0.jpg").write_bytes(b"partial")
+    assert presize.prefer(images, 32) == images
+
+
+def test_build_marks_mirror_complete(tmp_path, pool):
+    images = tmp_path / "images"
+    tree(images)
+    assert presize.build(images, 32, say=lambda *a: None) == (3, 0, 0)
+    assert presize.prefer(images, 32) == presize.mirror(images, 32)
+    with Image.open(presize.mirror(images, 32) / "cats" / "cat_1.jpg") as img:
+        assert img.size == (32, 32)
+
+    presize.mark(presize.mirror(images, 32), False)
+    assert presize.prefer(images, 32) == images
+    assert presize.build(images, 32, say=lambda *a: None) == (0, 3, 0)
+    assert presize.complete(presize.mirror(images, 32))
@@ -0,0 +1,62 @@
+import io
+
+import pytest
+from PIL import Image, features
+
+from image_scraper import probe
+
+FORMATS = ["JPEG", "PNG", "GIF", "BMP"] + (["WEBP"] if features.check("webp") else [])
+
+
+def encode(fmt: str, size=(321, 123), **kwargs) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, (10, 200, 30)).save(buf, fmt, **kwargs)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_sniff_names_the_real_format(fmt):
+    assert probe.sniff(encode(fmt)) == probe.EXTENSIONS[fmt.lower()]
+
+
+@pytest.mark.parametrize("fmt", [f for f in FORMATS if f != "BMP"])
+def test_image_size_from_the_header(fmt):
+    assert probe.image_size(encode(fmt)) == (fmt.lower(), 321, 123)
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_truncated_headers_never_raise(fmt):
+    data, full = encode(fmt), probe.image_size(encode(fmt))
+    for n in range(min(len(data), 400)):
+        assert probe.image_size(data[:n]) in (None, full)
+        assert probe.sniff(data[:n]) in (None, probe.EXTENSIONS[fmt.lower()])
+
+
+def test_jpeg_size_past_a_large_exif_block():
+    exif = Image.Exif()
+    exif[0x010E] = "x" * 20000                          # ImageDescription
+    data = encode("JPEG", exif=exif.tobytes())
+    assert probe.image_size(data[:4096]) is None         # SOF not reached yet
+    head, size = probe.read_head(iter([data[i:i + 4096] for i in range(0, len(data), 4096)]))
+    assert size == ("jpeg", 321, 123) and len(head) > 20000
+
+
+def test_not_an_image():
+    html = b"<!DOCTYPE html><html><body>Forbidden</body></html>"
+    assert probe.sniff(html) is None and probe.image_size(html) is None
+    assert probe.read_head(iter([html])) == (html, None)
+    assert not probe.is_image_type("text/html; charset=utf-8")
+    assert probe.is_image_type(None) and probe.is_image_type("image/webp")
+
+
+def test_read_rest_stops_past_the_limit():
+    chunks = iter([b"a" * 10] * 5)
+    assert probe.read_rest(chunks, b"head", max_bytes=30) is None
+    assert probe.read_rest(iter([b"b" * 10]), b"head", max_bytes=30) == b"head" + b"b" * 10
+
+
+@pytest.mark.skipif("WEBP" not in FORMATS, reason="Pillow built without WebP")
+def test_lossless_webp_size():
+    data = encode("WEBP", lossless=True)
+    assert probe.image_size(data) == ("webp", 321, 123)
+    assert all(probe.image_size(data[:n]) in (None, ("webp", 321, 123)) for n in range(40))
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from image_scraper import metrics, ratelimit
+from image_scraper.ratelimit import TokenBucket
+
+
+def test_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=10.0, burst=3)
+    waits = [bucket.reserve() for _ in range(5)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert 0.09 < waits[3] <= 0.1 and 0.19 < waits[4] <= 0.2     # queued behind each other
+
+
+def test_bucket_refills_up_to_burst():
+    bucket = TokenBucket(rate=100.0, burst=2)
+    bucket.reserve(), bucket.reserve()
+    time.sleep(0.05)                                            # 5 tokens' worth, capped at 2
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() > 0
+
+
+def test_rules_cover_subdomains_and_waits_are_exported(monkeypatch):
+    monkeypatch.setitem(ratelimit.HOST_LIMITS, "example.test", (50.0, 1))
+    assert ratelimit.acquire("cdn.example.org") == 0.0          # no rule
+    assert ratelimit.acquire("example.test") == 0.0
+    assert ratelimit.acquire("www.example.test") > 0            # same bucket
+    assert ratelimit.stats()["example.test"]["waits"] == 1
+    assert metrics.snapshot()["ratelimit"]["example.test"]["waits"] == 1
+    text = metrics.prometheus({"scraper": "t"})
+    assert 'image_scraper_ratelimit_waits_total{scraper="t",rule="example.test"} 1' in text
+    assert 'image_scraper_ratelimit_wait_seconds_total{scraper="t",rule="example.test"}' in text
+
+
+def test_slot_caps_requests_in_flight(monkeypatch):
+    monkeypatch.setattr(ratelimit, "PER_HOST", 2)
+    monkeypatch.setattr(ratelimit, "_slots", {})
+    busy, peak, lock = 0, 0, threading.Lock()
+
+    def hold():
+        nonlocal busy, peak
+        with ratelimit.slot("cdn.test"):
+            with lock:
+                busy += 1
+                peak = max(peak, busy)
+            time.sleep(0.02)
+            with lock:
+                busy -= 1
+
+    runs = [threading.Thread(target=hold) for _ in range(8)]
+    for t in runs:
+        t.start()
+    for t in runs:
+        t.join()
+    assert peak == 2
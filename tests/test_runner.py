@@ -0,0 +1,56 @@
+import json
+import re
+from pathlib import Path
+
+import pytest
+
+from image_scraper import runner
+
+SUBJECTS_YAML = Path(__file__).resolve().parents[1] / "skin_condition" / "subjects.yaml"
+
+
+def config(tmp_path, raw: dict) -> Path:
+    path = tmp_path / "subjects.json"
+    path.write_text(json.dumps(raw), encoding="utf-8")
+    return path
+
+
+def test_load_json_with_defaults(tmp_path):
+    cfg = runner.load(config(tmp_path, {
+        "output": "out",
+        "defaults": {"images": 50, "banned": ["baby"]},
+        "concurrency": {"subjects": 2},
+        "politeness": {"bing.com": [0.5, 2]},
+        "shards": 128,
+        "caches": {"search": "/var/cache/search.sqlite"},
+        "subjects": {"acne": {"title": "Acne", "terms": ["acne", "baby acne"]},
+                     "rosacea": {"terms": ["rosacea"], "images": 10}},
+    }))
+    acne, rosacea = cfg.subjects
+    assert (acne.name, acne.title, acne.images, acne.banned) == ("acne", "Acne", 50, ["baby"])
+    assert (rosacea.images, rosacea.per_term) == (10, runner.Subject.per_term)
+    assert acne.sample() == ["acne"]
+    assert (cfg.output, cfg.subjects_at_once, cfg.downloads) == (Path("out"), 2, runner.DOWNLOADS)
+    assert cfg.politeness == {"bing.com": (0.5, 2)}
+    assert (cfg.shard_mb, cfg.presize, cfg.originals) == (128, 0, True)
+    assert cfg.cache("search") == Path("/var/cache/search.sqlite")
+    assert cfg.cache("dedup") == Path("out") / runner.CACHES["dedup"]
+
+
+@pytest.mark.parametrize("raw, error", [
+    ({}, "no subjects"),
+    ({"subjects": {"acne": {"terms": []}}}, "acne: no terms"),
+    ({"subjects": {"acne": {"terms": ["acne"], "imges": 5}}}, "unknown keys ['imges']"),
+    ({"subjects": {"acne": {"terms": ["acne"]}}, "caches": {"phash": "x"}},
+     "caches: unknown keys ['phash']"),
+])
+def test_load_rejects_malformed_configs(tmp_path, raw, error):
+    with pytest.raises(ValueError, match=re.escape(error)):
+        runner.load(config(tmp_path, raw))
+
+
+def test_load_shipped_yaml():
+    pytest.importorskip("yaml")
+    cfg = runner.load(SUBJECTS_YAML)
+    assert cfg.subjects and all(s.terms for s in cfg.subjects)
+    assert len({s.name for s in cfg.subjects}) == len(cfg.subjects)
@@ -0,0 +1,49 @@
+import html
+import json
+
+import pytest
+
+from image_scraper import mockserver, search
+
+bs4 = pytest.importorskip("bs4")
+
+
+def tile(url: str, attrs: str = 'class="iusc"', quote: str = '"') -> str:
+    m = html.escape(json.dumps({"murl": url, "t": "a > b"}), quote=True)
+    return f"<a {attrs} m={quote}{m}{quote} href=\"/images/search?id=1\"><img/></a>"
+
+
+PAGES = {
+    "plain":      tile("http://a/1.jpg") + tile("http://a/2.jpg"),
+    "classes":    tile("http://a/1.jpg", 'class="iusc imgpt"') + tile("http://a/2.jpg", "class=iusc"),
+    "not_iusc":   tile("http://a/1.jpg", 'class="iuscx"') + tile("http://a/2.jpg", 'class="mimg"')
+                  + '<a href="/iusc" class="b">iusc</a>',
+    "single_q":   tile("http://a/1.jpg", quote="'"),
+    "upper":      tile("http://a/1.jpg").replace("<a class", "<A CLASS").replace("</a>", "</A>"),
+    "newlines":   tile("http://a/1.jpg", 'class="iusc"\n   style="height:180px"\n'),
+    "bad_json":   '<a class="iusc" m="{not json">x</a>' + tile("http://a/2.jpg"),
+    "no_m":       '<a class="iusc" href="/x">x</a>' + tile("http://a/2.jpg"),
+    "gt_in_attr": tile("http://a/1.jpg", 'class="iusc" data-x="1 > 0"'),
+    "unicode":    tile("http://a/é 1.jpg?q=ü&x=1"),
+}
+
+
+@pytest.mark.parametrize("name", sorted(PAGES))
+def test_scan_matches_soup(name):
+    page = "<html><body><ul>" + PAGES[name] + "</ul></body></html>"
+    urls = search.scan_bing(page)
+    assert urls == search.soup_bing(page)
+    assert bool(urls) == (name != "not_iusc")
+
+
+def test_scan_matches_soup_on_mock_pages():
+    mock = mockserver.Mock(results=70, page_kb=20)
+    for first in (1, 36):
+        page = mockserver.bing_page("http://127.0.0.1", "red fox", first, mock)
+        urls = search.scan_bing(page)
+        assert len(urls) == mockserver.BING_PAGE and urls == search.soup_bing(page)
+
+
+def test_parse_falls_back_to_soup(monkeypatch):
+    monkeypatch.setattr(search, "scan_bing", lambda page: [])
+    assert search.parse_bing(PAGES["plain"]) == ["http://a/1.jpg", "http://a/2.jpg"]
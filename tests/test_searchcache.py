@@ -0,0 +1,60 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from image_scraper import searchcache
+from image_scraper.searchcache import Page, SearchCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(t=1000.0)
+    monkeypatch.setattr(searchcache, "time", SimpleNamespace(time=lambda: now.t))
+    return now
+
+
+def urls(n: int):
+    return [f"http://img/{n}/{i}.jpg" for i in range(10)]
+
+
+def test_pages_round_trip(tmp_path, clock):
+    cache = SearchCache(tmp_path / "search.sqlite")
+    cache.put("ddg", "red fox", 0, urls(0), cursor="i.js?s=100")
+    cache.put("bing", "red fox", 35, urls(1))
+    assert cache.get("ddg", "red fox", 0) == Page(urls(0), "i.js?s=100")
+    assert cache.get("bing", "red fox", 35) == Page(urls(1), None)
+    assert cache.get("bing", "red fox", 0) is None
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.close()
+
+
+def test_expired_pages_are_ignored_then_dropped(tmp_path, clock):
+    cache = SearchCache(tmp_path / "search.sqlite", ttl=60)
+    cache.put("bing", "owl", 0, urls(0))
+    clock.t += 30
+    cache.put("bing", "owl", 35, urls(1))
+    clock.t += 40
+    assert cache.get("bing", "owl", 0) is None
+    assert cache.get("bing", "owl", 35) is not None
+    assert cache.evict() == 1
+    cache.close()
+
+
+def test_least_recently_used_pages_go_first(tmp_path, clock):
+    size = len(json.dumps(urls(0)))
+    cache = SearchCache(tmp_path / "search.sqlite", max_bytes=2 * size)
+    for n in range(4):
+        clock.t += 1
+        cache.put("bing", "heron", n, urls(n))
+    clock.t += 1
+    cache.get("bing", "heron", 0)                       # oldest page, but just used
+    assert cache.evict() == 2
+    assert [n for n in range(4) if cache.get("bing", "heron", n)] == [0, 3]
+    clock.t += 1
+    cache.get("bing", "heron", 3)
+    cache.close()
+
+    again = SearchCache(tmp_path / "search.sqlite", max_bytes=size)   # evicts on open
+    assert [n for n in range(4) if again.get("bing", "heron", n)] == [3]
+    again.close()
@@ -0,0 +1,59 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from image_scraper.sequence import Sequence
+
+
+def test_concurrent_claims_are_unique(tmp_path):
+    names = Sequence(tmp_path, "cat-")
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        paths = list(pool.map(lambda i: names.claim(".png" if i % 3 else ".jpg"), range(200)))
+    numbers = [int(p.stem.split("-")[1]) for p in paths]
+    assert sorted(numbers) == list(range(1, 201))
+
+
+def test_two_processes_share_the_numbering(tmp_path):
+    first, second = Sequence(tmp_path, "cat-"), Sequence(tmp_path, "cat-")
+    assert first.claim(".jpg").name == "cat-1.jpg"
+    assert second.claim(".jpg").name == "cat-2.jpg"
+    assert second.taken == 1
+
+
+def test_number_is_claimed_across_extensions(tmp_path):
+    (tmp_path / "cat-5.png").write_bytes(b"png")
+    names = Sequence(tmp_path, "cat-", start=5)
+    assert names.claim(".jpg").name == "cat-6.jpg"
+    assert not (tmp_path / "cat-5.jpg").exists()
+    assert names.taken == 1
+
+
+def test_write_replaces_placeholder(tmp_path):
+    names = Sequence(tmp_path, "cat-")
+    path = names.claim(".jpg")
+    assert path.stat().st_size == 0
+    assert names.write(path.name, b"jpeg bytes") == path
+    assert path.read_bytes() == b"jpeg bytes"
+    assert sorted(os.listdir(tmp_path)) == ["cat-1.jpg"]
+
+
+def test_failed_write_leaves_no_part_file(tmp_path, monkeypatch):
+    names = Sequence(tmp_path, "cat-")
+    path = names.claim(".jpg")
+
+    def full(*args):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(os, "replace", full)
+    with pytest.raises(OSError):
+        names.write(path.name, b"jpeg bytes")
+    names.release(path)
+    assert os.listdir(tmp_path) == []
+
+
+def test_cleanup_removes_placeholders_and_parts(tmp_path):
+    (tmp_path / "cat-1.jpg").write_bytes(b"")
+    (tmp_path / ".cat-2.jpg.part").write_bytes(b"half")
+    (tmp_path / "cat-3.jpg").write_bytes(b"jpeg")
+    assert Sequence(tmp_path, "cat-").cleanup() == 2
+    assert os.listdir(tmp_path) == ["cat-3.jpg"]
@@ -0,0 +1,72 @@
+import io
+import os
+
+from PIL import Image
+
+from image_scraper import shards
+from image_scraper.shards import ShardWriter
+
+
+def jpeg(n: int) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (40 + n, 30), (n * 17 % 256, 0, 0)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def fill(folder, n: int, **kwargs):
+    committed = {}
+    writer = ShardWriter(folder, "acne", fsync_every=0,
+                         on_commit=lambda path, info: committed.update({path.name: info}),
+                         **kwargs)
+    for i in range(n):
+        writer.write(f"acne_{i:04d}.jpg", jpeg(i), {"url": f"http://img/{i}"})
+    return writer, committed
+
+
+def test_index_is_rebuilt_from_the_tar_headers(tmp_path):
+    writer, committed = fill(tmp_path / "acne", 7, max_count=3)
+    writer.close()
+    assert [f.name for f in shards.shard_files(tmp_path)] == [
+        "acne-000001.tar", "acne-000002.tar", "acne-000003.tar"]
+
+    items = shards.get_items(tmp_path)
+    assert [s.name for s in items] == [f"acne_{i:04d}.jpg" for i in range(7)]
+    for i, s in enumerate(items):
+        assert shards.read(s) == jpeg(i)
+        assert s.offset == committed[s.name]["offset"]
+        assert (s.label, s.meta["url"], s.meta["width"]) == ("acne", f"http://img/{i}", 40 + i)
+    assert shards.counts(tmp_path) == {"acne": 7}
+    assert shards.names(tmp_path, "acne_000[12].jpg") == ["acne_0001.jpg", "acne_0002.jpg"]
+    assert [data for _, data in shards.iterate(tmp_path)] == [jpeg(i) for i in range(7)]
+
+
+def test_torn_tail_is_skipped(tmp_path):
+    writer, committed = fill(tmp_path / "acne", 5)
+    writer.flush()                                      # then the crash: no end blocks
+    shard = writer.path
+    last = committed["acne_0004.jpg"]["offset"]
+    with open(shard, "r+b") as f:
+        f.truncate(last + 100)                          # half of the last image
+    assert [s.name for s in shards.index(shard)] == [f"acne_{i:04d}.jpg" for i in range(4)]
+
+    prev = committed["acne_0003.jpg"]["offset"] + -(-len(jpeg(3)) // 512) * 512
+    with open(shard, "r+b") as f:
+        f.truncate(prev + 512 + 10)                     # into the previous sidecar
+    assert [s.name for s in shards.index(shard)] == [f"acne_{i:04d}.jpg" for i in range(3)]
+
+
+def test_a_new_run_starts_a_new_shard(tmp_path):
+    first, _ = fill(tmp_path / "acne", 2)
+    first.close()
+    second, _ = fill(tmp_path / "acne", 1)
+    second.close()
+    assert [f.name for f in shards.shard_files(tmp_path)] == ["acne-000001.tar", "acne-000002.tar"]
+    assert shards.counts(tmp_path) == {"acne": 3}
+
+
+def test_pack_writes_a_whole_shard(tmp_path):
+    path = tmp_path / "small" / "acne-000001.tar"
+    n = shards.pack(path, [(f"acne_{i}.jpg", jpeg(i), {"label": "acne", "width": 1})
+                           for i in range(3)])
+    assert n == 3 and os.listdir(path.parent) == ["acne-000001.tar"]
+    assert [s.meta["width"] for s in shards.index(path)] == [40, 41, 42]
@@ -0,0 +1,49 @@
+import time
+
+from image_scraper import urlcache
+from image_scraper.urlcache import DAY, HOUR, UrlCache
+
+
+def aged(cache, url, seconds):
+    entry = cache.entries[url]
+    cache.entries[url] = entry._replace(checked=entry.checked - seconds)
+
+
+def test_ttl_by_outcome_class(tmp_path):
+    cache = UrlCache(tmp_path / "urls.sqlite", ttls={"http_404": 60})
+    assert cache.ttl("saved") is None
+    assert cache.ttl("http_404") == 60
+    assert cache.ttl("http_410") == 7 * DAY
+    assert cache.ttl("http_503") == 6 * HOUR
+    assert cache.ttl("something_new") == cache.ttl("error")
+    cache.close()
+
+
+def test_transient_failures_expire(tmp_path):
+    cache = UrlCache(tmp_path / "urls.sqlite")
+    cache.record("http://a/saved.jpg", "saved", tmp_path / "x_0001.jpg", "abc")
+    cache.record("http://a/slow.jpg", "timeout")
+    cache.record("http://a/gone.jpg", "http_404")
+    for url in cache.entries:
+        aged(cache, url, 2 * HOUR)
+    assert cache.skip("http://a/saved.jpg") and cache.skip("http://a/gone.jpg")
+    assert not cache.skip("http://a/slow.jpg")                  # 1 h TTL passed
+    assert not cache.skip("http://a/new.jpg")
+    assert (cache.hits, cache.misses) == ({"saved": 1, "http_404": 1}, 2)
+
+    aged(cache, "http://a/gone.jpg", 7 * DAY)
+    assert cache.lookup("http://a/gone.jpg") is None
+    assert cache.lookup("http://a/saved.jpg").path == str(tmp_path / "x_0001.jpg")
+    cache.close()
+
+
+def test_outcomes_survive_reopen(tmp_path, monkeypatch):
+    monkeypatch.setattr(urlcache, "COMMIT_EVERY", 2)
+    cache = UrlCache(tmp_path / "urls.sqlite")
+    cache.record("http://a/1.jpg", "saved")
+    cache.record("http://a/2.jpg", "too_small")
+    cache.db.close()                                            # crash after the batch commit
+    again = UrlCache(tmp_path / "urls.sqlite")
+    assert again.lookup("http://a/2.jpg").outcome == "too_small"
+    assert again.lookup("http://a/1.jpg").checked <= time.time()
+    again.close()
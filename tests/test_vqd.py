@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+from image_scraper import vqd
+
+
+@pytest.fixture
+def ddg(monkeypatch):
+    """Each token request answers with a new token, slowly; `sent` lists the queries."""
+    sent = []
+    def fetch(query):
+        sent.append(query)
+        time.sleep(0.02)
+        return f"4-{len(sent)}"
+    monkeypatch.setattr(vqd, "_fetch", fetch)
+    monkeypatch.setattr(vqd, "_tokens", {})
+    monkeypatch.setattr(vqd, "_fetching", {})
+    return sent
+
+
+def test_token_is_reused(ddg):
+    assert vqd.token("red fox") == vqd.token("red fox") == "4-1"
+    assert vqd.token("barn owl") == "4-2"
+    assert ddg == ["red fox", "barn owl"]
+    assert not vqd._fetching
+
+
+def test_concurrent_callers_share_one_fetch(ddg):
+    got = []
+    runs = [threading.Thread(target=lambda: got.append(vqd.token("otter"))) for _ in range(8)]
+    for t in runs:
+        t.start()
+    for t in runs:
+        t.join()
+    assert got == ["4-1"] * 8 and ddg == ["otter"]
+    assert not vqd._fetching
+
+
+def test_invalidated_or_expired_token_is_refetched(ddg, monkeypatch):
+    assert vqd.token("heron") == "4-1"
+    vqd.invalidate("heron")
+    assert vqd.token("heron") == "4-2"
+    monkeypatch.setattr(vqd, "TTL", 0)
+    assert vqd.token("heron") == "4-3"
+    assert ddg == ["heron"] * 3
+
+
+def test_failed_fetch_is_not_cached(monkeypatch):
+    monkeypatch.setattr(vqd, "_fetch", lambda query: None)
+    monkeypatch.setattr(vqd, "_tokens", {})
+    monkeypatch.setattr(vqd, "_fetching", {})
+    assert vqd.token("mole") is None
+    assert "mole" not in vqd._tokens and not vqd._fetching